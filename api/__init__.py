@@ -6,7 +6,9 @@ Maps functions for app.py WITHOUT disease detection features
 # Patient routes
 from api.patient_routes import (
     register_patient,
+    register_patients_bulk,
     get_all_patients,
+    get_patient_count,
     get_patient_data,
     update_patient_data,
     search_patients,
@@ -21,7 +23,10 @@ from api.visit_routes import (
     save_consultation,
     get_patient_visits,
     delete_patient_visit,
-    generate_clinical_summary
+    generate_clinical_summary,
+    get_summary_job,
+    cancel_summary_job,
+    get_summary_metrics
 )
 
 # Analytics routes (simplified)
@@ -31,14 +36,19 @@ from api.analytics_routes import (
     save_clinician_feedback,
     extract_text_from_pdf,
     save_visit_feedback,
-    get_doctor_performance
+    get_doctor_performance,
+    verify_analytics_aggregates,
+    get_visit_dataframe,
+    export_visit_columns
 )
 
 # Make all functions available at package level
 __all__ = [
     # Patient functions
     'register_patient',
+    'register_patients_bulk',
     'get_all_patients', 
+    'get_patient_count',
     'get_patient_data',
     'update_patient_data',
     'search_patients',
@@ -52,6 +62,9 @@ __all__ = [
     'get_patient_visits',
     'delete_patient_visit',
     'generate_clinical_summary',
+    'get_summary_job',
+    'cancel_summary_job',
+    'get_summary_metrics',
     
     # Analytics functions
     'get_patient_analytics',
@@ -59,5 +72,8 @@ __all__ = [
     'save_clinician_feedback',
     'extract_text_from_pdf',
     'save_visit_feedback',
-    'get_doctor_performance'
+    'get_doctor_performance',
+    'verify_analytics_aggregates',
+    'get_visit_dataframe',
+    'export_visit_columns'
 ]
\ No newline at end of file
@@ -9,44 +9,23 @@ from typing import Dict, List
 import logging
 from datetime import datetime
 
-from data.db.json_adapter import JSONAdapter
+from data.db.adapter_factory import get_adapter
+from data.db.locking import VersionConflictError
+from core.visits.visit_manager import MAX_WRITE_ATTEMPTS
+from core.analytics.aggregates import get_aggregates
+from core.analytics.visit_columns import EXPORT_FORMATS, build_visit_columns
 
 logger = logging.getLogger(__name__)
 
 # Initialize services
-db = JSONAdapter()
+db = get_adapter()
+aggregates = get_aggregates(db)
 
 
 def get_patient_analytics() -> Dict:
-    """Get overall system analytics - SIMPLIFIED"""
+    """Get overall system analytics - served from the materialized aggregates"""
     try:
-        total_patients = 0
-        total_visits = 0
-        recent_visits = []
-        
-        # Process all patients
-        for patient_data in db.get_all_patients():
-            total_patients += 1
-            visits = patient_data.get('visits', [])
-            total_visits += len(visits)
-            
-            # Get recent visits
-            for visit in visits[-5:]:
-                recent_visits.append({
-                    'patient_name': patient_data['name'],
-                    'visit_date': visit.get('timestamp', 'Unknown'),
-                    'visit_type': visit.get('visit_type', 'OPD')
-                })
-        
-        # Sort recent visits
-        recent_visits.sort(key=lambda x: x['visit_date'], reverse=True)
-        
-        return {
-            'total_patients': total_patients,
-            'total_visits': total_visits,
-            'recent_visits': recent_visits[:10],
-            'avg_visits_per_patient': round(total_visits / total_patients, 1) if total_patients > 0 else 0
-        }
+        return aggregates.patient_analytics()
         
     except Exception as e:
         logger.error(f"Error getting analytics: {e}")
@@ -59,28 +38,9 @@ def get_patient_analytics() -> Dict:
 
 
 def get_feedback_stats() -> Dict:
-    """Get feedback statistics"""
+    """Get feedback statistics - served from the materialized aggregates"""
     try:
-        total_feedback = 0
-        total_rating = 0
-        ai_helpful_count = 0
-        
-        for patient_data in db.get_all_patients():
-            for visit in patient_data.get('visits', []):
-                if 'clinician_feedback' in visit:
-                    feedback_entries = visit['clinician_feedback']
-                    if isinstance(feedback_entries, list):
-                        for feedback in feedback_entries:
-                            total_feedback += 1
-                            total_rating += feedback.get('overall_rating', 0)
-                            if feedback.get('summary_accuracy', 0) >= 4:
-                                ai_helpful_count += 1
-        
-        return {
-            'total_feedback': total_feedback,
-            'average_rating': round(total_rating / total_feedback, 2) if total_feedback > 0 else 0,
-            'ai_helpful_percentage': round((ai_helpful_count / total_feedback) * 100, 1) if total_feedback > 0 else 0
-        }
+        return aggregates.feedback_stats()
         
     except Exception as e:
         logger.error(f"Error getting feedback stats: {e}")
@@ -94,48 +54,60 @@ def get_feedback_stats() -> Dict:
 def save_clinician_feedback(patient_id: str, visit_id: str, feedback_data: Dict) -> Dict:
     """Save clinician feedback for a visit"""
     try:
-        patient_data = db.load_patient(patient_id)
-        if not patient_data:
-            return {"success": False, "message": "Patient not found"}
-        
-        # Find the visit
-        for visit in patient_data.get('visits', []):
-            if visit.get('visit_id') == visit_id:
-                # Initialize feedback list if not exists
-                if 'clinician_feedback' not in visit:
-                    visit['clinician_feedback'] = []
-                
-                # Add feedback entry
-                feedback_entry = {
-                    'timestamp': datetime.now().isoformat(),
-                    'summary_accuracy': feedback_data.get('summary_accuracy', 0),
-                    'prescription_appropriate': feedback_data.get('prescription_appropriate', False),
-                    'overall_rating': feedback_data.get('overall_rating', 0),
-                    'comments': feedback_data.get('comments', '')
-                }
-                
-                visit['clinician_feedback'].append(feedback_entry)
-                
-                # Update edited content if provided
-                if 'edited_summary' in feedback_data:
-                    visit['original_summary'] = visit.get('summary', '')
-                    visit['summary'] = feedback_data['edited_summary']
-                    visit['summary_edited'] = True
-                
-                if 'edited_prescription' in feedback_data:
-                    visit['original_prescription'] = visit.get('prescription', '')
-                    visit['prescription'] = feedback_data['edited_prescription']
-                    visit['prescription_edited'] = True
-                
-                # Save updated data
-                db.save_patient(patient_data)
-                
-                return {
-                    "success": True,
-                    "message": "Feedback saved successfully"
-                }
-        
-        return {"success": False, "message": "Visit not found"}
+        # The feedback list is read-modify-write, so guard it with the record
+        # version and re-read if another session saved feedback in between
+        for _ in range(MAX_WRITE_ATTEMPTS):
+            patient_data = db.load_patient(patient_id)
+            if not patient_data:
+                return {"success": False, "message": "Patient not found"}
+            
+            # Find the visit
+            for visit in patient_data.get('visits', []):
+                if visit.get('visit_id') == visit_id:
+                    # Add feedback entry
+                    feedback_entry = {
+                        'timestamp': datetime.now().isoformat(),
+                        'summary_accuracy': feedback_data.get('summary_accuracy', 0),
+                        'prescription_appropriate': feedback_data.get('prescription_appropriate', False),
+                        'overall_rating': feedback_data.get('overall_rating', 0),
+                        'comments': feedback_data.get('comments', '')
+                    }
+                    
+                    updates = {
+                        'clinician_feedback': visit.get('clinician_feedback', []) + [feedback_entry]
+                    }
+                    
+                    # Update edited content if provided
+                    if 'edited_summary' in feedback_data:
+                        updates['original_summary'] = visit.get('summary', '')
+                        updates['summary'] = feedback_data['edited_summary']
+                        updates['summary_edited'] = True
+                    
+                    if 'edited_prescription' in feedback_data:
+                        updates['original_prescription'] = visit.get('prescription', '')
+                        updates['prescription'] = feedback_data['edited_prescription']
+                        updates['prescription_edited'] = True
+                    
+                    # Save only the changed visit fields
+                    try:
+                        saved = db.update_visit(patient_id, visit_id, updates,
+                                                expected_version=patient_data.get('version', 0))
+                    except VersionConflictError as e:
+                        logger.info(f"Retrying feedback save for patient {patient_id}: {e}")
+                        break
+                    
+                    if not saved:
+                        return {"success": False, "message": "Failed to save feedback"}
+                    
+                    aggregates.refresh_patient(patient_id, db.get_patient(patient_id))
+                    return {
+                        "success": True,
+                        "message": "Feedback saved successfully"
+                    }
+            else:
+                return {"success": False, "message": "Visit not found"}
+        
+        return {"success": False, "message": "Patient record is busy, please try again"}
         
     except Exception as e:
         logger.error(f"Error saving feedback: {e}")
@@ -198,13 +170,17 @@ def save_visit_feedback(patient_id: str, visit_id: str, feedback_type: str) -> D
         # Find the visit
         for visit in patient_data.get('visits', []):
             if visit.get('visit_id') == visit_id:
-                visit['quick_feedback'] = {
-                    'type': feedback_type,
-                    'timestamp': datetime.now().isoformat()
-                }
+                # Save only the changed visit field
+                saved = db.update_visit(patient_id, visit_id, {
+                    'quick_feedback': {
+                        'type': feedback_type,
+                        'timestamp': datetime.now().isoformat()
+                    }
+                })
+                if not saved:
+                    return {"success": False, "message": "Failed to save feedback"}
                 
-                # Save updated data
-                db.save_patient(patient_data)
+                aggregates.refresh_patient(patient_id, db.get_patient(patient_id))
                 return {"success": True}
         
         return {"success": False, "message": "Visit not found"}
@@ -215,27 +191,9 @@ def save_visit_feedback(patient_id: str, visit_id: str, feedback_type: str) -> D
 
 
 def get_doctor_performance(doctor_id: str) -> Dict:
-    """Get doctor performance metrics"""
+    """Get doctor performance metrics - served from the materialized aggregates"""
     try:
-        visits_count = 0
-        summaries_generated = 0
-        prescriptions_edited = 0
-        
-        for patient_data in db.get_all_patients():
-            for visit in patient_data.get('visits', []):
-                if visit.get('doctor') == doctor_id:
-                    visits_count += 1
-                    if visit.get('summary'):
-                        summaries_generated += 1
-                    if visit.get('prescription_edited'):
-                        prescriptions_edited += 1
-        
-        return {
-            'total_visits': visits_count,
-            'summaries_generated': summaries_generated,
-            'prescriptions_edited': prescriptions_edited,
-            'ai_usage_rate': round(summaries_generated / visits_count * 100, 1) if visits_count > 0 else 0
-        }
+        return aggregates.doctor_performance(doctor_id)
         
     except Exception as e:
         logger.error(f"Error getting doctor performance: {e}")
@@ -244,4 +202,53 @@ def get_doctor_performance(doctor_id: str) -> Dict:
             'summaries_generated': 0,
             'prescriptions_edited': 0,
             'ai_usage_rate': 0
-        }
\ No newline at end of file
+        }
+
+
+def verify_analytics_aggregates(repair: bool = False) -> Dict:
+    """
+    Recompute the dashboard aggregates from storage and report any drift
+    from the incrementally maintained values (repair=True keeps the fresh ones)
+    """
+    try:
+        return aggregates.verify(repair=repair)
+    except Exception as e:
+        logger.error(f"Error verifying analytics aggregates: {e}")
+        return {'ok': False, 'mismatches': [], 'message': str(e)}
+
+
+def get_visit_dataframe():
+    """All visits as a typed pandas DataFrame (one row per visit, vitals numeric)"""
+    return build_visit_columns(db.get_all_patients()).to_dataframe()
+
+
+def export_visit_columns(path: str, format: str = 'npz') -> Dict:
+    """Export all visits as columnar arrays (npz, parquet or arrow)"""
+    try:
+        if format not in EXPORT_FORMATS:
+            return {
+                "success": False,
+                "message": f"Unsupported format: {format}"
+            }
+        
+        columns = build_visit_columns(db.get_all_patients())
+        written = columns.save(path, format)
+        
+        return {
+            "success": True,
+            "path": str(written),
+            "rows": len(columns),
+            "format": format
+        }
+        
+    except ImportError as e:
+        return {
+            "success": False,
+            "message": str(e)
+        }
+    except Exception as e:
+        logger.error(f"Error exporting visit columns: {e}")
+        return {
+            "success": False,
+            "message": "Failed to export visits"
+        }
@@ -3,18 +3,21 @@ Patient API Routes
 Clean separation between Streamlit UI and business logic
 """
 
-from typing import Dict, List
+import io
+import re
+import csv
+from typing import Dict, Iterable, Iterator, List, Union
 import logging
 
 from core.patients.patient_manager import PatientManager
 from core.patients.patient_model import PatientCreate, PatientUpdate
 from core.clinical.vitals_validator import VitalsValidator
-from data.db.json_adapter import JSONAdapter
+from data.db.adapter_factory import get_adapter
 
 logger = logging.getLogger(__name__)
 
 # Initialize services
-db = JSONAdapter()
+db = get_adapter()
 patient_manager = PatientManager(db)
 vitals_validator = VitalsValidator()
 
@@ -62,6 +65,47 @@ def register_patient(patient_data: Dict) -> Dict:
         }
 
 
+def register_patients_bulk(source: Union[Iterable[Dict], io.IOBase], batch_size: int = 500) -> Dict:
+    """
+    Register many patients from an iterable of dicts or a CSV stream
+    (text or binary file object with a header row: name, age, sex, mobile,
+    blood_group, allergies, chronic_conditions). List fields in CSV are
+    comma or semicolon separated. Returns a per-row report.
+    """
+    try:
+        rows = _csv_rows(source) if hasattr(source, 'read') else source
+        return patient_manager.create_patients_bulk(rows, batch_size)
+        
+    except Exception as e:
+        logger.error(f"Error in bulk registration: {e}")
+        return {
+            "success": False,
+            "message": "Failed to register patients"
+        }
+
+
+def _csv_rows(stream) -> Iterator[Dict]:
+    """Stream CSV rows as registration dicts without reading the whole file"""
+    if isinstance(stream, (io.RawIOBase, io.BufferedIOBase)):
+        stream = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    
+    for row in csv.DictReader(stream):
+        patient = {}
+        for key, value in row.items():
+            if key is None or value is None or not value.strip():
+                continue  # Blank cells fall back to the model defaults
+            key = key.strip().lower()
+            value = value.strip()
+            
+            if key in ('allergies', 'chronic_conditions'):
+                patient[key] = [item.strip() for item in re.split(r'[;,]', value) if item.strip()]
+            elif key == 'sex':
+                patient[key] = value.lower()
+            else:
+                patient[key] = value
+        yield patient
+
+
 def get_all_patients() -> List[Dict]:
     """Get all patients with summary info"""
     try:
@@ -71,6 +115,15 @@ def get_all_patients() -> List[Dict]:
         return []
 
 
+def get_patient_count() -> int:
+    """Get total number of patients"""
+    try:
+        return patient_manager.get_patient_count()
+    except Exception as e:
+        logger.error(f"Error counting patients: {e}")
+        return 0
+
+
 def get_patient_data(patient_id: str) -> Dict:
     """Get complete patient data"""
     try:
@@ -101,10 +154,10 @@ def update_patient_data(patient_id: str, updates: Dict) -> Dict:
         }
 
 
-def search_patients(search_term: str) -> List[Dict]:
-    """Search patients by name or mobile"""
+def search_patients(search_term: str, limit: int = 20) -> List[Dict]:
+    """Search patients by name or mobile, best matches first"""
     try:
-        return patient_manager.search_patients(search_term)
+        return patient_manager.search_patients(search_term, limit)
     except Exception as e:
         logger.error(f"Error searching patients: {e}")
         return []
@@ -156,36 +209,10 @@ def export_patient_data(patient_id: str, format: str = 'json') -> Dict:
 def get_patient_statistics() -> Dict:
     """Get overall patient statistics"""
     try:
-        patients = patient_manager.get_all_patients()
-        
-        # Calculate statistics
-        total_patients = len(patients)
-        age_groups = {'0-18': 0, '19-40': 0, '41-60': 0, '60+': 0}
-        gender_distribution = {'male': 0, 'female': 0, 'other': 0}
-        
-        for patient in patients:
-            # Age groups
-            age = patient.get('age', 0)
-            if age <= 18:
-                age_groups['0-18'] += 1
-            elif age <= 40:
-                age_groups['19-40'] += 1
-            elif age <= 60:
-                age_groups['41-60'] += 1
-            else:
-                age_groups['60+'] += 1
-            
-            # Gender
-            sex = patient.get('sex', 'other').lower()
-            if sex in gender_distribution:
-                gender_distribution[sex] += 1
-        
-        return {
-            'total_patients': total_patients,
-            'age_distribution': age_groups,
-            'gender_distribution': gender_distribution,
-            'database_size_mb': db.get_database_size_mb()
-        }
+        # Materialized aggregates - no patient or visit records are read
+        stats = patient_manager.aggregates.patient_statistics()
+        stats['database_size_mb'] = db.get_database_size_mb()
+        return stats
         
     except Exception as e:
         logger.error(f"Error calculating statistics: {e}")
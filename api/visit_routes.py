@@ -8,20 +8,22 @@ import logging
 
 from core.visits.visit_manager import VisitManager
 from core.ai.gpt_engine import GPTEngine
-from data.db.json_adapter import JSONAdapter
+from core.ai.summary_jobs import get_job_queue, STATUS_COMPLETED
+from data.db.adapter_factory import get_adapter
 
 logger = logging.getLogger(__name__)
 
 # Initialize services
-db = JSONAdapter()
+db = get_adapter()
 visit_manager = VisitManager(db)
 gpt_engine = GPTEngine()
+summary_jobs = get_job_queue()
 
 
-def save_visit(patient_id: str, visit_data: Dict) -> Dict:
+def save_visit(patient_id: str, visit_data: Dict, expected_version: int = None) -> Dict:
     """Save a new visit"""
     try:
-        return visit_manager.create_visit(patient_id, visit_data)
+        return visit_manager.create_visit(patient_id, visit_data, expected_version)
     except Exception as e:
         logger.error(f"Error saving visit: {e}")
         return {
@@ -30,10 +32,12 @@ def save_visit(patient_id: str, visit_data: Dict) -> Dict:
         }
 
 
-def save_consultation(patient_id: str, visit_id: str, consultation_data: Dict) -> Dict:
+def save_consultation(patient_id: str, visit_id: str, consultation_data: Dict,
+                      expected_version: int = None) -> Dict:
     """Save consultation results (summary, prescription)"""
     try:
-        return visit_manager.update_consultation(patient_id, visit_id, consultation_data)
+        return visit_manager.update_consultation(patient_id, visit_id, consultation_data,
+                                                 expected_version)
     except Exception as e:
         logger.error(f"Error saving consultation: {e}")
         return {
@@ -51,10 +55,10 @@ def get_patient_visits(patient_id: str) -> List[Dict]:
         return []
 
 
-def delete_patient_visit(patient_id: str, visit_id: str) -> Dict:
+def delete_patient_visit(patient_id: str, visit_id: str, expected_version: int = None) -> Dict:
     """Delete a specific visit"""
     try:
-        return visit_manager.delete_visit(patient_id, visit_id)
+        return visit_manager.delete_visit(patient_id, visit_id, expected_version)
     except Exception as e:
         logger.error(f"Error deleting visit: {e}")
         return {
@@ -65,14 +69,37 @@ def delete_patient_visit(patient_id: str, visit_id: str) -> Dict:
 
 def generate_clinical_summary(symptoms_text: str, patient_data: Dict = None, 
                             include_prescription: bool = True, 
-                            format_type: str = "SOAP") -> Dict:
-    """Generate AI clinical summary"""
+                            format_type: str = "SOAP", background: bool = False,
+                            refresh: bool = False) -> Dict:
+    """
+    Generate AI clinical summary. refresh=True asks the model again instead
+    of replaying a cached response (regenerate).
+    With background=True the summary is streamed by a worker thread: this
+    returns the job id at once, poll it with get_summary_job() (the text so
+    far is in 'partial').
+    """
     try:
+        if background:
+            job_id = summary_jobs.submit_stream(
+                gpt_engine.generate_summary_stream,
+                symptoms_text,
+                patient_data,
+                include_prescription,
+                format_type,
+                refresh=refresh
+            )
+            return {
+                "success": True,
+                "job_id": job_id,
+                "status": "queued"
+            }
+        
         return gpt_engine.generate_summary(
             symptoms_text, 
             patient_data, 
             include_prescription, 
-            format_type
+            format_type,
+            refresh=refresh
         )
     except Exception as e:
         logger.error(f"Error generating summary: {e}")
@@ -84,5 +111,48 @@ def generate_clinical_summary(symptoms_text: str, patient_data: Dict = None,
         }
 
 
+def get_summary_job(job_id: str) -> Dict:
+    """
+    Status of a background summary job: queued, running, completed, failed
+    or cancelled. A completed job carries the summary result under 'result'.
+    """
+    job = summary_jobs.get_status(job_id)
+    if job is None:
+        return {
+            "success": False,
+            "job_id": job_id,
+            "status": "unknown",
+            "message": "Summary job not found"
+        }
+    
+    job["success"] = job["status"] == STATUS_COMPLETED
+    return job
+
+
+def cancel_summary_job(job_id: str) -> Dict:
+    """Cancel a background summary job"""
+    if summary_jobs.cancel(job_id):
+        return {
+            "success": True,
+            "message": "Summary generation cancelled"
+        }
+    return {
+        "success": False,
+        "message": "Summary job not found or already finished"
+    }
+
+
+def get_summary_metrics() -> Dict:
+    """AI summary health: provider calls, rate limiter, circuit breaker, cache and job queue"""
+    provider = gpt_engine.provider
+    metrics = provider.metrics() if hasattr(provider, 'metrics') else {
+        "provider": provider.name,
+        "model": provider.model
+    }
+    metrics["cache"] = gpt_engine.cache.stats() if gpt_engine.cache is not None else None
+    metrics["jobs"] = summary_jobs.stats()
+    return metrics
+
+
 # Remove these functions as they're no longer needed:
 # - check_longitudinal_risks (disease detection)
\ No newline at end of file
@@ -20,17 +20,18 @@ else:
 
 # CORE IMPORTS - Phase 1 MVP (LEAN VERSION - NO RARE DISEASE DETECTION)
 from api import (
-    register_patient, get_all_patients, get_patient_data,
+    register_patient, get_all_patients, get_patient_count, get_patient_data,
     save_visit, save_consultation, update_patient_data, 
     extract_text_from_pdf, delete_patient_visit,
     save_clinician_feedback, get_feedback_stats,
-    generate_clinical_summary, get_patient_analytics,
+    generate_clinical_summary, get_summary_job, cancel_summary_job, get_summary_metrics,
+    get_patient_analytics,
     search_patients, delete_patient, export_patient_data
 )
 
 # Essential utils only (REMOVED voice_input)
 from utils.export_tools import generate_visit_pdf, generate_visit_docx
-from utils.drug_checker import DrugInteractionChecker
+from utils.drug_checker import get_drug_checker
 from utils.medical_validator_v2 import MedicalValidator
 from utils.pdf_processor import PDFProcessor
 from utils.senior_doctor_feedback import feedback_system
@@ -43,10 +44,13 @@ from utils.analytics_helper import (
 
 # Initialize services
 os.makedirs("logs", exist_ok=True)
-drug_checker = DrugInteractionChecker()
+drug_checker = get_drug_checker()
 validator = MedicalValidator()
 pdf_processor = PDFProcessor()
 
+# Seconds between reruns while a summary is drafted in the background
+SUMMARY_POLL_SECONDS = 1.0
+
 # Helper functions
 def safe_save_visit(patient_id: str, visit_data: dict) -> dict:
     """Wrapper to ensure data is in correct format before calling save_visit"""
@@ -92,6 +96,72 @@ def safe_save_visit(patient_id: str, visit_data: dict) -> dict:
             "message": f"Error in safe_save_visit: {str(e)}"
         }
 
+def store_summary_result(summary_result: dict, summary_job: dict):
+    """Put a finished summary into the workflow state (or record the failure)"""
+    if summary_result['success']:
+        tracker.track_timing("summary_generated", datetime.fromisoformat(summary_job['started_at']), {
+            "format": summary_job['format_type'],
+            "has_prescription": bool(summary_result.get('prescription')),
+            "summary_length": len(summary_result['summary']),
+            "prescription_length": len(summary_result.get('prescription', ''))
+        })
+        
+        # Generate unique summary ID
+        st.session_state.workflow_state['current_summary_id'] = f"{datetime.now().timestamp()}"
+        
+        # Store in session state
+        st.session_state.workflow_state['summary_generated'] = True
+        st.session_state.workflow_state['current_summary'] = summary_result['summary']
+        st.session_state.workflow_state['current_prescription'] = summary_result.get('prescription', '')
+        st.session_state.workflow_state['original_prescription'] = summary_result.get('prescription', '')
+        st.session_state.workflow_state['current_visit_data'] = {
+            'chief_complaint': summary_job['symptoms_text'],
+            'vitals': summary_job['vitals'],
+            'lab_results': summary_job['lab_results'],
+            'timestamp': datetime.now().isoformat(),
+            'doctor': st.session_state.current_doctor,
+            'format_type': summary_job['format_type']
+        }
+        st.session_state.workflow_state['summary_notice'] = ('success', "✅ Summary generated successfully!")
+    else:
+        tracker.track("generate_failed", {
+            "reason": "api_error",
+            "error": summary_result.get('error', 'Unknown')
+        })
+        st.session_state.workflow_state['summary_notice'] = (
+            'error', f"Failed to generate summary: {summary_result.get('error', 'Unknown error')}")
+
+def check_summary_job():
+    """
+    Reconcile the background summary job with this render: drop it if another
+    patient is now selected, store its result once it has finished.
+    Returns the job while it is still being drafted, otherwise None.
+    """
+    summary_job = st.session_state.workflow_state.get('summary_job')
+    if not summary_job:
+        return None
+    
+    # A draft belongs to the patient it was started for
+    if summary_job.get('patient_id') != st.session_state.selected_patient:
+        cancel_summary_job(summary_job['job_id'])
+        tracker.track("generate_cancelled", {"reason": "patient_changed"})
+        st.session_state.workflow_state['summary_job'] = None
+        return None
+    
+    job = get_summary_job(summary_job['job_id'])
+    if job['status'] in ('queued', 'running'):
+        return job
+    
+    st.session_state.workflow_state['summary_job'] = None
+    if job['status'] == 'completed':
+        store_summary_result(job['result'], summary_job)
+    elif job['status'] != 'cancelled':
+        store_summary_result({
+            'success': False,
+            'error': job.get('error') or job.get('message')
+        }, summary_job)
+    return None
+
 # Set page config
 st.set_page_config(
     page_title="Smart EMR - Phase 1",
@@ -136,7 +206,8 @@ if 'workflow_state' not in st.session_state:
         'visit_saved': False,
         'visit_id': None,
         'original_prescription': None,
-        'current_summary_id': None
+        'current_summary_id': None,
+        'summary_job': None
     }
 # Add session ID if not exists
 if 'session_id' not in st.session_state:
@@ -151,8 +222,7 @@ with col1:
     st.title("🏥 Smart EMR - Phase 1")
 with col2:
     # Quick metrics
-    patients = get_all_patients()
-    st.metric("Total Patients", len(patients))
+    st.metric("Total Patients", get_patient_count())
 with col3:
     # API Status
     st.metric("API", "🟢 Online")
@@ -242,6 +312,11 @@ with st.sidebar:
             tracker.track("patient_selected", {"patient_id": patient['id'], "from": "list"})
             st.rerun()
 
+# Background summary: runs on every render, whichever screen is shown
+check_summary_job()
+# Set when the draft panel is on screen; only then do we keep rerunning to poll
+summary_draft_shown = False
+
 # Main content area
 if st.session_state.selected_patient:
     patient_data = get_patient_data(st.session_state.selected_patient)
@@ -425,12 +500,17 @@ if st.session_state.selected_patient:
             
             # STEP 2: GENERATE SUMMARY
             st.markdown("---")
-            if st.button("🤖 Generate Summary", type="primary", use_container_width=True):
+            generate_clicked = st.button("🤖 Generate Summary", type="primary", use_container_width=True)
+            # Regenerate asks the model again instead of replaying the cached response
+            regenerate_clicked = st.session_state.workflow_state['summary_generated'] and st.button(
+                "🔄 Regenerate Summary", use_container_width=True)
+            if generate_clicked or regenerate_clicked:
                 if symptoms_text:
                     tracker.track("generate_clicked", {
                         "has_vitals": vitals_entered,
                         "has_lab": bool(lab_results),
-                        "format": summary_format
+                        "format": summary_format,
+                        "regenerate": regenerate_clicked
                     })
                     
                     with st.spinner("Generating clinical summary..."):
@@ -489,48 +569,56 @@ if st.session_state.selected_patient:
                         patient_context['current_vitals'] = vitals
                         patient_context['lab_results'] = lab_results
                         
-                        # Generate summary
-                        summary_result = generate_clinical_summary(
+                        # Draft the summary in the background; reruns poll the job below
+                        submitted = generate_clinical_summary(
                             symptoms_text,
                             patient_context,
                             include_prescription=include_prescription,
-                            format_type=summary_format
+                            format_type=summary_format,
+                            background=True,
+                            refresh=regenerate_clicked
                         )
                         
-                        if summary_result['success']:
-                            tracker.track_timing("summary_generated", start_time, {
-                                "format": summary_format,
-                                "has_prescription": bool(summary_result.get('prescription')),
-                                "summary_length": len(summary_result['summary']),
-                                "prescription_length": len(summary_result.get('prescription', ''))
-                            })
-                            
-                            # Generate unique summary ID
-                            st.session_state.workflow_state['current_summary_id'] = f"{datetime.now().timestamp()}"
-                            
-                            # Store in session state
-                            st.session_state.workflow_state['summary_generated'] = True
-                            st.session_state.workflow_state['current_summary'] = summary_result['summary']
-                            st.session_state.workflow_state['current_prescription'] = summary_result.get('prescription', '')
-                            st.session_state.workflow_state['original_prescription'] = summary_result.get('prescription', '')
-                            st.session_state.workflow_state['current_visit_data'] = {
-                                'chief_complaint': symptoms_text,
+                        if submitted['success']:
+                            # A newer request replaces one still being drafted
+                            previous_job = st.session_state.workflow_state.get('summary_job')
+                            if previous_job:
+                                cancel_summary_job(previous_job['job_id'])
+                            st.session_state.workflow_state['summary_job'] = {
+                                'job_id': submitted['job_id'],
+                                'patient_id': st.session_state.selected_patient,
+                                'started_at': start_time.isoformat(),
+                                'symptoms_text': symptoms_text,
                                 'vitals': vitals,
                                 'lab_results': lab_results,
-                                'timestamp': datetime.now().isoformat(),
-                                'doctor': st.session_state.current_doctor,
                                 'format_type': summary_format
                             }
-                            st.success("✅ Summary generated successfully!")
                         else:
-                            tracker.track("generate_failed", {
-                                "reason": "api_error",
-                                "error": summary_result.get('error', 'Unknown')
-                            })
-                            st.error(f"Failed to generate summary: {summary_result.get('error', 'Unknown error')}")
+                            store_summary_result(submitted, {'format_type': summary_format})
                 else:
                     st.error("Please enter chief complaints first")
             
+            # SUMMARY BEING DRAFTED
+            drafting_job = check_summary_job()
+            if drafting_job:
+                summary_draft_shown = True
+                st.info("⏳ Drafting clinical summary... you can keep entering vitals and lab reports.")
+                if drafting_job.get('partial'):
+                    st.text_area("Draft (streaming)", value=drafting_job['partial'], height=300, disabled=True)
+                if st.button("✖️ Cancel Summary", use_container_width=True):
+                    cancel_summary_job(drafting_job['job_id'])
+                    tracker.track("generate_cancelled")
+                    st.session_state.workflow_state['summary_job'] = None
+                    st.rerun()
+            
+            summary_notice = st.session_state.workflow_state.pop('summary_notice', None)
+            if summary_notice:
+                level, message = summary_notice
+                if level == 'success':
+                    st.success(message)
+                else:
+                    st.error(message)
+            
             # DISPLAY GENERATED SUMMARY
             if st.session_state.workflow_state['summary_generated']:
                 st.markdown("---")
@@ -657,6 +745,8 @@ if st.session_state.selected_patient:
                                         visit_data_for_pdf['summary'] = st.session_state.workflow_state['current_summary']
                                         visit_data_for_pdf['prescription'] = prescription
                                         visit_data_for_pdf['visit_id'] = visit_id
+                                        # Reuse the vitals validation computed when the visit was saved
+                                        visit_data_for_pdf['vitals_validation'] = visit_result.get('vitals_validation')
                                         
                                         pdf_path = generate_visit_pdf(patient_data, visit_data_for_pdf)
                                         with open(pdf_path, "rb") as f:
@@ -744,6 +834,7 @@ if st.session_state.selected_patient:
                                         visit_data_for_docx['summary'] = st.session_state.workflow_state['current_summary']
                                         visit_data_for_docx['prescription'] = prescription
                                         visit_data_for_docx['visit_id'] = visit_id
+                                        visit_data_for_docx['vitals_validation'] = visit_result.get('vitals_validation')
                                         visit_data_for_docx['format_type'] = summary_format  # Add format type
                                         
                                         docx_path = generate_visit_docx(patient_data, visit_data_for_docx)
@@ -778,7 +869,8 @@ if st.session_state.selected_patient:
                                 'visit_saved': False,
                                 'visit_id': None,
                                 'original_prescription': None,
-                                'current_summary_id': None
+                                'current_summary_id': None,
+                                'summary_job': None
                             }
                             # Clear symptoms text
                             st.session_state.symptoms_text = ""
@@ -1079,6 +1171,26 @@ if st.session_state.selected_patient:
             st.metric("Indian EMR Format", feature_stats['format_indian'])
             st.metric("Rx Included", feature_stats['prescription_included'])
         
+        # AI service health
+        st.subheader("🤖 AI Summary Service")
+        ai_metrics = get_summary_metrics()
+        breaker = ai_metrics.get('circuit_breaker', {})
+        calls = ai_metrics.get('calls', {})
+        cache_stats = ai_metrics.get('cache') or {}
+        
+        col1, col2, col3, col4 = st.columns(4)
+        with col1:
+            st.metric("Circuit", breaker.get('state', 'n/a').replace('_', ' ').title())
+        with col2:
+            st.metric("Failure Rate", f"{breaker.get('failure_rate', 0) * 100:.0f}%")
+        with col3:
+            st.metric("In Flight", calls.get('in_flight', 0))
+        with col4:
+            st.metric("Cache Hit Rate", f"{cache_stats.get('hit_rate', 0) * 100:.0f}%")
+        
+        with st.expander("AI service metrics"):
+            st.json(ai_metrics)
+        
         # Personal stats for current doctor
         st.markdown("---")
         st.subheader(f"📈 Your Performance ({st.session_state.current_doctor})")
@@ -1139,4 +1251,9 @@ else:
 
 # Footer
 st.markdown("---")
-st.caption(f"Smart EMR v2.0 - Phase 1 MVP | Doctor: {st.session_state.current_doctor} | {datetime.now().strftime('%Y-%m-%d %H:%M')}")
\ No newline at end of file
+st.caption(f"Smart EMR v2.0 - Phase 1 MVP | Doctor: {st.session_state.current_doctor} | {datetime.now().strftime('%Y-%m-%d %H:%M')}")
+
+# Keep polling while the draft panel is on screen
+if summary_draft_shown:
+    time.sleep(SUMMARY_POLL_SECONDS)
+    st.rerun()
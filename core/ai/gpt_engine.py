@@ -3,12 +3,14 @@ GPT Engine for Clinical Summary Generation - FIXED VERSION
 NO HALLUCINATIONS + CONSISTENT FORMATTING
 """
 
-import os
 import re
-from typing import Dict, Optional, List
+from typing import Dict, Optional, List, Iterator, Tuple
 import logging
 from dotenv import load_dotenv
 
+from core.ai.providers import LLMProvider, get_provider
+from core.ai.response_cache import cache_key, get_response_cache
+
 logger = logging.getLogger(__name__)
 load_dotenv()
 
@@ -46,78 +48,213 @@ REMEMBER:
 - Lab values guide but don't dictate treatment
 """
 
+# Sampling parameters for every summary request (part of the cache key)
+COMPLETION_PARAMS = {
+    "temperature": 0.3,  # Low for consistent medical advice
+    "max_tokens": 1500
+}
+
+# Where the clinical note ends and the prescription begins
+PRESCRIPTION_MARKERS = (
+    'PRESCRIPTION:', 'Prescription:', 'TREATMENT GIVEN:', 'Treatment Given:',
+    'MEDICATIONS:', 'Medications:', 'Rx:', '===PRESCRIPTION', 'TREATMENT:',
+    '=== PRESCRIPTION START ===', '===PRESCRIPTION START==='
+)
+
+
+class SummaryStreamParser:
+    """
+    Splits a streamed completion into summary and prescription text as it arrives.
+    Text that could still be the start of a prescription marker split across
+    chunks is held back until the next chunk settles it.
+    """
+    
+    def __init__(self, markers: Tuple[str, ...] = PRESCRIPTION_MARKERS):
+        self.markers = markers
+        self._hold = max(len(marker) for marker in markers) - 1
+        self.text = ""
+        self.boundary: Optional[int] = None  # Index of the prescription marker in text
+        self._emitted = 0  # Characters of text already returned
+    
+    @property
+    def in_prescription(self) -> bool:
+        return self.boundary is not None
+    
+    def feed(self, chunk: str) -> Tuple[str, str]:
+        """Add a chunk; returns the (summary, prescription) text now safe to show"""
+        self.text += chunk
+        
+        if self.boundary is None:
+            # A marker not found before started no earlier than the held-back text
+            found = [index for index in (self.text.find(marker, self._emitted) for marker in self.markers)
+                     if index >= 0]
+            if found:
+                self.boundary = min(found)
+                summary = self.text[self._emitted:self.boundary]
+                self._emitted = self.boundary
+                return summary, self._take(len(self.text))
+            
+            return self._take(max(self._emitted, len(self.text) - self._hold)), ""
+        
+        return "", self._take(len(self.text))
+    
+    def close(self) -> Tuple[str, str]:
+        """End of stream: whatever was held back"""
+        if self.boundary is None:
+            return self._take(len(self.text)), ""
+        return "", self._take(len(self.text))
+    
+    def _take(self, end: int) -> str:
+        text = self.text[self._emitted:end]
+        self._emitted = end
+        return text
+
 
 class GPTEngine:
     """Handles GPT-based clinical summary generation with lab integration"""
     
-    def __init__(self):
-        self.api_key = os.getenv("OPENAI_API_KEY")
-        self.client = None
-        
-        if self.api_key:
-            try:
-                import openai
-                openai.api_key = self.api_key
-                self.client = openai
-                logger.info(f"OpenAI API key loaded: {len(self.api_key)} characters")
-            except Exception as e:
-                logger.error(f"OpenAI init failed: {e}")
-                self.client = None
-        else:
-            logger.warning("OpenAI API key not found in environment")
-            self.client = None
+    def __init__(self, provider: Optional[LLMProvider] = None):
+        # Model backend (OpenAI, or the local stub) - see core.ai.providers
+        self.provider = provider or get_provider()
+        
+        # Completions seen before are replayed from here (None when disabled)
+        self.cache = get_response_cache()
     
     def generate_summary(self, symptoms_text: str, patient_data: Dict = None,
                         include_prescription: bool = True, 
-                        format_type: str = "SOAP") -> Dict:
-        """Generate clinical summary using GPT with senior doctor thinking"""
-        if not self.api_key or not self.client:
+                        format_type: str = "SOAP", refresh: bool = False) -> Dict:
+        """
+        Generate clinical summary using GPT with senior doctor thinking.
+        refresh=True skips the response cache and replaces its entry.
+        """
+        messages = self._build_messages(symptoms_text, patient_data, format_type, include_prescription)
+        key, cached = self._cached_response(messages, refresh)
+        if cached is not None:
+            return self._parse_response(cached, include_prescription, format_type, cached=True)
+        
+        if not self.provider.available:
             logger.error("No API key or client available")
             return self._generate_fallback_summary(symptoms_text, patient_data)
         
-        # Build patient context WITH LAB RESULTS
-        patient_context = self._build_patient_context(patient_data)
-        
-        # Get format-specific prompt
-        prompt = self._build_prompt(patient_context, symptoms_text, format_type, include_prescription)
-        
         try:
-            response = self.client.ChatCompletion.create(
-                model="gpt-3.5-turbo",
-                messages=[
-                    {
-                        "role": "system", 
-                        "content": SENIOR_PHYSICIAN_PERSONA
-                    },
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0.3,  # Low for consistent medical advice
-                max_tokens=1500
-            )
-            
-            full_response = response['choices'][0]['message']['content'].strip()
-            
-            logger.info("OpenAI API call successful")
-            logger.debug(f"Full GPT response: {full_response}")
+            full_response = self.provider.complete(messages, **COMPLETION_PARAMS).strip()
             
-            # Split summary and prescription
-            summary = self._extract_summary_only(full_response)
-            prescription = ""
+            logger.info(f"{self.provider.name} API call successful")
+            self._store_response(key, full_response)
+            return self._parse_response(full_response, include_prescription, format_type)
             
-            if include_prescription:
-                prescription = self._extract_prescription(full_response)
-                logger.debug(f"Extracted prescription: {prescription}")
+        except Exception as e:
+            logger.error(f"GPT API error: {e}")
+            return self._generate_fallback_summary(symptoms_text, patient_data)
+    
+    def generate_summary_stream(self, symptoms_text: str, patient_data: Dict = None,
+                                include_prescription: bool = True,
+                                format_type: str = "SOAP", refresh: bool = False) -> Iterator[Dict]:
+        """
+        Streaming generate_summary. Yields {"type": "summary", "text": ...} as the
+        note arrives, {"type": "prescription", "text": ...} once the prescription
+        marker is seen, and finally {"type": "done", "result": ...} with the same
+        result generate_summary returns. refresh as for generate_summary.
+        """
+        messages = self._build_messages(symptoms_text, patient_data, format_type, include_prescription)
+        parser = SummaryStreamParser()
+        
+        key, cached = self._cached_response(messages, refresh)
+        if cached is not None:
+            for event in self._stream_events(parser.feed(cached), include_prescription):
+                yield event
+            for event in self._stream_events(parser.close(), include_prescription):
+                yield event
+            yield {"type": "done", "result": self._parse_response(cached, include_prescription, format_type, cached=True)}
+            return
+        
+        if not self.provider.available:
+            logger.error("No API key or client available")
+            yield {"type": "done", "result": self._generate_fallback_summary(symptoms_text, patient_data)}
+            return
+        
+        try:
+            for delta in self.provider.stream(messages, **COMPLETION_PARAMS):
+                for event in self._stream_events(parser.feed(delta), include_prescription):
+                    yield event
+            for event in self._stream_events(parser.close(), include_prescription):
+                yield event
             
-            return {
-                "success": True,
-                "summary": summary,
-                "prescription": prescription,
-                "format": format_type
-            }
+            logger.info(f"{self.provider.name} streaming call successful")
             
         except Exception as e:
             logger.error(f"GPT API error: {e}")
-            return self._generate_fallback_summary(symptoms_text, patient_data)
+            yield {"type": "done", "result": self._generate_fallback_summary(symptoms_text, patient_data)}
+            return
+        
+        # Final split uses the same extraction as the blocking call
+        full_response = parser.text.strip()
+        self._store_response(key, full_response)
+        yield {"type": "done", "result": self._parse_response(full_response, include_prescription, format_type)}
+    
+    def _stream_events(self, parts: Tuple[str, str], include_prescription: bool) -> List[Dict]:
+        summary, prescription = parts
+        events = []
+        if summary:
+            events.append({"type": "summary", "text": summary})
+        if prescription and include_prescription:
+            events.append({"type": "prescription", "text": prescription})
+        return events
+    
+    def _build_messages(self, symptoms_text: str, patient_data: Dict,
+                        format_type: str, include_prescription: bool) -> List[Dict]:
+        """Chat messages for a summary request"""
+        # Build patient context WITH LAB RESULTS
+        patient_context = self._build_patient_context(patient_data)
+        
+        # Get format-specific prompt
+        prompt = self._build_prompt(patient_context, symptoms_text, format_type, include_prescription)
+        
+        return [
+            {
+                "role": "system", 
+                "content": SENIOR_PHYSICIAN_PERSONA
+            },
+            {"role": "user", "content": prompt}
+        ]
+    
+    def _cached_response(self, messages: List[Dict],
+                         refresh: bool = False) -> Tuple[Optional[str], Optional[str]]:
+        """(cache key, cached completion or None); refresh only computes the key"""
+        if self.cache is None:
+            return None, None
+        key = cache_key(f"{self.provider.name}:{self.provider.model}", messages, COMPLETION_PARAMS)
+        if refresh:
+            return key, None
+        cached = self.cache.get(key)
+        if cached is not None:
+            logger.info("GPT response served from cache")
+        return key, cached
+    
+    def _store_response(self, key: Optional[str], full_response: str):
+        if self.cache is not None and key and full_response:
+            self.cache.put(key, full_response, self.provider.model)
+    
+    def _parse_response(self, full_response: str, include_prescription: bool, format_type: str,
+                        cached: bool = False) -> Dict:
+        """Split a complete response into summary and prescription"""
+        logger.debug(f"Full GPT response: {full_response}")
+        
+        # Split summary and prescription
+        summary = self._extract_summary_only(full_response)
+        prescription = ""
+        
+        if include_prescription:
+            prescription = self._extract_prescription(full_response)
+            logger.debug(f"Extracted prescription: {prescription}")
+        
+        return {
+            "success": True,
+            "summary": summary,
+            "prescription": prescription,
+            "format": format_type,
+            "cached": cached
+        }
     
     def _build_patient_context(self, patient_data: Dict) -> str:
         """Build patient context including vitals and lab results"""
@@ -311,14 +448,8 @@ If the patient mentions a duration (e.g., "for 2 weeks"), simply document it as
     def _extract_summary_only(self, full_response: str) -> str:
         """Extract only the clinical summary, excluding prescription"""
         # Find where prescription section starts
-        prescription_markers = [
-            'PRESCRIPTION:', 'Prescription:', 'TREATMENT GIVEN:', 'Treatment Given:',
-            'MEDICATIONS:', 'Medications:', 'Rx:', '===PRESCRIPTION', 'TREATMENT:',
-            '=== PRESCRIPTION START ===', '===PRESCRIPTION START==='
-        ]
-        
         summary = full_response
-        for marker in prescription_markers:
+        for marker in PRESCRIPTION_MARKERS:
             if marker in summary:
                 # Cut off at prescription section
                 summary = summary.split(marker)[0].strip()
@@ -0,0 +1,411 @@
+"""
+LLM Providers
+Chat-completion backends behind one interface, picked from the environment
+
+    EMR_LLM_PROVIDER     = openai (default) | stub
+    EMR_LLM_MODEL        = model name (default gpt-3.5-turbo)
+    EMR_LLM_TIMEOUT      = seconds per request (default 30)
+    EMR_LLM_RETRIES      = retries of one request after a transient error (default 2)
+    EMR_LLM_RETRY_RATIO  = retries allowed per request across the process (default 0.2)
+    EMR_LLM_RATE         = requests per second across the process (default 2)
+    EMR_LLM_BURST        = requests allowed at once above that rate (default 5)
+    EMR_LLM_CONCURRENCY  = requests in flight at once (default 4)
+    EMR_LLM_MAX_WAIT     = seconds to wait for a rate / concurrency slot (default 10)
+    EMR_LLM_BREAKER_THRESHOLD = failure rate that opens the breaker (default 0.5)
+    EMR_LLM_BREAKER_COOLDOWN  = seconds the breaker stays open (default 30)
+    EMR_STUB_LATENCY     = stub: seconds before the first token (default 0.5)
+    EMR_STUB_TOKEN_DELAY = stub: seconds between tokens (default 0.01)
+
+GPTEngine only calls complete() and stream(), so the model or vendor can be
+changed here without touching the routes. The shared provider is wrapped in
+a ResilientProvider: one rate limit, concurrency cap and circuit breaker for
+the whole process, failing fast (GPTEngine then uses its fallback summary)
+instead of piling threads up behind a slow or rate-limiting API. Retries
+happen there too: every attempt takes a rate-limit token and reports to the
+breaker, and a shared retry budget keeps retries a fraction of the traffic.
+
+The stub needs no network and answers deterministically with realistic
+timing, for load tests of the summary pipeline.
+"""
+
+import os
+import re
+import time
+import hashlib
+import threading
+from typing import Dict, Iterator, List, Optional
+import logging
+
+from core.ai.resilience import TokenBucket, CircuitBreaker, RetryBudget, backoff_delay
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MODEL = "gpt-3.5-turbo"
+DEFAULT_TIMEOUT = 30.0
+DEFAULT_RETRIES = 2
+
+# First retry waits this long, doubling each time
+BACKOFF_SECONDS = 1.0
+
+DEFAULT_RATE = 2.0
+DEFAULT_BURST = 5
+DEFAULT_CONCURRENCY = 4
+DEFAULT_MAX_WAIT = 10.0
+DEFAULT_RETRY_RATIO = 0.2
+
+
+class ProviderError(Exception):
+    """A completion request failed (after any retries)"""
+    pass
+
+
+class ProviderUnavailableError(ProviderError):
+    """Refused without calling the backend (circuit open, rate or concurrency limit)"""
+    pass
+
+
+class LLMProvider:
+    """Base class: a chat-completion backend"""
+
+    name = "base"
+
+    def __init__(self, model: str = DEFAULT_MODEL):
+        self.model = model
+
+    @property
+    def available(self) -> bool:
+        """False when the backend cannot be called (e.g. no API key)"""
+        return True
+
+    def complete(self, messages: List[Dict], **params) -> str:
+        """Full completion text"""
+        raise NotImplementedError
+
+    def stream(self, messages: List[Dict], **params) -> Iterator[str]:
+        """Completion text in chunks as it is generated"""
+        yield self.complete(messages, **params)
+
+    def is_transient(self, error: Exception) -> bool:
+        """True if the request may succeed when retried (rate limit, timeout, 5xx)"""
+        return False
+
+
+class OpenAIProvider(LLMProvider):
+    """OpenAI chat completions through the openai 0.28 client"""
+
+    name = "openai"
+
+    def __init__(self, api_key: Optional[str] = None, model: str = DEFAULT_MODEL,
+                 timeout: float = DEFAULT_TIMEOUT):
+        super().__init__(model)
+        self.api_key = api_key or os.getenv("OPENAI_API_KEY")
+        self.timeout = timeout
+        self._openai = None
+
+        if not self.api_key:
+            logger.warning("OpenAI API key not found in environment")
+            return
+
+        try:
+            # The client already keeps one pooled session per worker thread
+            # (with openai.proxy applied), so connections are reused as is
+            import openai
+            self._openai = openai
+            logger.info(f"OpenAI API key loaded: {len(self.api_key)} characters")
+        except Exception as e:
+            logger.error(f"OpenAI init failed: {e}")
+
+    @property
+    def available(self) -> bool:
+        return self._openai is not None
+
+    def complete(self, messages: List[Dict], **params) -> str:
+        # One attempt - ResilientProvider retries, so each attempt is rate limited
+        response = self._create(messages, **params)
+        return response['choices'][0]['message']['content']
+
+    def stream(self, messages: List[Dict], **params) -> Iterator[str]:
+        response = self._create(messages, stream=True, **params)
+        try:
+            for chunk in response:
+                content = chunk['choices'][0].get('delta', {}).get('content')
+                if content:
+                    yield content
+        except Exception as e:
+            raise ProviderError(f"Stream interrupted: {e}") from e
+
+    def _create(self, messages: List[Dict], **params):
+        if self._openai is None:
+            raise ProviderError("OpenAI client not available")
+        return self._openai.ChatCompletion.create(
+            model=self.model,
+            messages=messages,
+            api_key=self.api_key,
+            request_timeout=self.timeout,
+            **params
+        )
+
+    def is_transient(self, error: Exception) -> bool:
+        """Rate limits, timeouts, connection errors and 5xx responses"""
+        if self._openai is None:
+            return False
+        errors = self._openai.error
+        if isinstance(error, (errors.RateLimitError, errors.Timeout, errors.APIConnectionError,
+                              errors.ServiceUnavailableError, errors.TryAgain)):
+            return True
+        status = getattr(error, 'http_status', None)
+        return isinstance(error, errors.APIError) and status is not None and status >= 500
+
+
+class StubProvider(LLMProvider):
+    """
+    Deterministic local backend: a fixed-shape clinical note built from the
+    prompt, delivered after first_token_latency, one word every token_delay
+    """
+
+    name = "stub"
+
+    def __init__(self, model: str = "stub-clinical", first_token_latency: float = 0.5,
+                 token_delay: float = 0.01):
+        super().__init__(model)
+        self.first_token_latency = first_token_latency
+        self.token_delay = token_delay
+
+    def complete(self, messages: List[Dict], **params) -> str:
+        tokens = self._tokens(messages, params)
+        time.sleep(self.first_token_latency + self.token_delay * max(len(tokens) - 1, 0))
+        return ''.join(tokens)
+
+    def stream(self, messages: List[Dict], **params) -> Iterator[str]:
+        tokens = self._tokens(messages, params)
+        time.sleep(self.first_token_latency)
+        for index, token in enumerate(tokens):
+            if index:
+                time.sleep(self.token_delay)
+            yield token
+
+    def _tokens(self, messages: List[Dict], params: Dict) -> List[str]:
+        """Words of the response, each with its trailing whitespace"""
+        tokens = re.findall(r'\S+\s*', self.response_text(messages))
+        max_tokens = params.get('max_tokens')
+        return tokens[:max_tokens] if max_tokens else tokens
+
+    def response_text(self, messages: List[Dict]) -> str:
+        """The response for these messages (same messages, same text)"""
+        prompt = messages[-1]['content'] if messages else ""
+        match = re.search(r"TODAY'S SYMPTOMS:\s*\n(.*?)\n\s*\n", prompt, re.S)
+        complaint = ' '.join((match.group(1) if match else prompt[:200]).split()) or "Not stated"
+        reference = hashlib.sha1(prompt.encode('utf-8')).hexdigest()[:8]
+
+        text = (
+            f"SUBJECTIVE:\n"
+            f"Chief Complaint: {complaint}\n"
+            f"Patient reports {complaint.lower()}\n\n"
+            f"OBJECTIVE:\n"
+            f"Vital signs: as recorded\n"
+            f"No lab results available\n\n"
+            f"ASSESSMENT:\n"
+            f"Simulated assessment (local stub response {reference}).\n\n"
+            f"PLAN:\n"
+            f"- Follow up in 3 days\n"
+            f"- Return immediately if: breathlessness, chest pain, confusion, persistent vomiting\n"
+        )
+        if "PRESCRIPTION FORMAT:" in prompt:
+            text += (
+                "\nPRESCRIPTION:\n"
+                "1. Tab. Paracetamol 500mg - TDS x 3 days\n"
+                "2. Tab. Cetirizine 10mg - OD x 5 days\n"
+            )
+        return text
+
+
+class ResilientProvider(LLMProvider):
+    """
+    Wraps a provider with a shared rate limit, concurrency cap, circuit
+    breaker and retries. Every attempt, retries included, goes through the
+    breaker, takes a rate-limit token and a concurrency slot, and reports
+    its outcome to the breaker; retries also draw on the shared budget.
+    """
+
+    def __init__(self, provider: LLMProvider, rate: float = DEFAULT_RATE, burst: float = DEFAULT_BURST,
+                 concurrency: int = DEFAULT_CONCURRENCY, max_wait: float = DEFAULT_MAX_WAIT,
+                 breaker: Optional[CircuitBreaker] = None, max_retries: int = DEFAULT_RETRIES,
+                 retry_budget: Optional[RetryBudget] = None, backoff_seconds: float = BACKOFF_SECONDS):
+        super().__init__(provider.model)
+        self.provider = provider
+        self.name = provider.name
+        self.max_wait = max_wait
+        self.concurrency = concurrency
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+        self.limiter = TokenBucket(rate, burst)
+        self.breaker = breaker or CircuitBreaker()
+        self.retry_budget = retry_budget or RetryBudget()
+        self._slots = threading.BoundedSemaphore(concurrency)
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._counters = {'calls': 0, 'attempts': 0, 'succeeded': 0, 'failed': 0, 'refused': 0}
+
+    @property
+    def available(self) -> bool:
+        return self.provider.available
+
+    def is_transient(self, error: Exception) -> bool:
+        return self.provider.is_transient(error)
+
+    def complete(self, messages: List[Dict], **params) -> str:
+        self._start_call()
+        attempt = 0
+        while True:
+            self._enter()
+            try:
+                text = self.provider.complete(messages, **params)
+            except Exception as e:
+                self._exit(False)
+                attempt = self._retry_or_raise(e, attempt)
+                continue
+            self._exit(True)
+            return text
+
+    def stream(self, messages: List[Dict], **params) -> Iterator[str]:
+        self._start_call()
+        attempt = 0
+        while True:
+            self._enter()
+            started = False
+            try:
+                for chunk in self.provider.stream(messages, **params):
+                    started = True
+                    yield chunk
+            except GeneratorExit:
+                # Closed early by a cancelled job - not a provider failure
+                self.breaker.release()
+                self._release_slot()
+                raise
+            except Exception as e:
+                self._exit(False)
+                if started:
+                    # Text already went out; a stream failing midway is not replayed
+                    if isinstance(e, ProviderError):
+                        raise
+                    raise ProviderError(f"Stream interrupted: {e}") from e
+                attempt = self._retry_or_raise(e, attempt)
+                continue
+            self._exit(True)
+            return
+
+    def _start_call(self):
+        self.retry_budget.deposit()
+        self._count('calls')
+
+    def _retry_or_raise(self, error: Exception, attempt: int) -> int:
+        """Back off before the next attempt, or raise if this one was the last"""
+        if attempt >= self.max_retries or not self.provider.is_transient(error):
+            if isinstance(error, ProviderError):
+                raise error
+            raise ProviderError(str(error)) from error
+        if not self.retry_budget.withdraw():
+            raise ProviderError(f"Retry budget exhausted: {error}") from error
+
+        delay = backoff_delay(attempt, self.backoff_seconds)
+        logger.warning(f"{self.name} request failed ({type(error).__name__}), retrying in {delay:.1f}s")
+        time.sleep(delay)
+        return attempt + 1
+
+    def _enter(self):
+        """Breaker first, so an open circuit fails fast without waiting for a slot"""
+        if not self.breaker.allow():
+            self._count('refused')
+            raise ProviderUnavailableError("Circuit open - AI service failing, using fallback")
+
+        started = time.monotonic()
+        if not self.limiter.acquire(self.max_wait):
+            self.breaker.release()
+            self._count('refused')
+            raise ProviderUnavailableError("Rate limit - too many AI requests, try again shortly")
+
+        remaining = max(0.0, self.max_wait - (time.monotonic() - started))
+        if not self._slots.acquire(timeout=remaining):
+            self.breaker.release()
+            self._count('refused')
+            raise ProviderUnavailableError("Too many AI requests in progress, try again shortly")
+
+        with self._lock:
+            self._in_flight += 1
+            self._counters['attempts'] += 1
+
+    def _exit(self, succeeded: bool):
+        if succeeded:
+            self.breaker.record_success()
+        else:
+            self.breaker.record_failure()
+        self._count('succeeded' if succeeded else 'failed')
+        self._release_slot()
+
+    def _release_slot(self):
+        with self._lock:
+            self._in_flight -= 1
+        self._slots.release()
+
+    def _count(self, counter: str):
+        with self._lock:
+            self._counters[counter] += 1
+
+    def metrics(self) -> Dict:
+        """Provider call counters with limiter and breaker state"""
+        with self._lock:
+            calls = dict(self._counters, in_flight=self._in_flight, concurrency=self.concurrency)
+        return {
+            'provider': self.name,
+            'model': self.model,
+            'calls': calls,
+            'rate_limiter': self.limiter.metrics(),
+            'retry_budget': self.retry_budget.metrics(),
+            'circuit_breaker': self.breaker.metrics()
+        }
+
+
+def create_provider(name: Optional[str] = None) -> LLMProvider:
+    """Create a provider for the given (or configured) backend"""
+    name = (name or os.getenv("EMR_LLM_PROVIDER", "openai")).strip().lower()
+
+    if name == "stub":
+        return StubProvider(
+            first_token_latency=float(os.getenv("EMR_STUB_LATENCY", 0.5)),
+            token_delay=float(os.getenv("EMR_STUB_TOKEN_DELAY", 0.01))
+        )
+
+    if name != "openai":
+        logger.warning(f"Unknown EMR_LLM_PROVIDER '{name}', using OpenAI")
+
+    return OpenAIProvider(
+        model=os.getenv("EMR_LLM_MODEL", DEFAULT_MODEL),
+        timeout=float(os.getenv("EMR_LLM_TIMEOUT", DEFAULT_TIMEOUT))
+    )
+
+
+_provider: Optional[LLMProvider] = None
+_provider_lock = threading.Lock()
+
+
+def get_provider() -> LLMProvider:
+    """The process-wide provider used by GPTEngine"""
+    global _provider
+
+    with _provider_lock:
+        if _provider is None:
+            _provider = ResilientProvider(
+                create_provider(),
+                rate=float(os.getenv("EMR_LLM_RATE", DEFAULT_RATE)),
+                burst=float(os.getenv("EMR_LLM_BURST", DEFAULT_BURST)),
+                concurrency=int(os.getenv("EMR_LLM_CONCURRENCY", DEFAULT_CONCURRENCY)),
+                max_wait=float(os.getenv("EMR_LLM_MAX_WAIT", DEFAULT_MAX_WAIT)),
+                breaker=CircuitBreaker(
+                    threshold=float(os.getenv("EMR_LLM_BREAKER_THRESHOLD", 0.5)),
+                    cooldown_seconds=float(os.getenv("EMR_LLM_BREAKER_COOLDOWN", 30))
+                ),
+                max_retries=int(os.getenv("EMR_LLM_RETRIES", DEFAULT_RETRIES)),
+                retry_budget=RetryBudget(ratio=float(os.getenv("EMR_LLM_RETRY_RATIO", DEFAULT_RETRY_RATIO)))
+            )
+            logger.info(f"Using {type(_provider.provider).__name__} ({_provider.model}) for summaries")
+        return _provider
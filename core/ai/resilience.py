@@ -0,0 +1,206 @@
+"""
+Resilience Primitives
+Token-bucket rate limiting, retry backoff with jitter, a retry budget and a
+circuit breaker for calls to the LLM provider
+
+All are thread-safe and meant to be shared process-wide, so every doctor's
+session draws on the same request budget and sees the same breaker state.
+"""
+
+import time
+import random
+import threading
+from collections import deque
+from typing import Dict
+
+# Circuit breaker states
+STATE_CLOSED = 'closed'
+STATE_OPEN = 'open'
+STATE_HALF_OPEN = 'half_open'
+
+
+def backoff_delay(attempt: int, base_seconds: float, max_seconds: float = 30.0) -> float:
+    """Full-jitter exponential backoff: uniform in [0, base * 2^attempt], capped"""
+    return random.uniform(0, min(max_seconds, base_seconds * (2 ** attempt)))
+
+
+class TokenBucket:
+    """Allows `rate` acquisitions per second on average, bursts up to `capacity`"""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+        self.throttled = 0  # Acquisitions that had to wait
+        self.rejected = 0   # Acquisitions that gave up
+
+    def _refill(self, now: float):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, timeout: float) -> bool:
+        """Take one token, waiting up to timeout seconds; False if none came free"""
+        deadline = time.monotonic() + timeout
+        waited = False
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    if waited:
+                        self.throttled += 1
+                    return True
+                wait = (1 - self._tokens) / self.rate
+                if now + wait > deadline:
+                    self.rejected += 1
+                    return False
+            waited = True
+            time.sleep(wait)
+
+    def metrics(self) -> Dict:
+        with self._lock:
+            self._refill(time.monotonic())
+            return {
+                'rate_per_second': self.rate,
+                'capacity': self.capacity,
+                'tokens': round(self._tokens, 2),
+                'throttled': self.throttled,
+                'rejected': self.rejected
+            }
+
+
+class RetryBudget:
+    """
+    Caps retries to a fraction of first attempts across the process: each
+    request earns `ratio` of a retry (up to `capacity` saved), each retry
+    spends one. While the API is failing everywhere, retries dry up instead
+    of multiplying the load on it.
+    """
+
+    def __init__(self, ratio: float = 0.2, capacity: float = 10, initial: float = 3):
+        self.ratio = ratio
+        self.capacity = capacity
+        self._balance = min(initial, capacity)
+        self._lock = threading.Lock()
+        self.retries = 0
+        self.exhausted = 0  # Retries refused for lack of budget
+
+    def deposit(self):
+        """Record a first attempt"""
+        with self._lock:
+            self._balance = min(self.capacity, self._balance + self.ratio)
+
+    def withdraw(self) -> bool:
+        """Take one retry; False if the budget is spent"""
+        with self._lock:
+            if self._balance < 1:
+                self.exhausted += 1
+                return False
+            self._balance -= 1
+            self.retries += 1
+            return True
+
+    def metrics(self) -> Dict:
+        with self._lock:
+            return {
+                'balance': round(self._balance, 2),
+                'ratio': self.ratio,
+                'retries': self.retries,
+                'exhausted': self.exhausted
+            }
+
+
+class CircuitBreaker:
+    """
+    Opens when the failure rate over the last `window` calls reaches
+    `threshold` (after at least `min_calls`). While open, calls are refused
+    at once; after `cooldown_seconds` a single trial call is let through
+    (half-open) and its outcome closes or reopens the breaker.
+    """
+
+    def __init__(self, threshold: float = 0.5, window: int = 20, min_calls: int = 5,
+                 cooldown_seconds: float = 30.0):
+        self.threshold = threshold
+        self.min_calls = min_calls
+        self.cooldown_seconds = cooldown_seconds
+        self._outcomes = deque(maxlen=window)  # True = failure
+        self._state = STATE_CLOSED
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+        self.times_opened = 0
+        self.short_circuited = 0
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._current_state(time.monotonic())
+
+    def _current_state(self, now: float) -> str:
+        if self._state == STATE_OPEN and now - self._opened_at >= self.cooldown_seconds:
+            self._state = STATE_HALF_OPEN
+            self._trial_in_flight = False
+        return self._state
+
+    def allow(self) -> bool:
+        """True if a call may go ahead now"""
+        with self._lock:
+            state = self._current_state(time.monotonic())
+            if state == STATE_CLOSED:
+                return True
+            if state == STATE_HALF_OPEN and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            self.short_circuited += 1
+            return False
+
+    def release(self):
+        """The allowed call never reached the provider (e.g. rate limited)"""
+        with self._lock:
+            if self._state == STATE_HALF_OPEN:
+                self._trial_in_flight = False
+
+    def record_success(self):
+        with self._lock:
+            if self._state == STATE_HALF_OPEN:
+                self._state = STATE_CLOSED
+                self._outcomes.clear()
+            self._outcomes.append(False)
+
+    def record_failure(self):
+        with self._lock:
+            now = time.monotonic()
+            if self._state == STATE_HALF_OPEN:
+                self._open(now)
+                return
+            self._outcomes.append(True)
+            if self._state == STATE_CLOSED and len(self._outcomes) >= self.min_calls and \
+                    self._failure_rate() >= self.threshold:
+                self._open(now)
+
+    def _open(self, now: float):
+        self._state = STATE_OPEN
+        self._opened_at = now
+        self._trial_in_flight = False
+        self.times_opened += 1
+
+    def _failure_rate(self) -> float:
+        return sum(self._outcomes) / len(self._outcomes) if self._outcomes else 0.0
+
+    def metrics(self) -> Dict:
+        with self._lock:
+            now = time.monotonic()
+            state = self._current_state(now)
+            return {
+                'state': state,
+                'failure_rate': round(self._failure_rate(), 3),
+                'recent_calls': len(self._outcomes),
+                'threshold': self.threshold,
+                'times_opened': self.times_opened,
+                'short_circuited': self.short_circuited,
+                'retry_in_seconds': round(max(0.0, self.cooldown_seconds - (now - self._opened_at)), 1)
+                if state == STATE_OPEN else 0.0
+            }
@@ -0,0 +1,225 @@
+"""
+GPT Response Cache
+Persistent, content-addressed cache of completions
+
+A completion is stored under the SHA-256 of everything that determines it:
+model, messages (persona + _build_prompt output) and sampling parameters.
+Rerunning the script or re-clicking Generate with the same symptoms,
+patient context and format is then answered locally, and a test machine
+without an API key replays whatever completions the cache holds.
+
+Entries live in a SQLite file with a small in-memory LRU in front of it.
+They expire after a TTL, and the least recently used are evicted past the
+size cap.
+
+    EMR_GPT_CACHE       = on (default) | off
+    EMR_GPT_CACHE_PATH  = cache database (default data/cache/gpt_responses.db)
+    EMR_GPT_CACHE_TTL   = seconds an entry stays valid (default 7 days)
+    EMR_GPT_CACHE_MAX   = maximum stored entries (default 1000)
+"""
+
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_PATH = "data/cache/gpt_responses.db"
+DEFAULT_TTL_SECONDS = 7 * 24 * 3600
+DEFAULT_MAX_ENTRIES = 1000
+
+# Entries also kept in process memory
+MEMORY_ENTRIES = 128
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key         TEXT PRIMARY KEY,
+    model       TEXT,
+    response    TEXT NOT NULL,
+    created_at  REAL NOT NULL,
+    accessed_at REAL NOT NULL,
+    hits        INTEGER NOT NULL DEFAULT 0
+);
+
+CREATE INDEX IF NOT EXISTS idx_responses_accessed_at ON responses(accessed_at);
+"""
+
+
+def cache_key(model: str, messages: List[Dict], params: Optional[Dict] = None) -> str:
+    """Content address of a completion request"""
+    payload = json.dumps({"model": model, "messages": messages, "params": params or {}},
+                         sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class ResponseCache:
+    """SQLite-backed completion cache with TTL, LRU eviction and hit/miss counters"""
+
+    def __init__(self, db_path: str = DEFAULT_CACHE_PATH, ttl_seconds: float = DEFAULT_TTL_SECONDS,
+                 max_entries: int = DEFAULT_MAX_ENTRIES, memory_entries: int = MEMORY_ENTRIES):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.memory_entries = memory_entries
+
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        # key -> (response, created_at), most recently used last
+        self._memory: "OrderedDict[str, tuple]" = OrderedDict()
+        # Memory hits not yet written to accessed_at (flushed before eviction)
+        self._touched: Dict[str, float] = {}
+        self._counters = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0, "expired": 0}
+
+        self._connect().executescript(SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        """This thread's connection (summaries are generated from several threads)"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: str) -> Optional[str]:
+        """Cached response text, None on a miss or an expired entry"""
+        now = time.time()
+
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None and now - entry[1] < self.ttl_seconds:
+                self._memory.move_to_end(key)
+                self._touched[key] = now
+                self._counters["hits"] += 1
+                return entry[0]
+
+        try:
+            conn = self._connect()
+            row = conn.execute("SELECT response, created_at FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is not None and now - row[1] >= self.ttl_seconds:
+                conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._count("expired")
+                row = None
+            if row is None:
+                with self._lock:
+                    self._memory.pop(key, None)
+                self._count("misses")
+                return None
+
+            conn.execute("UPDATE responses SET accessed_at = ?, hits = hits + 1 WHERE key = ?", (now, key))
+        except sqlite3.Error as e:
+            logger.error(f"Response cache read failed: {e}")
+            self._count("misses")
+            return None
+
+        self._remember(key, row[0], row[1])
+        self._count("hits")
+        return row[0]
+
+    def put(self, key: str, response: str, model: Optional[str] = None):
+        """Store a response, evicting the least recently used entries past the cap"""
+        now = time.time()
+        try:
+            conn = self._connect()
+            conn.execute(
+                "INSERT OR REPLACE INTO responses (key, model, response, created_at, accessed_at, hits) "
+                "VALUES (?, ?, ?, ?, ?, 0)",
+                (key, model, response, now, now)
+            )
+            evicted = self._evict(conn, now)
+        except sqlite3.Error as e:
+            logger.error(f"Response cache write failed: {e}")
+            return
+
+        self._remember(key, response, now)
+        with self._lock:
+            self._counters["stores"] += 1
+            self._counters["evictions"] += evicted
+
+    def _evict(self, conn: sqlite3.Connection, now: float) -> int:
+        """Drop expired entries, then the least recently used beyond max_entries"""
+        with self._lock:
+            touched, self._touched = self._touched, {}
+        if touched:
+            conn.executemany("UPDATE responses SET accessed_at = ?, hits = hits + 1 WHERE key = ?",
+                             [(accessed_at, key) for key, accessed_at in touched.items()])
+        removed = conn.execute("DELETE FROM responses WHERE created_at <= ?",
+                               (now - self.ttl_seconds,)).rowcount
+        removed += conn.execute(
+            "DELETE FROM responses WHERE key IN ("
+            "SELECT key FROM responses ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,)
+        ).rowcount
+        if removed:
+            # Memory entries may be gone from disk; they are only a front for it
+            with self._lock:
+                self._memory.clear()
+        return removed
+
+    def _remember(self, key: str, response: str, created_at: float):
+        with self._lock:
+            self._memory[key] = (response, created_at)
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_entries:
+                self._memory.popitem(last=False)
+
+    def _count(self, counter: str):
+        with self._lock:
+            self._counters[counter] += 1
+
+    def clear(self):
+        """Remove every cached response"""
+        self._connect().execute("DELETE FROM responses")
+        with self._lock:
+            self._memory.clear()
+            self._touched.clear()
+
+    def stats(self) -> Dict:
+        """Hit/miss counters for this process and the stored entry count"""
+        entries = self._connect().execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        with self._lock:
+            counters = dict(self._counters)
+        lookups = counters["hits"] + counters["misses"]
+        counters.update(
+            entries=entries,
+            max_entries=self.max_entries,
+            ttl_seconds=self.ttl_seconds,
+            hit_rate=round(counters["hits"] / lookups, 3) if lookups else 0.0
+        )
+        return counters
+
+
+# Caches by absolute path, shared by every engine in the process
+_caches: Dict[str, ResponseCache] = {}
+_caches_lock = threading.Lock()
+
+
+def get_response_cache(db_path: Optional[str] = None) -> Optional[ResponseCache]:
+    """The shared cache for a path (default from the environment), None when disabled"""
+    if os.getenv("EMR_GPT_CACHE", "on").strip().lower() in ("off", "0", "false", "no"):
+        return None
+
+    key = os.path.abspath(db_path or os.getenv("EMR_GPT_CACHE_PATH", DEFAULT_CACHE_PATH))
+    with _caches_lock:
+        cache = _caches.get(key)
+        if cache is None:
+            try:
+                cache = ResponseCache(
+                    key,
+                    ttl_seconds=float(os.getenv("EMR_GPT_CACHE_TTL", DEFAULT_TTL_SECONDS)),
+                    max_entries=int(os.getenv("EMR_GPT_CACHE_MAX", DEFAULT_MAX_ENTRIES))
+                )
+            except (OSError, ValueError, sqlite3.Error) as e:
+                logger.error(f"Response cache unavailable at {key}: {e}")
+                return None
+            _caches[key] = cache
+        return cache
@@ -0,0 +1,177 @@
+"""
+Summary Job Queue
+Runs clinical summary generation in background worker threads
+
+The Streamlit script submits a job and returns at once; later reruns poll
+the job by id and pick up the result, so the doctor can keep entering
+vitals and lab reports while the note is drafted.
+
+    job_id = jobs.submit(gpt_engine.generate_summary, symptoms_text, patient_data)
+    jobs.get_status(job_id)   # {'status': 'running', ...}
+    jobs.cancel(job_id)
+
+Streaming jobs (submit_stream) also expose the summary text received so
+far as 'partial', and stop reading the stream as soon as they are cancelled.
+A queued job is dropped on cancel; a running blocking job finishes its API
+call but its result is discarded.
+"""
+
+import time
+import uuid
+import threading
+from concurrent.futures import ThreadPoolExecutor, Future
+from typing import Callable, Dict, Iterator, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Concurrent summary generations per process
+MAX_WORKERS = 4
+
+# Finished jobs are kept this long for polling, then pruned
+JOB_RETENTION_SECONDS = 15 * 60
+
+STATUS_QUEUED = 'queued'
+STATUS_RUNNING = 'running'
+STATUS_COMPLETED = 'completed'
+STATUS_FAILED = 'failed'
+STATUS_CANCELLED = 'cancelled'
+
+FINISHED_STATUSES = (STATUS_COMPLETED, STATUS_FAILED, STATUS_CANCELLED)
+
+
+class SummaryJobQueue:
+    """Thread-pool job queue with job ids, status polling and cancellation"""
+
+    def __init__(self, max_workers: int = MAX_WORKERS, retention_seconds: float = JOB_RETENTION_SECONDS):
+        self.max_workers = max_workers
+        self.retention_seconds = retention_seconds
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='summary-job')
+        self._jobs: Dict[str, Dict] = {}
+        self._futures: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+
+    def submit(self, func: Callable[..., Dict], *args, **kwargs) -> str:
+        """Queue func(*args, **kwargs) and return the job id"""
+        return self._submit(self._call, func, args, kwargs)
+
+    def submit_stream(self, func: Callable[..., Iterator[Dict]], *args, **kwargs) -> str:
+        """
+        Queue a streaming generator (GPTEngine.generate_summary_stream) and
+        return the job id. Its summary events accumulate in the job's 'partial'.
+        """
+        return self._submit(self._consume_stream, func, args, kwargs)
+
+    def _submit(self, runner: Callable, func: Callable, args, kwargs) -> str:
+        job_id = uuid.uuid4().hex
+        job = {
+            'job_id': job_id,
+            'status': STATUS_QUEUED,
+            'submitted_at': time.time(),
+            'started_at': None,
+            'finished_at': None,
+            'partial': "",
+            'result': None,
+            'error': None
+        }
+
+        with self._lock:
+            self._prune()
+            self._jobs[job_id] = job
+            self._futures[job_id] = self._executor.submit(self._run, job_id, runner, func, args, kwargs)
+
+        logger.debug(f"Summary job {job_id} queued")
+        return job_id
+
+    def _run(self, job_id: str, runner: Callable, func: Callable, args, kwargs):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job['status'] != STATUS_QUEUED:
+                return
+            job['status'] = STATUS_RUNNING
+            job['started_at'] = time.time()
+
+        try:
+            result, error, status = runner(job, func, args, kwargs), None, STATUS_COMPLETED
+        except Exception as e:
+            logger.error(f"Summary job {job_id} failed: {e}")
+            result, error, status = None, str(e), STATUS_FAILED
+
+        with self._lock:
+            self._futures.pop(job_id, None)
+            if job['status'] == STATUS_CANCELLED:
+                # Cancelled while the call was in flight - drop the result
+                return
+            job.update(status=status, result=result, error=error, finished_at=time.time())
+
+    def _call(self, job: Dict, func: Callable[..., Dict], args, kwargs) -> Dict:
+        return func(*args, **kwargs)
+
+    def _consume_stream(self, job: Dict, func: Callable[..., Iterator[Dict]], args, kwargs) -> Optional[Dict]:
+        result = None
+        stream = func(*args, **kwargs)
+        try:
+            for event in stream:
+                if job['status'] == STATUS_CANCELLED:
+                    break
+                if event.get('type') == 'summary':
+                    with self._lock:
+                        job['partial'] += event['text']
+                elif event.get('type') == 'done':
+                    result = event['result']
+        finally:
+            # Closes the HTTP stream when cancelled mid-way
+            stream.close()
+        return result
+
+    def get_status(self, job_id: str) -> Optional[Dict]:
+        """Snapshot of a job (status, timestamps, result once completed), None if unknown"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job is not None else None
+
+    def cancel(self, job_id: str) -> bool:
+        """Cancel a queued or running job; False if it is unknown or already finished"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job['status'] in FINISHED_STATUSES:
+                return False
+
+            future = self._futures.pop(job_id, None)
+            if future is not None:
+                future.cancel()
+            job.update(status=STATUS_CANCELLED, finished_at=time.time())
+
+        logger.debug(f"Summary job {job_id} cancelled")
+        return True
+
+    def stats(self) -> Dict[str, int]:
+        """Number of tracked jobs per status"""
+        with self._lock:
+            counts = {status: 0 for status in (STATUS_QUEUED, STATUS_RUNNING) + FINISHED_STATUSES}
+            for job in self._jobs.values():
+                counts[job['status']] += 1
+            return counts
+
+    def _prune(self):
+        """Forget finished jobs past the retention period (lock held)"""
+        cutoff = time.time() - self.retention_seconds
+        expired = [job_id for job_id, job in self._jobs.items()
+                   if job['status'] in FINISHED_STATUSES and job['finished_at'] < cutoff]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+
+# One queue per process, shared by every Streamlit session
+_job_queue: Optional[SummaryJobQueue] = None
+_job_queue_lock = threading.Lock()
+
+
+def get_job_queue() -> SummaryJobQueue:
+    """The process-wide summary job queue"""
+    global _job_queue
+    if _job_queue is None:
+        with _job_queue_lock:
+            if _job_queue is None:
+                _job_queue = SummaryJobQueue()
+    return _job_queue
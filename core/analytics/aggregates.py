@@ -0,0 +1,321 @@
+"""
+Analytics Aggregates
+Materialized dashboard totals kept current by the patient/visit write paths
+
+Every patient contributes a small, self-contained delta (visit count, age
+group, gender, per-doctor counts, feedback sums, latest visits). The store
+keeps each patient's contribution and the running sums, so a write swaps
+one patient's contribution and dashboard reads never touch visit data.
+"""
+
+import bisect
+import threading
+from typing import Dict, List, Optional, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+AGE_GROUPS = ('0-18', '19-40', '41-60', '60+')
+GENDERS = ('male', 'female', 'other')
+
+# Latest visits taken from each patient, and kept across all patients
+RECENT_PER_PATIENT = 5
+RECENT_LIMIT = 10
+
+# A summary_accuracy at or above this counts as "AI helpful"
+HELPFUL_ACCURACY = 4
+
+
+def _age_group(age) -> str:
+    age = age or 0
+    if age <= 18:
+        return '0-18'
+    elif age <= 40:
+        return '19-40'
+    elif age <= 60:
+        return '41-60'
+    return '60+'
+
+
+def patient_contribution(patient: Dict) -> Dict:
+    """Everything one patient adds to the aggregates (O(visits of that patient))"""
+    visits = patient.get('visits', [])
+    doctors: Dict[str, List[int]] = {}
+    feedback = [0, 0, 0]  # entries, rating sum, helpful
+
+    for visit in visits:
+        doctor = visit.get('doctor')
+        if doctor is not None:
+            counts = doctors.setdefault(doctor, [0, 0, 0])  # visits, summaries, edited
+            counts[0] += 1
+            if visit.get('summary'):
+                counts[1] += 1
+            if visit.get('prescription_edited'):
+                counts[2] += 1
+
+        entries = visit.get('clinician_feedback')
+        if isinstance(entries, list):
+            for entry in entries:
+                feedback[0] += 1
+                feedback[1] += entry.get('overall_rating', 0)
+                if entry.get('summary_accuracy', 0) >= HELPFUL_ACCURACY:
+                    feedback[2] += 1
+
+    sex = str(patient.get('sex', 'other')).lower()
+
+    return {
+        'visits': len(visits),
+        'age_group': _age_group(patient.get('age', 0)),
+        'gender': sex if sex in GENDERS else None,
+        'doctors': doctors,
+        'feedback': feedback,
+        'recent': [
+            {
+                'patient_name': patient.get('name'),
+                'visit_date': visit.get('timestamp', 'Unknown'),
+                'visit_type': visit.get('visit_type', 'OPD')
+            }
+            for visit in visits[-RECENT_PER_PATIENT:]
+        ]
+    }
+
+
+class AnalyticsAggregates:
+    """
+    Running dashboard aggregates for one storage adapter.
+    Built lazily with a single pass over the adapter, then maintained by
+    refresh_patient / remove_patient after each write. Reads compare the
+    adapter's write generation with the one the aggregates reflect, and
+    recompute when any other process (or an unrefreshed write) moved it.
+    """
+
+    def __init__(self, db):
+        self.db = db
+        self._lock = threading.RLock()
+        self._built = False
+        # db.write_generation() the aggregates are current with
+        self._generation: Optional[int] = None
+        self._contributions: Dict[str, Dict] = {}
+        self._reset_totals()
+
+    def _reset_totals(self):
+        self._total_visits = 0
+        self._age_groups = {group: 0 for group in AGE_GROUPS}
+        self._genders = {gender: 0 for gender in GENDERS}
+        self._doctors: Dict[str, List[int]] = {}
+        self._feedback = [0, 0, 0]
+        # Sorted (visit_date, patient_id, index into that patient's 'recent')
+        # for every patient's latest visits; the newest RECENT_LIMIT are shown
+        self._recent: List[Tuple[str, str, int]] = []
+
+    def refresh_patient(self, patient_id: str, patient: Optional[Dict] = None):
+        """Swap in a patient's current contribution (pass the record if already loaded)"""
+        with self._lock:
+            if not self._built:
+                return  # The first read builds from storage anyway
+
+            if patient is None:
+                patient = self.db.load_patient(patient_id)
+            if patient is None:
+                self.remove_patient(patient_id)
+                return
+
+            self._apply(patient_id, patient_contribution(patient))
+            self._follow_own_write()
+
+    def remove_patient(self, patient_id: str):
+        """Drop a deleted patient's contribution"""
+        with self._lock:
+            if self._built:
+                self._apply(patient_id, None)
+                self._follow_own_write()
+
+    def _follow_own_write(self):
+        """
+        Count the write just applied as seen - but only if it is the sole write
+        since the aggregates were last current, otherwise the next read
+        recomputes (lock held)
+        """
+        generation = self.db.write_generation()
+        if generation == self._generation + 1:
+            self._generation = generation
+
+    def recompute(self):
+        """Rebuild every aggregate with a full pass over storage"""
+        with self._lock:
+            # Taken first: a write landing during the pass triggers another recompute
+            generation = self.db.write_generation()
+            self._contributions = {}
+            self._reset_totals()
+
+            for patient in self.db.get_all_patients():
+                self._add(patient['id'], patient_contribution(patient), keep_sorted=False)
+
+            self._recent.sort()
+            self._built = True
+            self._generation = generation
+            logger.info(f"Computed analytics aggregates ({len(self._contributions)} patients)")
+
+    def verify(self, repair: bool = False) -> Dict:
+        """
+        Recompute from storage and compare with the incremental aggregates.
+        Returns {'ok', 'mismatches'}; with repair=True the fresh values are kept.
+        """
+        with self._lock:
+            if not self._built:
+                self.recompute()
+                return {'ok': True, 'mismatches': []}
+
+            incremental = self.snapshot()
+            previous = (self._contributions, self._total_visits, self._age_groups,
+                        self._genders, self._doctors, self._feedback, self._recent, self._generation)
+
+            self.recompute()
+            fresh = self.snapshot()
+
+            mismatches = [key for key in fresh if fresh[key] != incremental[key]]
+            if mismatches:
+                logger.warning(f"Analytics aggregates drifted: {', '.join(mismatches)}")
+
+            if not repair:
+                (self._contributions, self._total_visits, self._age_groups,
+                 self._genders, self._doctors, self._feedback, self._recent, self._generation) = previous
+
+            return {'ok': not mismatches, 'mismatches': mismatches}
+
+    def _apply(self, patient_id: str, contribution: Optional[Dict]):
+        """Replace one patient's contribution (lock held)"""
+        old = self._contributions.pop(patient_id, None)
+        if old is not None:
+            self._subtract(patient_id, old)
+
+        if contribution is not None:
+            self._add(patient_id, contribution)
+
+    def _add(self, patient_id: str, contribution: Dict, keep_sorted: bool = True):
+        self._contributions[patient_id] = contribution
+        self._total_visits += contribution['visits']
+        self._age_groups[contribution['age_group']] += 1
+        if contribution['gender']:
+            self._genders[contribution['gender']] += 1
+
+        for doctor, counts in contribution['doctors'].items():
+            totals = self._doctors.setdefault(doctor, [0, 0, 0])
+            for i, count in enumerate(counts):
+                totals[i] += count
+
+        for i, value in enumerate(contribution['feedback']):
+            self._feedback[i] += value
+
+        for key in self._recent_keys(patient_id, contribution):
+            if keep_sorted:
+                bisect.insort(self._recent, key)
+            else:
+                self._recent.append(key)
+
+    def _subtract(self, patient_id: str, contribution: Dict):
+        self._total_visits -= contribution['visits']
+        self._age_groups[contribution['age_group']] -= 1
+        if contribution['gender']:
+            self._genders[contribution['gender']] -= 1
+
+        for doctor, counts in contribution['doctors'].items():
+            totals = self._doctors[doctor]
+            for i, count in enumerate(counts):
+                totals[i] -= count
+            if totals[0] == 0:
+                del self._doctors[doctor]
+
+        for i, value in enumerate(contribution['feedback']):
+            self._feedback[i] -= value
+
+        for key in self._recent_keys(patient_id, contribution):
+            i = bisect.bisect_left(self._recent, key)
+            if i < len(self._recent) and self._recent[i] == key:
+                del self._recent[i]
+
+    def _recent_keys(self, patient_id: str, contribution: Dict) -> List[Tuple[str, str, int]]:
+        return [(str(entry['visit_date'] or ''), patient_id, i)
+                for i, entry in enumerate(contribution['recent'])]
+
+    def _recent_visits(self) -> List[Dict]:
+        """The newest RECENT_LIMIT visits across all patients (lock held)"""
+        return [
+            dict(self._contributions[patient_id]['recent'][i])
+            for _, patient_id, i in reversed(self._recent[-RECENT_LIMIT:])
+        ]
+
+    def _ensure_built(self):
+        """Build on first use, recompute if storage was written elsewhere (lock held)"""
+        if not self._built or self.db.write_generation() != self._generation:
+            self.recompute()
+
+    def snapshot(self) -> Dict:
+        """All aggregates as plain data (used by verify)"""
+        with self._lock:
+            self._ensure_built()
+            return {
+                'total_patients': len(self._contributions),
+                'total_visits': self._total_visits,
+                'age_distribution': dict(self._age_groups),
+                'gender_distribution': dict(self._genders),
+                'doctors': {doctor: list(counts) for doctor, counts in self._doctors.items()},
+                'feedback': list(self._feedback),
+                'recent_visits': self._recent_visits()
+            }
+
+    def patient_analytics(self) -> Dict:
+        with self._lock:
+            self._ensure_built()
+            total_patients = len(self._contributions)
+            return {
+                'total_patients': total_patients,
+                'total_visits': self._total_visits,
+                'recent_visits': self._recent_visits(),
+                'avg_visits_per_patient': round(self._total_visits / total_patients, 1) if total_patients > 0 else 0
+            }
+
+    def patient_statistics(self) -> Dict:
+        with self._lock:
+            self._ensure_built()
+            return {
+                'total_patients': len(self._contributions),
+                'age_distribution': dict(self._age_groups),
+                'gender_distribution': dict(self._genders)
+            }
+
+    def feedback_stats(self) -> Dict:
+        with self._lock:
+            self._ensure_built()
+            total_feedback, total_rating, helpful = self._feedback
+            return {
+                'total_feedback': total_feedback,
+                'average_rating': round(total_rating / total_feedback, 2) if total_feedback > 0 else 0,
+                'ai_helpful_percentage': round((helpful / total_feedback) * 100, 1) if total_feedback > 0 else 0
+            }
+
+    def doctor_performance(self, doctor_id: str) -> Dict:
+        with self._lock:
+            self._ensure_built()
+            visits_count, summaries_generated, prescriptions_edited = self._doctors.get(doctor_id, (0, 0, 0))
+            return {
+                'total_visits': visits_count,
+                'summaries_generated': summaries_generated,
+                'prescriptions_edited': prescriptions_edited,
+                'ai_usage_rate': round(summaries_generated / visits_count * 100, 1) if visits_count > 0 else 0
+            }
+
+
+# One store per adapter instance, shared by every manager and route using it
+_stores: Dict[int, AnalyticsAggregates] = {}
+_stores_lock = threading.Lock()
+
+
+def get_aggregates(db) -> AnalyticsAggregates:
+    """Get the shared aggregates store for a storage adapter"""
+    with _stores_lock:
+        store = _stores.get(id(db))
+        if store is None or store.db is not db:
+            store = AnalyticsAggregates(db)
+            _stores[id(db)] = store
+        return store
@@ -0,0 +1,213 @@
+"""
+Columnar Visit Export
+Flattens patients and visits into typed NumPy column arrays (one row per visit)
+for vectorized cohort / trend analytics, with DataFrame, .npz, Parquet and
+Arrow IPC output.
+
+    columns = build_visit_columns(db.get_all_patients())
+    df = columns.to_dataframe()
+    df.groupby('doctor', observed=True)['systolic'].mean()
+
+Vitals are parsed to float32 columns with NaN for missing values.
+Parquet / Arrow IPC need `pyarrow`; .npz needs only NumPy.
+"""
+
+import re
+from typing import Dict, Iterable, List, Optional
+import logging
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.feather as feather
+except ImportError:
+    pa = None
+
+logger = logging.getLogger(__name__)
+
+EXPORT_FORMATS = ('npz', 'parquet', 'arrow')
+
+# Column name -> keys the vital has been stored under
+VITAL_KEYS = {
+    'heart_rate': ('heart_rate', 'hr', 'pulse'),
+    'temperature': ('temperature', 'temp'),
+    'spo2': ('spo2', 'oxygen_saturation'),
+    'respiratory_rate': ('respiratory_rate', 'rr'),
+    'weight': ('weight',),
+    'height': ('height',),
+}
+BP_KEYS = ('blood_pressure', 'bp')
+
+VITAL_COLUMNS = ('systolic', 'diastolic') + tuple(VITAL_KEYS)
+STRING_COLUMNS = ('patient_id', 'visit_id', 'visit_type', 'doctor', 'sex')
+# Low-cardinality strings become pandas categoricals
+CATEGORY_COLUMNS = ('visit_type', 'doctor', 'sex')
+
+_NUMBER = re.compile(r'-?\d+(?:\.\d+)?')
+_BP = re.compile(r'(\d+(?:\.\d+)?)\s*/\s*(\d+(?:\.\d+)?)')
+
+# Above this a temperature was entered in Fahrenheit
+FAHRENHEIT_THRESHOLD = 45.0
+
+
+def _number(value) -> float:
+    """Parse a vital to float, NaN if absent or unparseable ("98 bpm" -> 98.0)"""
+    if value is None or isinstance(value, bool):
+        return np.nan
+    if isinstance(value, (int, float)):
+        return float(value) if value else np.nan
+    match = _NUMBER.search(str(value))
+    return float(match.group()) if match else np.nan
+
+
+def _first(vitals: Dict, keys) -> object:
+    for key in keys:
+        if key in vitals:
+            return vitals[key]
+    return None
+
+
+def parse_vitals(vitals: Optional[Dict]) -> Dict[str, float]:
+    """Numeric vitals for one visit, keyed by VITAL_COLUMNS"""
+    if not isinstance(vitals, dict):
+        vitals = {}
+
+    parsed = {column: _number(_first(vitals, keys)) for column, keys in VITAL_KEYS.items()}
+
+    bp = _BP.search(str(_first(vitals, BP_KEYS) or ''))
+    parsed['systolic'] = float(bp.group(1)) if bp else np.nan
+    parsed['diastolic'] = float(bp.group(2)) if bp else np.nan
+
+    # The app records Celsius; older entries may be Fahrenheit
+    if parsed['temperature'] > FAHRENHEIT_THRESHOLD:
+        parsed['temperature'] = (parsed['temperature'] - 32) * 5 / 9
+
+    return parsed
+
+
+def _timestamps(values: List[str]) -> np.ndarray:
+    """ISO strings to datetime64[us], NaT for anything unparseable"""
+    try:
+        return np.array(values, dtype='datetime64[us]')
+    except ValueError:
+        parsed = []
+        for value in values:
+            try:
+                parsed.append(np.datetime64(value, 'us'))
+            except (ValueError, TypeError):
+                parsed.append(np.datetime64('NaT'))
+        return np.array(parsed, dtype='datetime64[us]')
+
+
+class VisitColumns:
+    """One typed NumPy array per column, all the same length (one row per visit)"""
+
+    def __init__(self, columns: Dict[str, np.ndarray]):
+        self.columns = columns
+
+    def __len__(self) -> int:
+        return len(self.columns['visit_id']) if self.columns else 0
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        return self.columns[name]
+
+    def to_dataframe(self) -> pd.DataFrame:
+        df = pd.DataFrame(self.columns, copy=False)
+        for column in CATEGORY_COLUMNS:
+            df[column] = df[column].astype('category')
+        return df
+
+    def save(self, path: str, fmt: str = 'npz') -> Path:
+        """Write the columns as npz, parquet or arrow (IPC / Feather v2)"""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+
+        if fmt == 'npz':
+            np.savez_compressed(path, **self.columns)
+            # savez appends .npz when missing
+            return path if path.suffix == '.npz' else path.with_name(path.name + '.npz')
+
+        if fmt not in EXPORT_FORMATS:
+            raise ValueError(f"Unsupported export format: {fmt}")
+        if pa is None:
+            raise ImportError(f"{fmt} export needs pyarrow (pip install pyarrow)")
+
+        table = pa.Table.from_pandas(self.to_dataframe(), preserve_index=False)
+        if fmt == 'parquet':
+            import pyarrow.parquet as pq
+            pq.write_table(table, path)
+        else:
+            feather.write_feather(table, path)
+        return path
+
+    @classmethod
+    def load(cls, path: str) -> 'VisitColumns':
+        """Read columns back from an .npz, .parquet or .arrow file"""
+        path = Path(path)
+
+        if path.suffix == '.npz':
+            with np.load(path) as data:
+                return cls({name: data[name] for name in data.files})
+
+        if pa is None:
+            raise ImportError(f"Reading {path.suffix} needs pyarrow (pip install pyarrow)")
+
+        if path.suffix == '.parquet':
+            import pyarrow.parquet as pq
+            df = pq.read_table(path).to_pandas()
+        else:
+            df = feather.read_feather(path)
+
+        return cls({
+            name: df[name].astype(str).to_numpy() if name in CATEGORY_COLUMNS else df[name].to_numpy()
+            for name in df.columns
+        })
+
+
+def build_visit_columns(patients: Iterable[Dict]) -> VisitColumns:
+    """Flatten patients and their visits into columns in a single pass"""
+    rows: Dict[str, list] = {
+        name: [] for name in (
+            STRING_COLUMNS + ('timestamp', 'age') + VITAL_COLUMNS +
+            ('has_summary', 'prescription_edited', 'feedback_count', 'feedback_rating')
+        )
+    }
+
+    for patient in patients:
+        patient_id = patient.get('id', '')
+        age = patient.get('age')
+        sex = str(patient.get('sex') or '').lower()
+
+        for visit in patient.get('visits', []):
+            rows['patient_id'].append(patient_id)
+            rows['visit_id'].append(visit.get('visit_id') or '')
+            rows['visit_type'].append(str(visit.get('visit_type') or ''))
+            rows['doctor'].append(str(visit.get('doctor') or ''))
+            rows['sex'].append(sex)
+            rows['timestamp'].append(visit.get('timestamp') or 'NaT')
+            rows['age'].append(age if isinstance(age, (int, float)) else np.nan)
+
+            for column, value in parse_vitals(visit.get('vitals')).items():
+                rows[column].append(value)
+
+            feedback = visit.get('clinician_feedback')
+            ratings = [f.get('overall_rating', 0) for f in feedback] if isinstance(feedback, list) else []
+            rows['has_summary'].append(bool(visit.get('summary')))
+            rows['prescription_edited'].append(bool(visit.get('prescription_edited')))
+            rows['feedback_count'].append(len(ratings))
+            rows['feedback_rating'].append(sum(ratings) / len(ratings) if ratings else np.nan)
+
+    columns = {name: np.array(rows[name], dtype=str) for name in STRING_COLUMNS}
+    columns['timestamp'] = _timestamps(rows['timestamp'])
+    columns['age'] = np.array(rows['age'], dtype=np.float32)
+    for name in VITAL_COLUMNS:
+        columns[name] = np.array(rows[name], dtype=np.float32)
+    columns['has_summary'] = np.array(rows['has_summary'], dtype=bool)
+    columns['prescription_edited'] = np.array(rows['prescription_edited'], dtype=bool)
+    columns['feedback_count'] = np.array(rows['feedback_count'], dtype=np.int32)
+    columns['feedback_rating'] = np.array(rows['feedback_rating'], dtype=np.float32)
+
+    return VisitColumns(columns)
@@ -1,282 +1,155 @@
 """
 Vitals Validator Service
-Simple validation for vital signs with clinical ranges
+Validation for vital signs with the shared physiology rules engine
+
+All vitals checks (registration, visits, display and PDF / Word export) use
+one PhysiologyEngine compiled from data/config/physiological_ranges.json.
+A visit's result is computed once, stored on the visit as 'vitals_validation'
+and reused until the vitals or the rules change.
 """
 
+import json
 from typing import Dict, List, Optional
 import logging
 
+from utils.medical_validator_v2 import PhysiologyEngine, get_engine
+
 logger = logging.getLogger(__name__)
 
+# Age used when the patient's age is unknown
+DEFAULT_AGE = 30
+
+# Other keys vitals are stored under -> engine vital name
+VITAL_ALIASES = {
+    'spo2': 'oxygen_saturation',
+    'bp': 'blood_pressure',
+    'pulse': 'heart_rate',
+    'hr': 'heart_rate',
+    'temp': 'temperature',
+    'rr': 'respiratory_rate'
+}
+
+# Engine vital -> (label, display format) for findings lines, in display order
+FINDING_FORMATS = {
+    'blood_pressure': ('BP', "{normalized}"),
+    'heart_rate': ('Heart Rate', "{value:g} bpm"),
+    'temperature': ('Temperature', "{normalized}"),
+    'oxygen_saturation': ('SpO2', "{value:g}%"),
+    'respiratory_rate': ('RR', "{value:g}/min")
+}
+
+SEVERITY = {'Normal': 'normal', 'Caution': 'moderate', 'Critical': 'critical'}
+
+
+def normalize_vitals(vitals: Optional[Dict]) -> Dict:
+    """Vitals keyed by engine vital name, without empty values"""
+    normalized = {}
+    for key, value in (vitals or {}).items():
+        if value in (None, '', 0):
+            continue
+        normalized.setdefault(VITAL_ALIASES.get(key, key), value)
+    return normalized
+
+
+def vitals_key(vitals: Optional[Dict]) -> str:
+    """Stable fingerprint of the entered vitals (detects edits after validation)"""
+    return json.dumps(vitals or {}, sort_keys=True, default=str)
+
 
 class VitalsValidator:
-    """Validates vital signs against physiological ranges"""
-    
-    def __init__(self):
-        # Basic physiological ranges
-        self.ranges = {
-            'blood_pressure': {
-                'systolic': {'min': 70, 'max': 200, 'normal_min': 90, 'normal_max': 140},
-                'diastolic': {'min': 40, 'max': 130, 'normal_min': 60, 'normal_max': 90}
-            },
-            'heart_rate': {
-                'adult': {'min': 40, 'max': 180, 'normal_min': 60, 'normal_max': 100},
-                'child': {'min': 70, 'max': 190, 'normal_min': 80, 'normal_max': 130},
-                'infant': {'min': 100, 'max': 200, 'normal_min': 110, 'normal_max': 160}
-            },
-            'temperature': {
-                'celsius': {'min': 35.0, 'max': 42.0, 'normal_min': 36.1, 'normal_max': 37.8},
-                'fahrenheit': {'min': 95.0, 'max': 107.6, 'normal_min': 97.0, 'normal_max': 100.0}
-            },
-            'respiratory_rate': {
-                'adult': {'min': 8, 'max': 40, 'normal_min': 12, 'normal_max': 20},
-                'child': {'min': 15, 'max': 50, 'normal_min': 20, 'normal_max': 30},
-                'infant': {'min': 25, 'max': 70, 'normal_min': 30, 'normal_max': 50}
-            },
-            'spo2': {
-                'all': {'min': 70, 'max': 100, 'normal_min': 95, 'normal_max': 100}
-            }
-        }
-    
-    def validate_vitals(self, vitals: Dict, age: int = 30, sex: str = 'unknown') -> Dict:
+    """Validates vital signs against the shared physiological ranges"""
+
+    def __init__(self, engine: Optional[PhysiologyEngine] = None):
+        self.engine = engine or get_engine()
+
+    def validate_vitals(self, vitals: Dict, age: Optional[float] = DEFAULT_AGE, sex: str = 'unknown',
+                        context: Optional[List[str]] = None) -> Dict:
         """
-        Validate vital signs and return status with alerts
+        Validate vital signs and return status with alerts.
+        The result also carries display-ready findings and the rules version,
+        so it can be stored on the visit and reused as-is.
         """
-        validation_result = {
-            'status': 'normal',
-            'alerts': [],
-            'suggestions': [],
-            'details': {}
+        normalized = normalize_vitals(vitals)
+        engine_input, invalid = {}, []
+
+        for vital in FINDING_FORMATS:
+            if vital not in normalized:
+                continue
+            value = normalized[vital]
+            if vital in ('blood_pressure', 'temperature'):
+                # Parsed (with units) by the engine
+                engine_input[vital] = str(value)
+                continue
+            try:
+                engine_input[vital] = float(value)
+            except (TypeError, ValueError):
+                invalid.append(vital)
+
+        if not isinstance(age, (int, float)) or isinstance(age, bool):
+            age = DEFAULT_AGE
+        result = self.engine.validate(engine_input, age, sex, context)
+        details = result['details']
+
+        # Anything entered that the engine could not parse
+        invalid.extend(vital for vital in engine_input if vital not in details)
+        alerts = list(result['messages'])
+        alerts.extend(f"Invalid {FINDING_FORMATS[vital][0]} value: {normalized[vital]}" for vital in invalid)
+
+        assessment = result['assessment']
+        return {
+            'status': 'normal' if assessment == 'Normal' and not invalid else 'abnormal',
+            'severity': SEVERITY[assessment],
+            'assessment': assessment,
+            'alerts': alerts,
+            'suggestions': result['suggestions'],
+            'details': details,
+            'findings': self._findings(normalized, details),
+            'age_category': result['age_category'],
+            'rules_version': self.engine.rules_version,
+            'vitals_key': vitals_key(vitals)
         }
-        
-        # Determine age category
-        age_category = self._get_age_category(age)
-        
-        # Validate each vital sign
-        if 'blood_pressure' in vitals and vitals['blood_pressure']:
-            bp_result = self._validate_blood_pressure(vitals['blood_pressure'])
-            if bp_result['status'] != 'normal':
-                validation_result['status'] = 'abnormal'
-                validation_result['alerts'].extend(bp_result['alerts'])
-                validation_result['suggestions'].extend(bp_result['suggestions'])
-            validation_result['details']['blood_pressure'] = bp_result
-        
-        if 'heart_rate' in vitals and vitals['heart_rate']:
-            hr_result = self._validate_heart_rate(vitals['heart_rate'], age_category)
-            if hr_result['status'] != 'normal':
-                validation_result['status'] = 'abnormal'
-                validation_result['alerts'].extend(hr_result['alerts'])
-                validation_result['suggestions'].extend(hr_result['suggestions'])
-            validation_result['details']['heart_rate'] = hr_result
-        
-        if 'temperature' in vitals and vitals['temperature']:
-            temp_result = self._validate_temperature(vitals['temperature'])
-            if temp_result['status'] != 'normal':
-                validation_result['status'] = 'abnormal'
-                validation_result['alerts'].extend(temp_result['alerts'])
-                validation_result['suggestions'].extend(temp_result['suggestions'])
-            validation_result['details']['temperature'] = temp_result
-        
-        if 'respiratory_rate' in vitals and vitals['respiratory_rate']:
-            rr_result = self._validate_respiratory_rate(vitals['respiratory_rate'], age_category)
-            if rr_result['status'] != 'normal':
-                validation_result['status'] = 'abnormal'
-                validation_result['alerts'].extend(rr_result['alerts'])
-                validation_result['suggestions'].extend(rr_result['suggestions'])
-            validation_result['details']['respiratory_rate'] = rr_result
-        
-        if 'spo2' in vitals and vitals['spo2']:
-            spo2_result = self._validate_spo2(vitals['spo2'])
-            if spo2_result['status'] != 'normal':
-                validation_result['status'] = 'abnormal'
-                validation_result['alerts'].extend(spo2_result['alerts'])
-                validation_result['suggestions'].extend(spo2_result['suggestions'])
-            validation_result['details']['spo2'] = spo2_result
-        
-        # Determine overall severity
-        if validation_result['alerts']:
-            critical_count = sum(1 for alert in validation_result['alerts'] if 'critical' in alert.lower())
-            if critical_count > 0:
-                validation_result['severity'] = 'critical'
+
+    def is_current(self, validation: Optional[Dict], vitals: Optional[Dict]) -> bool:
+        """True if a stored result was computed from these vitals with the current rules"""
+        return (isinstance(validation, dict) and
+                validation.get('rules_version') == self.engine.rules_version and
+                validation.get('vitals_key') == vitals_key(vitals))
+
+    def visit_validation(self, visit: Dict, patient: Optional[Dict] = None) -> Optional[Dict]:
+        """
+        The visit's vitals validation: the stored result when still current,
+        otherwise recomputed (not saved) from the visit's vitals
+        """
+        vitals = visit.get('vitals')
+        if not isinstance(vitals, dict) or not vitals:
+            return None
+
+        cached = visit.get('vitals_validation')
+        if self.is_current(cached, vitals):
+            return cached
+
+        patient = patient or {}
+        return self.validate_vitals(vitals, patient.get('age', DEFAULT_AGE), patient.get('sex', 'unknown'))
+
+    def _findings(self, normalized: Dict, details: Dict) -> Dict[str, List[str]]:
+        """Display lines grouped as critical / urgent / normal"""
+        findings = {'critical': [], 'urgent': [], 'normal': []}
+
+        for vital, (label, display) in FINDING_FORMATS.items():
+            if vital not in normalized:
+                continue
+            detail = details.get(vital)
+            if detail is None:
+                # Entered but unparseable - show as recorded
+                findings['normal'].append(f"✓ {label}: {normalized[vital]}")
+                continue
+
+            text = display.format(**detail)
+            if detail['assessment'] == 'Critical':
+                findings['critical'].append(f"🔴 CRITICAL {label}: {text}")
+            elif detail['assessment'] == 'Caution':
+                findings['urgent'].append(f"🟡 {label}: {text}")
             else:
-                validation_result['severity'] = 'moderate'
-        else:
-            validation_result['severity'] = 'normal'
-        
-        return validation_result
-    
-    def _get_age_category(self, age: int) -> str:
-        """Determine age category for vital sign ranges"""
-        if age < 1:
-            return 'infant'
-        elif age < 12:
-            return 'child'
-        else:
-            return 'adult'
-    
-    def _validate_blood_pressure(self, bp_string: str) -> Dict:
-        """Validate blood pressure values"""
-        try:
-            # Parse BP string (e.g., "120/80")
-            parts = bp_string.strip().split('/')
-            if len(parts) != 2:
-                return {
-                    'status': 'error',
-                    'alerts': ['Invalid blood pressure format'],
-                    'suggestions': ['Please enter BP as systolic/diastolic (e.g., 120/80)']
-                }
-            
-            systolic = int(parts[0])
-            diastolic = int(parts[1])
-            
-            result = {
-                'status': 'normal',
-                'alerts': [],
-                'suggestions': [],
-                'values': {'systolic': systolic, 'diastolic': diastolic}
-            }
-            
-            # Check ranges
-            sys_range = self.ranges['blood_pressure']['systolic']
-            dia_range = self.ranges['blood_pressure']['diastolic']
-            
-            # Critical values
-            if systolic < sys_range['min'] or systolic > sys_range['max']:
-                result['status'] = 'critical'
-                result['alerts'].append(f'Critical: Systolic BP {systolic} mmHg')
-                result['suggestions'].append('Immediate medical attention required')
-            elif systolic < sys_range['normal_min']:
-                result['status'] = 'abnormal'
-                result['alerts'].append(f'Low systolic BP: {systolic} mmHg')
-                result['suggestions'].append('Monitor for hypotension symptoms')
-            elif systolic > sys_range['normal_max']:
-                result['status'] = 'abnormal'
-                result['alerts'].append(f'High systolic BP: {systolic} mmHg')
-                result['suggestions'].append('Consider antihypertensive evaluation')
-            
-            if diastolic < dia_range['min'] or diastolic > dia_range['max']:
-                result['status'] = 'critical'
-                result['alerts'].append(f'Critical: Diastolic BP {diastolic} mmHg')
-                result['suggestions'].append('Immediate medical attention required')
-            elif diastolic < dia_range['normal_min']:
-                result['status'] = 'abnormal'
-                result['alerts'].append(f'Low diastolic BP: {diastolic} mmHg')
-            elif diastolic > dia_range['normal_max']:
-                result['status'] = 'abnormal'
-                result['alerts'].append(f'High diastolic BP: {diastolic} mmHg')
-            
-            return result
-            
-        except ValueError:
-            return {
-                'status': 'error',
-                'alerts': ['Invalid blood pressure values'],
-                'suggestions': ['Please enter numeric values']
-            }
-    
-    def _validate_heart_rate(self, hr: int, age_category: str) -> Dict:
-        """Validate heart rate"""
-        hr_range = self.ranges['heart_rate'][age_category]
-        
-        result = {
-            'status': 'normal',
-            'alerts': [],
-            'suggestions': [],
-            'value': hr
-        }
-        
-        if hr < hr_range['min'] or hr > hr_range['max']:
-            result['status'] = 'critical'
-            result['alerts'].append(f'Critical: Heart rate {hr} bpm')
-            result['suggestions'].append('Immediate cardiac evaluation needed')
-        elif hr < hr_range['normal_min']:
-            result['status'] = 'abnormal'
-            result['alerts'].append(f'Bradycardia: {hr} bpm')
-            result['suggestions'].append('Monitor for symptoms, consider ECG')
-        elif hr > hr_range['normal_max']:
-            result['status'] = 'abnormal'
-            result['alerts'].append(f'Tachycardia: {hr} bpm')
-            result['suggestions'].append('Evaluate for underlying causes')
-        
-        return result
-    
-    def _validate_temperature(self, temp: float) -> Dict:
-        """Validate temperature"""
-        # Determine if Celsius or Fahrenheit
-        if temp > 50:  # Likely Fahrenheit
-            temp_range = self.ranges['temperature']['fahrenheit']
-            unit = '°F'
-        else:
-            temp_range = self.ranges['temperature']['celsius']
-            unit = '°C'
-        
-        result = {
-            'status': 'normal',
-            'alerts': [],
-            'suggestions': [],
-            'value': temp,
-            'unit': unit
-        }
-        
-        if temp < temp_range['min'] or temp > temp_range['max']:
-            result['status'] = 'critical'
-            result['alerts'].append(f'Critical: Temperature {temp}{unit}')
-            result['suggestions'].append('Immediate medical attention required')
-        elif temp < temp_range['normal_min']:
-            result['status'] = 'abnormal'
-            result['alerts'].append(f'Hypothermia: {temp}{unit}')
-            result['suggestions'].append('Warm patient, monitor closely')
-        elif temp > temp_range['normal_max']:
-            result['status'] = 'abnormal'
-            result['alerts'].append(f'Fever: {temp}{unit}')
-            result['suggestions'].append('Consider antipyretics, investigate cause')
-        
-        return result
-    
-    def _validate_respiratory_rate(self, rr: int, age_category: str) -> Dict:
-        """Validate respiratory rate"""
-        rr_range = self.ranges['respiratory_rate'][age_category]
-        
-        result = {
-            'status': 'normal',
-            'alerts': [],
-            'suggestions': [],
-            'value': rr
-        }
-        
-        if rr < rr_range['min'] or rr > rr_range['max']:
-            result['status'] = 'critical'
-            result['alerts'].append(f'Critical: Respiratory rate {rr}/min')
-            result['suggestions'].append('Assess airway and breathing immediately')
-        elif rr < rr_range['normal_min']:
-            result['status'] = 'abnormal'
-            result['alerts'].append(f'Bradypnea: {rr}/min')
-            result['suggestions'].append('Monitor for respiratory depression')
-        elif rr > rr_range['normal_max']:
-            result['status'] = 'abnormal'
-            result['alerts'].append(f'Tachypnea: {rr}/min')
-            result['suggestions'].append('Evaluate for respiratory distress')
-        
-        return result
-    
-    def _validate_spo2(self, spo2: int) -> Dict:
-        """Validate oxygen saturation"""
-        spo2_range = self.ranges['spo2']['all']
-        
-        result = {
-            'status': 'normal',
-            'alerts': [],
-            'suggestions': [],
-            'value': spo2
-        }
-        
-        if spo2 < spo2_range['min']:
-            result['status'] = 'critical'
-            result['alerts'].append(f'Critical: SpO2 {spo2}%')
-            result['suggestions'].append('Administer oxygen immediately')
-        elif spo2 < spo2_range['normal_min']:
-            result['status'] = 'abnormal'
-            result['alerts'].append(f'Hypoxemia: SpO2 {spo2}%')
-            result['suggestions'].append('Consider supplemental oxygen')
-        
-        return result
\ No newline at end of file
+                findings['normal'].append(f"✓ {label}: {text} (Normal)")
+
+        return findings
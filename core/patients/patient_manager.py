@@ -4,21 +4,38 @@ Handles all patient-related operations
 """
 
 import uuid
-from typing import Dict, List, Optional
+import time
+from itertools import islice
+from typing import Dict, Iterable, List, Optional, Tuple
 from datetime import datetime
 import logging
 
+from pydantic import TypeAdapter, ValidationError
+
 from data.db.json_adapter import JSONAdapter
+from data.db.locking import VersionConflictError
+from data.db.id_generator import new_patient_id
+from core.analytics.aggregates import get_aggregates
 from core.patients.patient_model import PatientCreate, PatientUpdate
 
 logger = logging.getLogger(__name__)
 
+# Read-modify-write attempts before giving up on a busy patient record
+MAX_WRITE_ATTEMPTS = 3
+
+# Rows validated and written together by create_patients_bulk
+BULK_BATCH_SIZE = 500
+
+# Validates a whole batch of rows in one pydantic-core call
+_patient_batch_validator = TypeAdapter(List[PatientCreate])
+
 
 class PatientManager:
     """Manages patient CRUD operations"""
     
     def __init__(self, data_adapter: JSONAdapter):
         self.db = data_adapter
+        self.aggregates = get_aggregates(data_adapter)
     
     def create_patient(self, patient_data: PatientCreate) -> Dict:
         """
@@ -37,24 +54,19 @@ class PatientManager:
             }
         
         # Create patient record
-        patient_record = {
-            "id": patient_id,
-            "name": patient_data.name,
-            "age": patient_data.age,
-            "sex": patient_data.sex,
-            "mobile": patient_data.mobile,
-            "blood_group": patient_data.blood_group,
-            "allergies": patient_data.allergies,
-            "chronic_conditions": patient_data.chronic_conditions,
-            "created_at": datetime.now().isoformat(),
-            "updated_at": datetime.now().isoformat(),
-            "visits": []
-        }
+        patient_record = self._new_patient_record(patient_id, patient_data)
         
-        # Save to database
-        success = self.db.save_patient(patient_record)
+        # Save to database - expected_version=0 refuses to overwrite an existing record
+        try:
+            success = self.db.save_patient(patient_record, expected_version=0)
+        except VersionConflictError:
+            return {
+                "success": False,
+                "message": "Patient ID already in use, please try again"
+            }
         
         if success:
+            self.aggregates.refresh_patient(patient_id, patient_record)
             logger.info(f"Created patient {patient_id}: {patient_data.name}")
             return {
                 "success": True,
@@ -67,42 +79,126 @@ class PatientManager:
                 "message": "Failed to save patient data"
             }
     
+    def create_patients_bulk(self, rows: Iterable[Dict], batch_size: int = BULK_BATCH_SIZE) -> Dict:
+        """
+        Register many patients at once (e.g. onboarding a clinic's spreadsheet).
+        Rows are validated with PatientCreate a batch at a time, checked for
+        duplicate mobiles against the mobile index and earlier rows, and
+        written in chunks. Returns a per-row report with throughput stats.
+        """
+        started = time.perf_counter()
+        results = []
+        counts = {'created': 0, 'duplicate': 0, 'invalid': 0, 'failed': 0}
+        # mobile -> patient id for rows registered earlier in this upload
+        seen_mobiles: Dict[str, str] = {}
+        
+        numbered = enumerate(rows, 1)
+        while True:
+            batch = list(islice(numbered, max(1, batch_size)))
+            if not batch:
+                break
+            
+            pending = []
+            for (row_number, _), (patient, error) in zip(batch, self._validate_batch([row for _, row in batch])):
+                if error:
+                    results.append({"row": row_number, "status": "invalid",
+                                    "message": f"Validation error: {error}"})
+                    counts['invalid'] += 1
+                    continue
+                
+                existing_id = seen_mobiles.get(patient.mobile) or self.db.find_patient_id_by_mobile(patient.mobile)
+                if existing_id:
+                    results.append({"row": row_number, "status": "duplicate",
+                                    "existing_patient_id": existing_id,
+                                    "message": "Patient with this mobile number already exists"})
+                    counts['duplicate'] += 1
+                    continue
+                
+                record = self._new_patient_record(self._generate_patient_id(), patient)
+                record['version'] = 1
+                seen_mobiles[patient.mobile] = record['id']
+                pending.append((row_number, record))
+            
+            for row_number, record, saved in self._save_chunk(pending):
+                if saved:
+                    self.aggregates.refresh_patient(record['id'], record)
+                    results.append({"row": row_number, "status": "created", "patient_id": record['id']})
+                    counts['created'] += 1
+                else:
+                    results.append({"row": row_number, "status": "failed",
+                                    "message": "Failed to save patient data"})
+                    counts['failed'] += 1
+                    seen_mobiles.pop(record['mobile'], None)
+        
+        results.sort(key=lambda result: result['row'])
+        elapsed = time.perf_counter() - started
+        total = len(results)
+        logger.info(f"Bulk registration: {counts['created']} of {total} rows created in {elapsed:.1f}s")
+        
+        return {
+            "success": counts['failed'] == 0,
+            "message": f"Registered {counts['created']} of {total} patients",
+            "total": total,
+            "created": counts['created'],
+            "duplicates": counts['duplicate'],
+            "invalid": counts['invalid'],
+            "failed": counts['failed'],
+            "elapsed_seconds": round(elapsed, 2),
+            "rows_per_second": round(total / elapsed, 1) if elapsed > 0 else 0,
+            "results": results
+        }
+    
     def get_patient(self, patient_id: str) -> Optional[Dict]:
         """Get patient by ID"""
         return self.db.load_patient(patient_id)
     
     def get_all_patients(self) -> List[Dict]:
-        """Get all patients with summary info"""
-        patients = self.db.get_all_patients()
-        
-        # Add summary info
-        for patient in patients:
-            patient['visit_count'] = len(patient.get('visits', []))
-            patient['last_visit'] = self._get_last_visit_date(patient)
-        
-        return patients
+        """
+        Get all patients with summary info (id, name, mobile, age, sex,
+        visit_count, last_visit) - visits are not loaded, use get_patient for those
+        """
+        # Copies - the adapter's summaries are shared
+        return [dict(summary) for summary in self.db.get_patient_summaries()]
+    
+    def get_patient_count(self) -> int:
+        """Get total number of patients"""
+        return self.db.get_patient_count()
     
     def update_patient(self, patient_id: str, updates: PatientUpdate) -> Dict:
         """Update patient information"""
-        patient = self.db.load_patient(patient_id)
-        if not patient:
-            return {
-                "success": False,
-                "message": "Patient not found"
-            }
-        
         # Update only provided fields
         update_dict = updates.model_dump(exclude_unset=True)
-        for field, value in update_dict.items():
-            if value is not None:
-                patient[field] = value
-        
-        patient['updated_at'] = datetime.now().isoformat()
         
-        # Save updated patient
-        success = self.db.save_patient(patient)
+        # Optimistic concurrency: a visit saved between our read and write
+        # bumps the version, so re-read and re-apply instead of dropping it
+        for _ in range(MAX_WRITE_ATTEMPTS):
+            patient = self.db.load_patient(patient_id)
+            if not patient:
+                return {
+                    "success": False,
+                    "message": "Patient not found"
+                }
+            
+            for field, value in update_dict.items():
+                if value is not None:
+                    patient[field] = value
+            
+            patient['updated_at'] = datetime.now().isoformat()
+            
+            # Save updated patient
+            try:
+                success = self.db.save_patient(patient, expected_version=patient.get('version', 0))
+                break
+            except VersionConflictError as e:
+                logger.info(f"Retrying update for patient {patient_id}: {e}")
+        else:
+            return {
+                "success": False,
+                "message": "Patient record is busy, please try again"
+            }
         
         if success:
+            self.aggregates.refresh_patient(patient_id, patient)
             return {
                 "success": True,
                 "message": "Patient updated successfully"
@@ -113,24 +209,25 @@ class PatientManager:
                 "message": "Failed to update patient"
             }
     
-    def search_patients(self, search_term: str) -> List[Dict]:
-        """Search patients by name or mobile"""
-        all_patients = self.get_all_patients()
-        search_lower = search_term.lower()
+    def search_patients(self, search_term: str, limit: int = 20) -> List[Dict]:
+        """Search patients by name or mobile, best matches first"""
+        patients = self.db.search_patients(search_term, limit)
         
-        results = []
-        for patient in all_patients:
-            if (search_lower in patient['name'].lower() or 
-                search_term in patient['mobile']):
-                results.append(patient)
-        
-        return results
+        return [
+            {
+                **patient,
+                'visit_count': patient.get('visit_count', len(patient.get('visits', []))),
+                'last_visit': self._get_last_visit_date(patient)
+            }
+            for patient in patients
+        ]
     
     def delete_patient(self, patient_id: str) -> Dict:
         """Delete patient record"""
         success = self.db.delete_patient(patient_id)
         
         if success:
+            self.aggregates.remove_patient(patient_id)
             return {
                 "success": True,
                 "message": "Patient deleted successfully"
@@ -141,33 +238,76 @@ class PatientManager:
                 "message": "Failed to delete patient"
             }
     
+    def _new_patient_record(self, patient_id: str, patient_data: PatientCreate) -> Dict:
+        """Build the stored record for a newly registered patient"""
+        now = datetime.now().isoformat()
+        return {
+            "id": patient_id,
+            "name": patient_data.name,
+            "age": patient_data.age,
+            "sex": patient_data.sex,
+            "mobile": patient_data.mobile,
+            "blood_group": patient_data.blood_group,
+            "allergies": patient_data.allergies,
+            "chronic_conditions": patient_data.chronic_conditions,
+            "created_at": now,
+            "updated_at": now,
+            "visits": []
+        }
+    
+    def _validate_batch(self, rows: List[Dict]) -> List[Tuple[Optional[PatientCreate], Optional[str]]]:
+        """
+        Validate rows as one list; only if some fail are the good rows
+        validated again without them. Returns (patient, error) per row.
+        """
+        try:
+            return [(patient, None) for patient in _patient_batch_validator.validate_python(rows)]
+        except ValidationError as e:
+            errors: Dict[int, List[str]] = {}
+            for err in e.errors():
+                index, *field = err['loc']
+                label = '.'.join(str(part) for part in field) or 'row'
+                errors.setdefault(index, []).append(f"{label}: {err['msg']}")
+        
+        good_rows = [row for i, row in enumerate(rows) if i not in errors]
+        valid = iter(_patient_batch_validator.validate_python(good_rows) if good_rows else [])
+        
+        return [
+            (None, '; '.join(errors[i])) if i in errors else (next(valid), None)
+            for i in range(len(rows))
+        ]
+    
+    def _save_chunk(self, pending: List[Tuple[int, Dict]]) -> List[Tuple[int, Dict, bool]]:
+        """Write one chunk of new records, reporting which of them reached storage"""
+        if not pending:
+            return []
+        
+        try:
+            self.db.save_patients([record for _, record in pending])
+            return [(row_number, record, True) for row_number, record in pending]
+        except Exception as e:
+            logger.error(f"Error saving bulk registration chunk: {e}")
+            # The chunk may have stopped part way - report what actually landed
+            return [
+                (row_number, record, self.db.patient_exists(record['id']))
+                for row_number, record in pending
+            ]
+    
     def _generate_patient_id(self) -> str:
-        """Generate unique patient ID"""
-        timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
-        return f"P{timestamp}"
+        """Generate unique, time-ordered patient ID"""
+        return new_patient_id()
     
     def _find_patient_by_mobile(self, mobile: str) -> Optional[Dict]:
         """Find patient by mobile number"""
-        all_patients = self.db.get_all_patients()
-        for patient in all_patients:
-            if patient.get('mobile') == mobile:
-                return patient
+        patient_id = self.db.find_patient_id_by_mobile(mobile)
+        if patient_id:
+            return self.db.load_patient(patient_id)
         return None
     
     def _get_last_visit_date(self, patient: Dict) -> Optional[str]:
-        """Get the date of last visit"""
-        visits = patient.get('visits', [])
-        if not visits:
-            return None
-        
-        # Sort by timestamp and get the latest
-        sorted_visits = sorted(visits, 
-                             key=lambda x: x.get('timestamp', ''), 
-                             reverse=True)
-        
-        if sorted_visits:
-            timestamp = sorted_visits[0].get('timestamp', '')
-            if timestamp:
-                return timestamp.split('T')[0]  # Return date part only
+        """Get the date of last visit (stored on the record, no visit scan)"""
+        timestamp = patient.get('last_visit_timestamp')
+        if timestamp:
+            return timestamp.split('T')[0]  # Return date part only
         
         return None
\ No newline at end of file
@@ -6,14 +6,20 @@ Handles all visit-related operations WITHOUT disease detection or symptom tracki
 import os
 import json
 from datetime import datetime
-from typing import Dict, List, Optional
+from typing import Callable, Dict, List, Optional
 import logging
 
 from data.db.json_adapter import JSONAdapter
+from data.db.locking import VersionConflictError
+from data.db.id_generator import new_visit_id
 from core.clinical.vitals_validator import VitalsValidator
+from core.analytics.aggregates import get_aggregates
 
 logger = logging.getLogger(__name__)
 
+# Read-check-write attempts before giving up on a busy patient record
+MAX_WRITE_ATTEMPTS = 3
+
 
 class VisitManager:
     """Manages patient visits and consultations - LEAN VERSION"""
@@ -21,85 +27,72 @@ class VisitManager:
     def __init__(self, data_adapter: JSONAdapter):
         self.db = data_adapter
         self.vitals_validator = VitalsValidator()
+        self.aggregates = get_aggregates(data_adapter)
     
-    def create_visit(self, patient_id: str, visit_data: Dict) -> Dict:
+    def create_visit(self, patient_id: str, visit_data: Dict,
+                     expected_version: Optional[int] = None) -> Dict:
         """
         Create a new visit for a patient - SIMPLIFIED
         """
-        patient_data = self.db.load_patient(patient_id)
-        if not patient_data:
-            return {"success": False, "message": "Patient not found"}
-        
-        # Generate visit ID and timestamp
-        visit_data['visit_id'] = self._generate_visit_id()
-        visit_data['timestamp'] = datetime.now().isoformat()
-        
-        # Validate vitals if present
-        vitals_validation = None
-        if 'vitals' in visit_data and visit_data['vitals']:
-            vitals_validation = self.vitals_validator.validate_vitals(
-                visit_data['vitals'],
-                patient_data.get('age', 30),
-                patient_data.get('sex', 'unknown')
-            )
-            visit_data['vitals_validation'] = vitals_validation
-        
-        # Add visit to patient record
-        if 'visits' not in patient_data:
-            patient_data['visits'] = []
-        patient_data['visits'].append(visit_data)
-        
-        # Save updated patient data
-        success = self.db.save_patient(patient_data)
+        def write(patient_data: Dict, version: int) -> Dict:
+            # Generate visit ID and timestamp
+            visit_data['visit_id'] = self._generate_visit_id()
+            visit_data['timestamp'] = datetime.now().isoformat()
+            
+            # Validate vitals if present
+            vitals_validation = None
+            if 'vitals' in visit_data and visit_data['vitals']:
+                vitals_validation = self.vitals_validator.validate_vitals(
+                    visit_data['vitals'],
+                    patient_data.get('age', 30),
+                    patient_data.get('sex', 'unknown')
+                )
+                visit_data['vitals_validation'] = vitals_validation
+            
+            # Append visit to the patient's visit journal (no full-file rewrite).
+            # Appends commute, so only check the version if the caller pinned one
+            success = self.db.append_visit(patient_id, visit_data, expected_version=expected_version)
+            
+            if success:
+                logger.info(f"Created visit {visit_data['visit_id']} for patient {patient_id}")
+                return {
+                    "success": True,
+                    "visit_id": visit_data['visit_id'],
+                    "vitals_validation": vitals_validation
+                }
+            else:
+                return {
+                    "success": False,
+                    "message": "Failed to save visit"
+                }
         
-        if success:
-            logger.info(f"Created visit {visit_data['visit_id']} for patient {patient_id}")
-            return {
-                "success": True,
-                "visit_id": visit_data['visit_id'],
-                "vitals_validation": vitals_validation
-            }
-        else:
-            return {
-                "success": False,
-                "message": "Failed to save visit"
-            }
+        return self._versioned_write(patient_id, expected_version, write)
     
     def update_consultation(self, patient_id: str, visit_id: str, 
-                          consultation_data: Dict) -> Dict:
+                          consultation_data: Dict,
+                          expected_version: Optional[int] = None) -> Dict:
         """
         Update visit with consultation data - SIMPLIFIED
         """
-        patient_data = self.db.load_patient(patient_id)
-        if not patient_data:
-            return {"success": False, "message": "Patient not found"}
-        
-        # Find the visit
-        visit_index = None
-        for i, visit in enumerate(patient_data.get('visits', [])):
-            if visit.get('visit_id') == visit_id:
-                visit_index = i
-                break
-        
-        if visit_index is None:
-            return {"success": False, "message": "Visit not found"}
-        
-        # Update visit with consultation data
-        visit = patient_data['visits'][visit_index]
-        visit.update({
-            'summary': consultation_data.get('summary', ''),
-            'prescription': consultation_data.get('prescription', ''),
-            'consultation_timestamp': datetime.now().isoformat(),
-            'format_type': consultation_data.get('format_type', 'SOAP')
-        })
-        
-        # Save updated data
-        success = self.db.save_patient(patient_data)
+        def write(patient_data: Dict, version: int) -> Dict:
+            # Find the visit
+            if not any(visit.get('visit_id') == visit_id for visit in patient_data.get('visits', [])):
+                return {"success": False, "message": "Visit not found"}
+            
+            # Update visit with consultation data
+            success = self.db.update_visit(patient_id, visit_id, {
+                'summary': consultation_data.get('summary', ''),
+                'prescription': consultation_data.get('prescription', ''),
+                'consultation_timestamp': datetime.now().isoformat(),
+                'format_type': consultation_data.get('format_type', 'SOAP')
+            }, expected_version=version)
+            
+            if success:
+                return {"success": True}
+            else:
+                return {"success": False, "message": "Failed to update consultation"}
         
-        if success:
-            return {"success": True}
-        else:
-            return {"success": False, "message": "Failed to update consultation"}
+        return self._versioned_write(patient_id, expected_version, write)
     
     def get_patient_visits(self, patient_id: str) -> List[Dict]:
         """Get all visits for a patient"""
@@ -109,31 +102,65 @@ class VisitManager:
         
         return patient_data.get('visits', [])
     
-    def delete_visit(self, patient_id: str, visit_id: str) -> Dict:
+    def delete_visit(self, patient_id: str, visit_id: str,
+                     expected_version: Optional[int] = None) -> Dict:
         """Delete a specific visit"""
-        patient_data = self.db.load_patient(patient_id)
-        if not patient_data:
-            return {"success": False, "message": "Patient not found"}
+        def write(patient_data: Dict, version: int) -> Dict:
+            # Find and remove the visit
+            visits = patient_data.get('visits', [])
+            
+            if any(v.get('visit_id') == visit_id for v in visits):
+                # Save updated data
+                success = self.db.remove_visit(patient_id, visit_id, expected_version=version)
+                if success:
+                    return {"success": True}
+                else:
+                    return {"success": False, "message": "Failed to save changes"}
+            else:
+                return {"success": False, "message": "Visit not found"}
         
-        # Find and remove the visit
-        visits = patient_data.get('visits', [])
-        original_count = len(visits)
-        patient_data['visits'] = [v for v in visits if v.get('visit_id') != visit_id]
+        return self._versioned_write(patient_id, expected_version, write)
+    
+    def _versioned_write(self, patient_id: str, expected_version: Optional[int],
+                         write: Callable[[Dict, int], Dict]) -> Dict:
+        """
+        Run a read-check-write against the patient record with optimistic concurrency.
+        If the caller pinned expected_version, a conflict is reported back to them;
+        otherwise the write is retried on a fresh copy of the record.
+        """
+        conflict = None
+        
+        for _ in range(MAX_WRITE_ATTEMPTS):
+            # Read-only view - the write callbacks only inspect the record
+            patient_data = self.db.get_patient(patient_id)
+            if not patient_data:
+                return {"success": False, "message": "Patient not found"}
+            
+            version = expected_version if expected_version is not None else patient_data.get('version', 0)
+            
+            try:
+                result = write(patient_data, version)
+                if result.get("success"):
+                    # Dashboard totals follow every successful visit write; the
+                    # adapter already holds the updated record, so this re-reads nothing
+                    self.aggregates.refresh_patient(patient_id, self.db.get_patient(patient_id))
+                return result
+            except VersionConflictError as e:
+                conflict = e
+                if expected_version is not None:
+                    break
+                logger.info(f"Retrying write for patient {patient_id}: {e}")
         
-        if len(patient_data['visits']) < original_count:
-            # Save updated data
-            success = self.db.save_patient(patient_data)
-            if success:
-                return {"success": True}
-            else:
-                return {"success": False, "message": "Failed to save changes"}
-        else:
-            return {"success": False, "message": "Visit not found"}
+        return {
+            "success": False,
+            "conflict": True,
+            "current_version": conflict.actual,
+            "message": "Patient record was changed by another user, please reload and try again"
+        }
     
     def _generate_visit_id(self) -> str:
-        """Generate unique visit ID"""
-        timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
-        return f"V{timestamp}"
+        """Generate unique, time-ordered visit ID"""
+        return new_visit_id()
     
     def get_visit_statistics(self, patient_id: str) -> Dict:
         """Get statistics about patient visits - SIMPLIFIED"""
@@ -0,0 +1,47 @@
+"""
+Database Adapter Selection
+Picks the storage backend from the environment so routes stay backend-agnostic
+
+    EMR_DB_BACKEND = json (default) | sqlite
+    EMR_DATA_DIR   = patient directory for the JSON backend (default data/patients)
+    EMR_PATIENT_FORMAT = JSON backend file encoding, see serializers (default json-pretty)
+    EMR_SQLITE_PATH = database file for the SQLite backend (default data/emr.db)
+"""
+
+import os
+import threading
+import logging
+
+from data.db.json_adapter import JSONAdapter
+from data.db.sqlite_adapter import SQLiteAdapter
+from data.db.serializers import get_serializer
+
+logger = logging.getLogger(__name__)
+
+_adapter = None
+_adapter_lock = threading.Lock()
+
+
+def create_adapter(backend: str = None):
+    """Create a new adapter for the given (or configured) backend"""
+    backend = (backend or os.getenv("EMR_DB_BACKEND", "json")).strip().lower()
+
+    if backend == "sqlite":
+        return SQLiteAdapter(os.getenv("EMR_SQLITE_PATH", "data/emr.db"))
+
+    if backend != "json":
+        logger.warning(f"Unknown EMR_DB_BACKEND '{backend}', using JSON storage")
+
+    return JSONAdapter(os.getenv("EMR_DATA_DIR", "data/patients"),
+                       get_serializer(os.getenv("EMR_PATIENT_FORMAT")))
+
+
+def get_adapter():
+    """Get the process-wide adapter shared by all API routes"""
+    global _adapter
+
+    with _adapter_lock:
+        if _adapter is None:
+            _adapter = create_adapter()
+            logger.info(f"Using {type(_adapter).__name__} for patient storage")
+        return _adapter
@@ -0,0 +1,36 @@
+"""
+Visit Stats Backfill
+One-shot upgrade storing visit_count / last_visit_timestamp on existing patient records
+
+Usage:
+    python -m data.db.backfill_visit_stats
+    python -m data.db.backfill_visit_stats --backend sqlite
+
+Records are read correctly without it (stats are computed on load when
+missing); running it once makes every later read O(1) per patient.
+Safe to re-run - records that already carry the stats are skipped.
+"""
+
+import sys
+import argparse
+from typing import List, Optional
+import logging
+
+from data.db.adapter_factory import create_adapter
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Store visit stats on existing patient records")
+    parser.add_argument('--backend', help="json or sqlite (default: EMR_DB_BACKEND)")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s %(message)s")
+
+    adapter = create_adapter(args.backend)
+    updated = adapter.backfill_visit_stats()
+    print(f"Backfilled visit stats for {updated} patients")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
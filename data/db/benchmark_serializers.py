@@ -0,0 +1,139 @@
+"""
+Patient File Format Benchmark
+Compares bytes on disk and parse time of each serializer on a synthetic corpus
+
+Usage:
+    python -m data.db.benchmark_serializers --patients 10000 --visits 5
+
+Records mirror what PatientManager.create_patient / VisitManager.create_visit
+write. Each format gets its own temp directory; parse time is a cold read of
+every file through serializers.load_file (what the cache and adapter use).
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import tempfile
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+from pathlib import Path
+
+from data.db.serializers import PrettyJSONSerializer, available_serializers, load_file
+
+SYMPTOMS = [
+    "fever and body ache for 3 days", "dry cough, worse at night",
+    "burning micturition", "headache with photophobia", "epigastric pain after meals",
+    "joint pain in both knees", "breathlessness on exertion", "loose stools since morning"
+]
+DIAGNOSES = ["Viral fever", "URTI", "UTI", "Migraine", "GERD", "Osteoarthritis", "COPD", "Acute gastroenteritis"]
+DOCTORS = ["Dr. Kumar", "Dr. Priya", "Dr. Ramesh", "Dr. Lakshmi"]
+NAMES = ["Arun", "Bhavani", "Chandran", "Divya", "Ganesh", "Kavitha", "Murugan", "Revathi", "Senthil", "Uma"]
+
+
+def synthetic_patient(i: int, visits: int, rng: random.Random) -> Dict:
+    """One patient record shaped like those written by the managers"""
+    created = datetime(2024, 1, 1) + timedelta(minutes=i)
+    patient_id = f"P{created.strftime('%Y%m%d%H%M%S')}{i:05d}"
+    patient = {
+        "id": patient_id,
+        "name": f"{rng.choice(NAMES)} {rng.choice(NAMES)}",
+        "age": rng.randint(1, 90),
+        "sex": rng.choice(["Male", "Female"]),
+        "mobile": f"9{rng.randint(100000000, 999999999)}",
+        "created_at": created.isoformat(),
+        "updated_at": created.isoformat(),
+        "medical_history": {"chronic_conditions": [], "allergies": [], "family_history": ""},
+        "version": visits + 1,
+        "visits": []
+    }
+
+    for v in range(visits):
+        timestamp = created + timedelta(days=30 * v)
+        patient["visits"].append({
+            "visit_id": f"V{timestamp.strftime('%Y%m%d%H%M%S')}{v:02d}",
+            "timestamp": timestamp.isoformat(),
+            "visit_type": "Consultation",
+            "chief_complaint": rng.choice(SYMPTOMS),
+            "vitals": {
+                "bp": f"{rng.randint(100, 160)}/{rng.randint(60, 100)}",
+                "pulse": rng.randint(60, 110),
+                "temperature": round(rng.uniform(97.0, 102.5), 1),
+                "spo2": rng.randint(90, 100),
+                "rr": rng.randint(12, 24)
+            },
+            "symptoms": rng.choice(SYMPTOMS),
+            "diagnosis": rng.choice(DIAGNOSES),
+            "prescription": "Tab. Paracetamol 650mg 1-0-1 x 3 days\nTab. Pantoprazole 40mg 1-0-0 x 5 days",
+            "doctor": rng.choice(DOCTORS),
+            "summary": "Patient presented with " + rng.choice(SYMPTOMS) + ". " * 20
+        })
+
+    return patient
+
+
+def benchmark(patients: int, visits: int, seed: int = 42,
+              formats: Optional[List[str]] = None) -> List[Dict]:
+    """Write the same corpus in each format and time a full read back"""
+    rng = random.Random(seed)
+    corpus = [synthetic_patient(i, visits, rng) for i in range(patients)]
+    serializers = available_serializers()
+    results = []
+
+    for name in formats or serializers:
+        serializer = serializers[name]()
+
+        with tempfile.TemporaryDirectory(prefix=f"emr-bench-{name}-") as tmp:
+            tmp_dir = Path(tmp)
+
+            started = time.perf_counter()
+            total_bytes = 0
+            for record in corpus:
+                data = serializer.dumps(record)
+                total_bytes += len(data)
+                with open(tmp_dir / f"{record['id']}.json", 'wb') as f:
+                    f.write(data)
+            write_seconds = time.perf_counter() - started
+
+            started = time.perf_counter()
+            for entry in os.scandir(tmp_dir):
+                load_file(entry.path)
+            read_seconds = time.perf_counter() - started
+
+        results.append({
+            'format': name,
+            'bytes_on_disk': total_bytes,
+            'write_seconds': round(write_seconds, 3),
+            'read_seconds': round(read_seconds, 3)
+        })
+
+    # Relative to today's format
+    baseline = next((r for r in results if r['format'] == PrettyJSONSerializer.name), None)
+    for result in results:
+        if baseline:
+            result['size_vs_pretty'] = round(result['bytes_on_disk'] / baseline['bytes_on_disk'], 3)
+            result['read_vs_pretty'] = round(result['read_seconds'] / baseline['read_seconds'], 3) \
+                if baseline['read_seconds'] else None
+
+    return results
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark patient file serializers")
+    parser.add_argument('--patients', type=int, default=10000)
+    parser.add_argument('--visits', type=int, default=5, help="Visits per patient")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--format', action='append', dest='formats',
+                        choices=sorted(available_serializers()),
+                        help="Only benchmark these formats (repeatable)")
+    args = parser.parse_args(argv)
+
+    results = benchmark(args.patients, args.visits, args.seed, args.formats)
+    print(json.dumps(results, indent=2))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
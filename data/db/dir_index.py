@@ -0,0 +1,266 @@
+"""
+Patient Directory Indexes
+Shared plumbing for the indexes derived from a patient data directory
+
+Each index is one instance per directory (get_shared_index), notices patient
+files added or removed outside the adapter through the directory mtime, and,
+if persistent, is saved atomically to <data_dir>/indexes/<name>.json and
+rebuilt whenever that file is missing, stale or unreadable. Subclasses only
+supply their payload and how to rebuild it from the patient files.
+
+Changes between saves go to an append-only delta log next to the index file
+(one small line per change) and are folded into it once the log outgrows
+half the index, so a single write never rewrites every patient's entry.
+"""
+
+import os
+import json
+import threading
+from typing import Dict, List, Optional, Tuple, Type, TypeVar
+import logging
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+# Fold the delta log into the index file past half its size, never below this
+DELTA_MIN_FOLD_BYTES = 64 * 1024
+
+
+class DirectoryIndex:
+    """Base for an index over one patient data directory"""
+
+    # Shown in log messages
+    label = "index"
+
+    def __init__(self, data_dir: Path):
+        self.data_dir = Path(data_dir)
+        self._dir_mtime_seen: Optional[int] = None
+        self._lock = threading.RLock()
+
+    def _dir_mtime_ns(self) -> int:
+        return os.stat(self.data_dir).st_mtime_ns
+
+    def _dir_changed(self) -> bool:
+        """True if patient files were added or removed since the index last looked (lock held)"""
+        return self._dir_mtime_ns() != self._dir_mtime_seen
+
+    def _mark_current(self):
+        """The caller has just written patient files itself - not staleness (lock held)"""
+        self._dir_mtime_seen = self._dir_mtime_ns()
+
+
+class PersistentDirectoryIndex(DirectoryIndex):
+    """
+    A DirectoryIndex saved to <data_dir>/indexes/<index_name>, with later
+    changes appended to <index_name>.delta.jsonl until the next fold.
+    Subclasses implement _build, _payload, _load_payload and _apply_delta.
+    """
+
+    index_name = "index.json"
+    version = 1
+
+    def __init__(self, data_dir: Path):
+        super().__init__(data_dir)
+        self.index_path = self.data_dir / "indexes" / self.index_name
+        self.delta_path = self.index_path.with_name(f"{self.index_name}.delta.jsonl")
+        self._loaded_mtime_ns: Optional[int] = None
+        self._index_size = 0
+        # Bytes of the delta log already applied in memory
+        self._delta_offset = 0
+
+    def _build(self) -> int:
+        """Replace the in-memory index from the patient files; returns the entry count"""
+        raise NotImplementedError
+
+    def _payload(self) -> Dict:
+        """The in-memory index as JSON-serializable fields"""
+        raise NotImplementedError
+
+    def _load_payload(self, stored: Dict):
+        """Restore the in-memory index from persisted fields"""
+        raise NotImplementedError
+
+    def _apply_delta(self, entry: Dict):
+        """Apply one change recorded by _record (lock held)"""
+        raise NotImplementedError
+
+    def rebuild(self):
+        """Rebuild the index by reading every patient file"""
+        with self._lock:
+            entries = self._build()
+            self._persist()
+            logger.info(f"Rebuilt {self.label} ({entries} entries)")
+
+    def _ensure_fresh(self, check_dir: bool = True):
+        """Load the persisted index and delta log, rebuilding if missing or stale (lock held)"""
+        try:
+            index_mtime = os.stat(self.index_path).st_mtime_ns
+        except FileNotFoundError:
+            self.rebuild()
+            return
+
+        if index_mtime == self._loaded_mtime_ns:
+            try:
+                # Changes appended by other processes since we last looked
+                self._read_delta()
+            except Exception as e:
+                logger.warning(f"{self.label.capitalize()} delta log unreadable, rebuilding: {e}")
+                self.rebuild()
+                return
+            if check_dir and self._dir_changed():
+                # Patient files were added or removed without going through the adapter
+                self.rebuild()
+            return
+
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                stored = json.load(f)
+
+            if stored.get('version') != self.version:
+                self.rebuild()
+                return
+
+            self._load_payload(stored)
+            self._loaded_mtime_ns = index_mtime
+            self._index_size = os.stat(self.index_path).st_size
+            self._dir_mtime_seen = stored['dir_mtime_ns']
+            self._delta_offset = 0
+            self._read_delta()
+
+            # Each delta line carries the directory mtime after its write
+            if self._dir_changed():
+                self.rebuild()
+
+        except Exception as e:
+            logger.warning(f"{self.label.capitalize()} unreadable, rebuilding: {e}")
+            self.rebuild()
+
+    def _read_delta(self):
+        """Apply delta lines past the ones already applied (lock held)"""
+        try:
+            size = os.stat(self.delta_path).st_size
+        except FileNotFoundError:
+            size = 0
+
+        if size == self._delta_offset:
+            return
+        if size < self._delta_offset:
+            # Folded by another process without the index file changing under us
+            raise ValueError("delta log shrank")
+
+        with open(self.delta_path, 'rb') as f:
+            f.seek(self._delta_offset)
+            data = f.read(size - self._delta_offset)
+
+        # Only whole lines; a line still being written is picked up next time
+        end = data.rfind(b'\n') + 1
+        for line in data[:end].splitlines():
+            if not line.strip():
+                continue
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                logger.warning(f"Skipping corrupt {self.label} delta line")
+                continue
+            self._dir_mtime_seen = entry.pop('dir_mtime_ns', self._dir_mtime_seen)
+            self._apply_delta(entry)
+        self._delta_offset += end
+
+    def _record(self, entries: List[Dict]):
+        """
+        Persist changes already applied in memory by appending them to the
+        delta log, folding it into the index file once it grows (lock held)
+        """
+        if self._loaded_mtime_ns is None:
+            # The last save failed; retry it in full
+            self._persist()
+            return
+
+        try:
+            dir_mtime = self._dir_mtime_ns()
+            data = ''.join(
+                json.dumps({**entry, 'dir_mtime_ns': dir_mtime}, ensure_ascii=False, separators=(',', ':')) + '\n'
+                for entry in entries
+            ).encode('utf-8')
+
+            # Single O_APPEND write so concurrent appenders never interleave
+            fd = os.open(self.delta_path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                os.write(fd, data)
+                size = os.fstat(fd).st_size
+            finally:
+                os.close(fd)
+
+            self._dir_mtime_seen = dir_mtime
+            if size == self._delta_offset + len(data):
+                self._delta_offset = size
+            # Otherwise another process appended too; its lines (and ours,
+            # harmlessly) are applied on the next _read_delta
+
+        except Exception as e:
+            logger.error(f"Error appending to {self.label} delta log, saving in full: {e}")
+            self._persist()
+            return
+
+        if size > max(DELTA_MIN_FOLD_BYTES, self._index_size // 2):
+            self._read_delta_quietly()
+            self._persist()
+
+    def _read_delta_quietly(self):
+        """Catch up before folding, so other processes' changes are kept (lock held)"""
+        try:
+            self._read_delta()
+        except Exception as e:
+            logger.warning(f"{self.label.capitalize()} delta log unreadable while folding: {e}")
+
+    def _persist(self):
+        """Write the whole index to disk atomically and drop the delta log (lock held)"""
+        try:
+            self.index_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.index_path.with_suffix('.tmp')
+            dir_mtime = self._dir_mtime_ns()
+
+            stored = {'version': self.version, 'dir_mtime_ns': dir_mtime}
+            stored.update(self._payload())
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                # json.dumps uses the C encoder; json.dump to a file does not
+                f.write(json.dumps(stored, ensure_ascii=False, separators=(',', ':')))
+            os.replace(tmp_path, self.index_path)
+
+            # A crash before this leaves delta lines the index already contains;
+            # replaying them sets the same entries again
+            try:
+                self.delta_path.unlink()
+            except FileNotFoundError:
+                pass
+
+            stat = os.stat(self.index_path)
+            self._loaded_mtime_ns = stat.st_mtime_ns
+            self._index_size = stat.st_size
+            self._delta_offset = 0
+            self._dir_mtime_seen = dir_mtime
+
+        except Exception as e:
+            # The in-memory index is still correct; the next process will rebuild
+            logger.error(f"Error saving {self.label}: {e}")
+            self._loaded_mtime_ns = None
+
+
+IndexType = TypeVar('IndexType', bound=DirectoryIndex)
+
+# One index of each kind per data directory, shared by every adapter in the process
+_indexes: Dict[Tuple[type, str], DirectoryIndex] = {}
+_indexes_lock = threading.Lock()
+
+
+def get_shared_index(index_class: Type[IndexType], data_dir) -> IndexType:
+    """Get the shared index_class instance for a patient data directory"""
+    path = os.path.abspath(data_dir)
+    key = (index_class, path)
+
+    with _indexes_lock:
+        index = _indexes.get(key)
+        if index is None:
+            index = index_class(Path(path))
+            _indexes[key] = index
+        return index
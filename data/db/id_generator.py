@@ -0,0 +1,79 @@
+"""
+Record ID Generator
+Unique, lexicographically time-ordered IDs for patients and visits
+
+    P 20250604230735123 000 9f3a61c2
+    | |                 |   node: per-process random id (hostname, pid, salt)
+    | |                 sequence within the millisecond
+    | local time to the millisecond (same clock as the old IDs)
+    prefix
+
+IDs from the old "P%Y%m%d%H%M%S" scheme are a prefix of every new ID from
+the same second, so old and new IDs still sort together by creation time.
+"""
+
+import os
+import socket
+import hashlib
+import threading
+import time
+from datetime import datetime
+
+# Sequence numbers per millisecond per process before waiting for the next tick
+SEQUENCE_LIMIT = 1000
+
+
+class IdGenerator:
+    """
+    Monotonic ID source for one process.
+    Within a process IDs strictly increase (the sequence breaks ties inside
+    a millisecond, and a clock stepping backwards never reuses a tick).
+    Across processes the node suffix keeps IDs apart.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        """New node id and sequence state (also called in a forked child)"""
+        seed = f"{socket.gethostname()}:{os.getpid()}:{os.urandom(8).hex()}"
+        self.node = hashlib.sha1(seed.encode('utf-8')).hexdigest()[:8]
+        self._last_ms = 0
+        self._sequence = 0
+
+    def new_id(self, prefix: str) -> str:
+        with self._lock:
+            now_ms = max(int(time.time() * 1000), self._last_ms)
+
+            if now_ms == self._last_ms:
+                self._sequence += 1
+                if self._sequence >= SEQUENCE_LIMIT:
+                    # Sequence exhausted for this tick - borrow the next millisecond
+                    now_ms += 1
+                    self._sequence = 0
+            else:
+                self._sequence = 0
+
+            self._last_ms = now_ms
+            sequence = self._sequence
+
+        stamp = datetime.fromtimestamp(now_ms / 1000).strftime("%Y%m%d%H%M%S")
+        return f"{prefix}{stamp}{now_ms % 1000:03d}{sequence:03d}{self.node}"
+
+
+_generator = IdGenerator()
+
+if hasattr(os, 'register_at_fork'):
+    # A forked worker must not share its parent's node id or sequence
+    os.register_at_fork(after_in_child=_generator._reset)
+
+
+def new_patient_id() -> str:
+    """Generate a unique patient ID"""
+    return _generator.new_id("P")
+
+
+def new_visit_id() -> str:
+    """Generate a unique visit ID"""
+    return _generator.new_id("V")
@@ -1,7 +1,7 @@
 """
 JSON Database Adapter
 Handles all file I/O operations for patient data
-Future: Can be swapped with SQL adapter without changing business logic
+Can be swapped with SQLiteAdapter (see adapter_factory) without changing business logic
 """
 
 import os
@@ -10,6 +10,16 @@ from typing import Dict, List, Optional
 import logging
 from pathlib import Path
 
+from data.db.patient_cache import get_patient_cache
+from data.db.mobile_index import get_mobile_index
+from data.db.search_index import get_search_index
+from data.db.summary_index import get_summary_index
+from data.db.visit_journal import VisitJournal, FOLDED_KEY, FOLDED_OPS_KEY, applied, journal_id, op_entries
+from data.db.locking import (VersionConflictError, WriteGeneration, atomic_write_bytes, atomic_write_text,
+                             patient_lock)
+from data.db.serializers import Serializer, get_serializer, load_file
+from data.db.visit_stats import has_visit_stats, refresh_visit_stats
+
 logger = logging.getLogger(__name__)
 
 
@@ -19,77 +29,309 @@ class JSONAdapter:
     Implements a clean interface that can be replaced with SQL later.
     """
     
-    def __init__(self, data_dir: str = "data/patients"):
+    def __init__(self, data_dir: str = "data/patients", serializer: Optional[Serializer] = None):
         self.data_dir = Path(data_dir)
         self.data_dir.mkdir(parents=True, exist_ok=True)
+        # Encoding used for writes; reads autodetect, so formats can be mixed
+        self.serializer = serializer or get_serializer()
+        self.cache = get_patient_cache(self.data_dir)
+        self.mobile_index = get_mobile_index(self.data_dir)
+        self.search_index = get_search_index(self.data_dir)
+        self.summary_index = get_summary_index(self.data_dir)
+        self.journal = VisitJournal(self.data_dir)
+        self.generation = WriteGeneration(self.data_dir / "indexes" / "generation")
         
-    def save_patient(self, patient_data: Dict) -> bool:
-        """Save patient data to JSON file"""
+    def save_patient(self, patient_data: Dict, expected_version: Optional[int] = None) -> bool:
+        """
+        Save the full patient record to its JSON file (atomically).
+        The record is the merged view, so any pending visit journal is folded in.
+        Raises VersionConflictError if expected_version is given and stale.
+        """
         try:
             patient_id = patient_data['id']
-            filepath = self.data_dir / f"{patient_id}.json"
             
-            with open(filepath, 'w', encoding='utf-8') as f:
-                json.dump(patient_data, f, indent=2, ensure_ascii=False)
+            with patient_lock(self.data_dir, patient_id):
+                current = self.cache.get(patient_id)
+                current_version = current.get('version', 0) if current else 0
+                
+                if expected_version is not None and expected_version != current_version:
+                    raise VersionConflictError(patient_id, expected_version, current_version)
+                
+                record = {**patient_data, 'version': current_version + 1}
+                self._write_record(record)
+                patient_data['version'] = record['version']
+                self.generation.bump()
             
             logger.info(f"Saved patient {patient_id}")
             return True
             
+        except VersionConflictError:
+            raise
         except Exception as e:
             logger.error(f"Error saving patient: {e}")
             return False
     
+    def save_patients(self, patients: List[Dict]) -> int:
+        """
+        Save a batch of patients verbatim (no version check or bump), returns
+        number written. Indexes are persisted once for the whole batch.
+        """
+        written = []
+        
+        try:
+            for patient_data in patients:
+                with patient_lock(self.data_dir, patient_data['id']):
+                    self._write_record(patient_data, update_indexes=False)
+                written.append(patient_data)
+        finally:
+            # Index whatever reached disk, even if the batch stopped part way
+            self._index_records(written)
+            if written:
+                self.generation.bump()
+        
+        logger.info(f"Saved batch of {len(written)} patients")
+        return len(written)
+    
+    def _write_record(self, patient_data: Dict, update_indexes: bool = True):
+        """Atomically replace a patient file and fold away its journal (lock held)"""
+        patient_id = patient_data['id']
+        filepath = self.data_dir / f"{patient_id}.json"
+        
+        # Every visit is serialized anyway, so recomputing the stats is free here
+        refresh_visit_stats(patient_data)
+        
+        # Stamp the file with the folded journal's id and op count so a crash
+        # before the journal is removed can't replay those ops on top of the
+        # saved visits (ops appended to the leftover journal later still apply)
+        record = patient_data
+        ops = self.journal.read_ops(patient_id)
+        folded = journal_id(ops)
+        if folded:
+            record = {**patient_data, FOLDED_KEY: folded, FOLDED_OPS_KEY: len(op_entries(ops))}
+        
+        atomic_write_bytes(filepath, self.serializer.dumps(record))
+        
+        self.journal.clear(patient_id)
+        self.cache.invalidate(patient_id)
+        
+        if update_indexes:
+            self._index_records([patient_data])
+    
+    def _index_records(self, records: List[Dict]):
+        """Bring the secondary indexes up to date with freshly written records"""
+        if not records:
+            return
+        
+        self.mobile_index.update_many((r['id'], r.get('mobile')) for r in records)
+        for record in records:
+            self.search_index.update(record['id'], record.get('name', ''), record.get('mobile', ''))
+        self.summary_index.update_many(records)
+    
     def load_patient(self, patient_id: str) -> Optional[Dict]:
-        """Load patient data from JSON file"""
+        """Load patient data from JSON file, merged with its visit journal"""
         try:
             filepath = self.data_dir / f"{patient_id}.json"
             
             if not filepath.exists():
                 return None
             
-            with open(filepath, 'r', encoding='utf-8') as f:
-                return json.load(f)
+            patient_data = load_file(filepath)
+            
+            return self.journal.replay(patient_id, patient_data)
                 
         except Exception as e:
             logger.error(f"Error loading patient {patient_id}: {e}")
             return None
     
+    def get_patient(self, patient_id: str) -> Optional[Dict]:
+        """
+        Read-only view of a patient record, served from the shared patient
+        cache. The dict is shared, do not mutate it - use load_patient for a copy.
+        """
+        try:
+            return self.cache.get(patient_id)
+            
+        except Exception as e:
+            logger.error(f"Error reading patient {patient_id}: {e}")
+            return None
+    
     def delete_patient(self, patient_id: str) -> bool:
         """Delete patient JSON file"""
         try:
             filepath = self.data_dir / f"{patient_id}.json"
             
-            if filepath.exists():
+            with patient_lock(self.data_dir, patient_id):
+                if not filepath.exists():
+                    return False
+                
                 filepath.unlink()
-                logger.info(f"Deleted patient {patient_id}")
-                return True
+                self.journal.clear(patient_id)
+                self.cache.invalidate(patient_id)
+                self.mobile_index.remove(patient_id)
+                self.search_index.remove(patient_id)
+                self.summary_index.remove(patient_id)
+                self.generation.bump()
             
-            return False
+            logger.info(f"Deleted patient {patient_id}")
+            return True
             
         except Exception as e:
             logger.error(f"Error deleting patient {patient_id}: {e}")
             return False
     
-    def get_all_patients(self) -> List[Dict]:
-        """Get all patient records"""
-        patients = []
+    def append_visit(self, patient_id: str, visit: Dict,
+                     expected_version: Optional[int] = None) -> bool:
+        """Add a visit by appending to the patient's journal (O(1) bytes written)"""
+        return self._journal_op(patient_id, {'op': 'add_visit', 'visit': visit}, expected_version)
+    
+    def update_visit(self, patient_id: str, visit_id: str, fields: Dict,
+                     expected_version: Optional[int] = None) -> bool:
+        """Set fields on an existing visit via the journal"""
+        return self._journal_op(patient_id, {'op': 'update_visit', 'visit_id': visit_id, 'fields': fields},
+                                expected_version)
+    
+    def remove_visit(self, patient_id: str, visit_id: str,
+                     expected_version: Optional[int] = None) -> bool:
+        """Remove a visit via the journal"""
+        return self._journal_op(patient_id, {'op': 'delete_visit', 'visit_id': visit_id}, expected_version)
+    
+    def compact_patient(self, patient_id: str) -> bool:
+        """Fold the patient's visit journal into their JSON file (version unchanged)"""
+        try:
+            with patient_lock(self.data_dir, patient_id):
+                patient_data = self.load_patient(patient_id)
+                if not patient_data:
+                    return False
+                self._write_record(patient_data)
+            return True
+            
+        except Exception as e:
+            logger.error(f"Error compacting patient {patient_id}: {e}")
+            return False
+    
+    def backfill_visit_stats(self) -> int:
+        """
+        One-shot upgrade: store visit_count / last_visit_timestamp in every
+        patient file written before they existed. Returns files rewritten.
+        """
+        updated = 0
+        
+        for filepath in sorted(self.data_dir.glob("*.json")):
+            try:
+                base = load_file(filepath)
+            except Exception as e:
+                logger.warning(f"Skipping unreadable {filepath}: {e}")
+                continue
+            
+            if not has_visit_stats(base) and self.compact_patient(filepath.stem):
+                updated += 1
         
+        logger.info(f"Backfilled visit stats for {updated} patients")
+        return updated
+    
+    def _journal_op(self, patient_id: str, op: Dict, expected_version: Optional[int] = None) -> bool:
+        """
+        Append a visit op, compacting once the journal outgrows the base file.
+        The cached record and the summary are updated from the op itself, so
+        nothing is re-read - the patient's history is only parsed on a cold cache.
+        """
         try:
-            for filepath in self.data_dir.glob("*.json"):
-                try:
-                    with open(filepath, 'r', encoding='utf-8') as f:
-                        patient_data = json.load(f)
-                        patients.append(patient_data)
-                except Exception as e:
-                    logger.warning(f"Error reading {filepath}: {e}")
-                    continue
+            filepath = self.data_dir / f"{patient_id}.json"
+            
+            with patient_lock(self.data_dir, patient_id):
+                current = self.cache.get(patient_id)
+                if current is None:
+                    return False
+                
+                current_version = current.get('version', 0)
+                if expected_version is not None and expected_version != current_version:
+                    raise VersionConflictError(patient_id, expected_version, current_version)
+                
+                journal_size = self.journal.append(patient_id, op)
+                record = applied(current, op)
+                
+                if self.journal.needs_compaction(journal_size, filepath.stat().st_size):
+                    self._write_record(record)
+                else:
+                    self.summary_index.update(record)
+                self.cache.put(patient_id, record)
+                self.generation.bump()
             
-            return patients
+            return True
+            
+        except VersionConflictError:
+            raise
+        except Exception as e:
+            logger.error(f"Error writing visit journal for {patient_id}: {e}")
+            self.cache.invalidate(patient_id)
+            return False
+    
+    def write_generation(self) -> int:
+        """Changes whenever any process writes patient data (see WriteGeneration)"""
+        return self.generation.current()
+    
+    def get_all_patients(self) -> List[Dict]:
+        """
+        Get all patient records.
+        Served from the shared patient cache - only files changed since the
+        last call are parsed. Returned dicts are shared, do not mutate them.
+        """
+        try:
+            return self.cache.get_all()
             
         except Exception as e:
             logger.error(f"Error getting all patients: {e}")
             return []
     
+    def get_patient_summaries(self) -> List[Dict]:
+        """
+        Get the summary header (id, name, mobile, age, sex, visit_count,
+        last_visit) of every patient without parsing any visits.
+        Returned dicts are shared, do not mutate them.
+        """
+        try:
+            return self.summary_index.get_all()
+            
+        except Exception as e:
+            logger.error(f"Error getting patient summaries: {e}")
+            return []
+    
+    def search_patients(self, search_term: str, limit: int = 20) -> List[Dict]:
+        """
+        Search patients by name or mobile using the search index.
+        Results are ranked best match first; dicts are shared, do not mutate them.
+        """
+        try:
+            results = []
+            for patient_id in self.search_index.search(search_term, limit):
+                patient = self.cache.get(patient_id)
+                if patient:
+                    results.append(patient)
+            return results
+            
+        except Exception as e:
+            logger.error(f"Error searching patients: {e}")
+            return []
+    
+    def find_patient_id_by_mobile(self, mobile: str) -> Optional[str]:
+        """Look up a patient id by mobile number using the mobile index"""
+        try:
+            patient_id = self.mobile_index.find(mobile)
+            if not patient_id:
+                return None
+            
+            # Guard against an index entry that outlived its patient file
+            patient = self.cache.get(patient_id)
+            if patient and patient.get('mobile') == mobile:
+                return patient_id
+            
+            self.mobile_index.rebuild()
+            return self.mobile_index.find(mobile)
+            
+        except Exception as e:
+            logger.error(f"Error looking up mobile {mobile}: {e}")
+            return None
+    
     def patient_exists(self, patient_id: str) -> bool:
         """Check if patient exists"""
         filepath = self.data_dir / f"{patient_id}.json"
@@ -97,7 +339,7 @@ class JSONAdapter:
     
     def get_patient_count(self) -> int:
         """Get total number of patients"""
-        return len(list(self.data_dir.glob("*.json")))
+        return self.summary_index.count()
     
     def get_database_size_mb(self) -> float:
         """Get total size of all patient files in MB"""
@@ -106,6 +348,8 @@ class JSONAdapter:
         for filepath in self.data_dir.glob("*.json"):
             total_size += filepath.stat().st_size
         
+        total_size += self.journal.total_size()
+        
         return round(total_size / (1024 * 1024), 2)
     
     def backup_patient(self, patient_id: str) -> bool:
@@ -122,8 +366,7 @@ class JSONAdapter:
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
             backup_path = backup_dir / f"{patient_id}_{timestamp}.json"
             
-            with open(backup_path, 'w', encoding='utf-8') as f:
-                json.dump(patient_data, f, indent=2, ensure_ascii=False)
+            atomic_write_text(backup_path, json.dumps(patient_data, indent=2, ensure_ascii=False))
             
             logger.info(f"Created backup for patient {patient_id}")
             return True
@@ -156,8 +399,7 @@ class JSONAdapter:
             
             config_path = config_dir / f"{config_name}.json"
             
-            with open(config_path, 'w', encoding='utf-8') as f:
-                json.dump(config_data, f, indent=2, ensure_ascii=False)
+            atomic_write_text(config_path, json.dumps(config_data, indent=2, ensure_ascii=False))
             
             logger.info(f"Saved config {config_name}")
             return True
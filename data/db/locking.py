@@ -0,0 +1,177 @@
+"""
+Write Safety Helpers
+Atomic file replacement, per-patient locks, optimistic version conflicts and
+a cross-process write generation counter
+"""
+
+import os
+import threading
+from contextlib import contextmanager
+from typing import Dict, Optional
+import logging
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:  # Windows - in-process locking only
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# The generation file is emptied again once it reaches this size
+GENERATION_WRAP_BYTES = 1024 * 1024
+
+
+class VersionConflictError(Exception):
+    """Raised when a write expected a different patient record version"""
+
+    def __init__(self, patient_id: str, expected: int, actual: int):
+        self.patient_id = patient_id
+        self.expected = expected
+        self.actual = actual
+        super().__init__(
+            f"Patient {patient_id} is at version {actual}, expected {expected}"
+        )
+
+
+def atomic_write_bytes(path: Path, data: bytes):
+    """
+    Replace a file so readers see either the old or the new content, never a
+    partial write: write to a temp file, fsync, then os.replace over the target.
+    """
+    path = Path(path)
+    tmp_path = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+
+    try:
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            tmp_path.unlink()
+        except FileNotFoundError:
+            pass
+        raise
+
+    _fsync_dir(path.parent)
+
+
+def atomic_write_text(path: Path, text: str):
+    """Atomically replace a file with UTF-8 text"""
+    atomic_write_bytes(path, text.encode('utf-8'))
+
+
+def _fsync_dir(directory: Path):
+    """Persist the rename itself (POSIX only - directories can't be opened on Windows)"""
+    if os.name == 'nt':
+        return
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+    except OSError as e:
+        logger.debug(f"Could not fsync {directory}: {e}")
+
+
+class PatientLock:
+    """
+    Re-entrant lock for one patient record.
+    Serializes writers in this process with an RLock and, where fcntl is
+    available, across processes with an flock on a lock file.
+    """
+
+    def __init__(self, lock_path: Path):
+        self.lock_path = lock_path
+        self._rlock = threading.RLock()
+        self._depth = 0
+        self._fd: Optional[int] = None
+
+    def __enter__(self):
+        self._rlock.acquire()
+        try:
+            if self._depth == 0 and fcntl is not None:
+                self.lock_path.parent.mkdir(parents=True, exist_ok=True)
+                self._fd = os.open(self.lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+                fcntl.flock(self._fd, fcntl.LOCK_EX)
+        except BaseException:
+            self._close_fd()
+            self._rlock.release()
+            raise
+        self._depth += 1
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._depth -= 1
+        if self._depth == 0:
+            self._close_fd()
+        self._rlock.release()
+        return False
+
+    def _close_fd(self):
+        if self._fd is not None:
+            try:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+            finally:
+                os.close(self._fd)
+                self._fd = None
+
+
+_locks: Dict[str, PatientLock] = {}
+_locks_lock = threading.Lock()
+
+
+@contextmanager
+def patient_lock(data_dir, patient_id: str):
+    """Hold the write lock for one patient - other patients stay unblocked"""
+    lock_path = Path(os.path.abspath(data_dir)) / "locks" / f"{patient_id}.lock"
+    key = str(lock_path)
+
+    with _locks_lock:
+        lock = _locks.get(key)
+        if lock is None:
+            lock = PatientLock(lock_path)
+            _locks[key] = lock
+
+    with lock:
+        yield
+
+
+class WriteGeneration:
+    """
+    Counts writes to a store across every process: each write appends one
+    byte to a small file, so the generation is its size and one os.stat
+    tells a reader whether anything was written since it last looked.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+
+    def bump(self):
+        """Record one write (call after it is durable)"""
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            # O_APPEND: concurrent writers each add their own byte
+            fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                os.write(fd, b'.')
+                size = os.fstat(fd).st_size
+            finally:
+                os.close(fd)
+
+            if size >= GENERATION_WRAP_BYTES:
+                # Readers only compare for equality, so starting over just looks like a change
+                os.truncate(self.path, 0)
+
+        except OSError as e:
+            logger.error(f"Could not record write generation in {self.path}: {e}")
+
+    def current(self) -> int:
+        """The current generation (0 before the first write)"""
+        try:
+            return os.stat(self.path).st_size
+        except FileNotFoundError:
+            return 0
@@ -0,0 +1,264 @@
+"""
+JSON -> SQLite Migration
+Streams data/patients/*.json into a SQLiteAdapter database with bounded memory
+
+Usage:
+    python -m data.db.migrate_json_to_sqlite --source data/patients --target data/emr.db
+    python -m data.db.migrate_json_to_sqlite --verify-only
+
+Files are processed in sorted order and committed in batches. A checkpoint
+file records the last committed file so an interrupted run resumes where it
+stopped. Records that don't match the shape written by
+PatientManager.create_patient / VisitManager.create_visit are rejected
+to a JSONL report instead of aborting the run.
+"""
+
+import os
+import sys
+import json
+import time
+import hashlib
+import argparse
+from typing import Dict, Iterator, List, Optional, Tuple
+import logging
+from pathlib import Path
+
+from data.db.serializers import load_file
+from data.db.sqlite_adapter import SQLiteAdapter
+from data.db.visit_journal import VisitJournal
+
+logger = logging.getLogger(__name__)
+
+# Fields every patient record gets from PatientManager.create_patient
+PATIENT_REQUIRED_FIELDS = ('id', 'name', 'age', 'sex', 'mobile')
+# Fields every visit gets from VisitManager.create_visit
+VISIT_REQUIRED_FIELDS = ('visit_id', 'timestamp')
+
+DEFAULT_BATCH_SIZE = 500
+MAX_REPORTED_MISMATCHES = 100
+
+
+def record_checksum(patient: Dict) -> str:
+    """Order-independent checksum of a patient record"""
+    canonical = json.dumps(patient, sort_keys=True, ensure_ascii=False, separators=(',', ':'))
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+def validate_record(patient: Dict, filename: str) -> Optional[str]:
+    """Return a rejection reason, or None if the record has the expected shape"""
+    if not isinstance(patient, dict):
+        return "record is not a JSON object"
+
+    missing = [field for field in PATIENT_REQUIRED_FIELDS if field not in patient]
+    if missing:
+        return f"missing patient fields: {', '.join(missing)}"
+
+    if f"{patient['id']}.json" != filename:
+        return f"id {patient['id']} does not match filename"
+
+    visits = patient.get('visits', [])
+    if not isinstance(visits, list):
+        return "visits is not a list"
+
+    for i, visit in enumerate(visits):
+        if not isinstance(visit, dict):
+            return f"visit {i} is not a JSON object"
+        missing = [field for field in VISIT_REQUIRED_FIELDS if field not in visit]
+        if missing:
+            return f"visit {i} missing fields: {', '.join(missing)}"
+
+    return None
+
+
+def iter_patient_files(source_dir: Path, after: Optional[str] = None) -> Iterator[Tuple[str, Path]]:
+    """Yield (filename, path) in sorted order, optionally resuming after a filename"""
+    # Only file names are held in memory, never record bodies
+    names = sorted(
+        entry.name for entry in os.scandir(source_dir)
+        if entry.name.endswith('.json') and entry.is_file()
+    )
+    for name in names:
+        if after is None or name > after:
+            yield name, source_dir / name
+
+
+def load_record(path: Path, journal: VisitJournal) -> Tuple[Optional[Dict], Optional[str]]:
+    """Parse one patient file merged with its visit journal, returning (record, error)"""
+    try:
+        record = load_file(path)
+    except Exception as e:
+        return None, f"unreadable record: {e}"
+
+    if isinstance(record, dict):
+        journal.replay(path.stem, record)
+    return record, None
+
+
+class Migration:
+    """Resumable, batched copy of a JSON patient directory into SQLite"""
+
+    def __init__(self, source_dir: str, target_db: str,
+                 batch_size: int = DEFAULT_BATCH_SIZE,
+                 checkpoint_path: Optional[str] = None,
+                 rejects_path: Optional[str] = None):
+        self.source_dir = Path(source_dir)
+        self.journal = VisitJournal(self.source_dir)
+        self.target = SQLiteAdapter(target_db)
+        self.batch_size = max(1, batch_size)
+        self.checkpoint_path = Path(checkpoint_path or f"{target_db}.migration.json")
+        self.rejects_path = Path(rejects_path or f"{target_db}.rejects.jsonl")
+
+    def run(self, resume: bool = True) -> Dict:
+        """Migrate all files, committing every batch_size records"""
+        checkpoint = self._load_checkpoint() if resume else None
+        if checkpoint:
+            logger.info(f"Resuming after {checkpoint['last_file']}")
+        else:
+            checkpoint = {'last_file': None, 'migrated': 0, 'visits': 0, 'rejected': 0}
+            if self.rejects_path.exists():
+                self.rejects_path.unlink()
+
+        started = time.perf_counter()
+        migrated_this_run = 0
+        batch: List[Dict] = []
+        batch_visits = 0
+        last_name = checkpoint['last_file']
+
+        for name, path in iter_patient_files(self.source_dir, checkpoint['last_file']):
+            last_name = name
+            record, error = load_record(path, self.journal)
+            if error is None:
+                error = validate_record(record, name)
+
+            if error:
+                checkpoint['rejected'] += 1
+                self._write_reject(name, error)
+                continue
+
+            record.setdefault('visits', [])
+            batch.append(record)
+            batch_visits += len(record['visits'])
+
+            if len(batch) >= self.batch_size:
+                migrated_this_run += self._commit(batch, batch_visits, name, checkpoint)
+                batch, batch_visits = [], 0
+
+        if batch or last_name != checkpoint['last_file']:
+            migrated_this_run += self._commit(batch, batch_visits, last_name, checkpoint)
+
+        elapsed = time.perf_counter() - started
+        report = {
+            'migrated': checkpoint['migrated'],
+            'visits': checkpoint['visits'],
+            'rejected': checkpoint['rejected'],
+            'migrated_this_run': migrated_this_run,
+            'elapsed_seconds': round(elapsed, 2),
+            'patients_per_second': round(migrated_this_run / elapsed, 1) if elapsed > 0 else 0,
+            'rejects_file': str(self.rejects_path) if checkpoint['rejected'] else None
+        }
+        logger.info(f"Migration finished: {report}")
+        return report
+
+    def verify(self) -> Dict:
+        """Compare row counts and per-patient checksums against the source files"""
+        conn = self.target._connect()
+        db_patients = conn.execute("SELECT COUNT(*) FROM patients").fetchone()[0]
+        db_visits = conn.execute("SELECT COUNT(*) FROM visits").fetchone()[0]
+
+        source_patients = 0
+        source_visits = 0
+        missing: List[str] = []
+        mismatched: List[str] = []
+
+        for name, path in iter_patient_files(self.source_dir):
+            record, error = load_record(path, self.journal)
+            if error is None:
+                error = validate_record(record, name)
+            if error:
+                continue
+
+            record.setdefault('visits', [])
+            source_patients += 1
+            source_visits += len(record['visits'])
+
+            stored = self.target.load_patient(record['id'])
+            if stored is None:
+                missing.append(record['id'])
+            elif record_checksum(stored) != record_checksum(record):
+                mismatched.append(record['id'])
+
+        return {
+            'ok': (not missing and not mismatched and
+                   db_patients == source_patients and db_visits == source_visits),
+            'source_patients': source_patients,
+            'db_patients': db_patients,
+            'source_visits': source_visits,
+            'db_visits': db_visits,
+            'missing_count': len(missing),
+            'mismatched_count': len(mismatched),
+            'missing': missing[:MAX_REPORTED_MISMATCHES],
+            'mismatched': mismatched[:MAX_REPORTED_MISMATCHES]
+        }
+
+    def _commit(self, batch: List[Dict], batch_visits: int, last_file: str, checkpoint: Dict) -> int:
+        """Write one batch in a transaction, then advance the checkpoint"""
+        written = self.target.save_patients(batch)
+        checkpoint['migrated'] += written
+        checkpoint['visits'] += batch_visits
+        checkpoint['last_file'] = last_file
+        # A crash between commit and checkpoint only replays an idempotent upsert
+        self._save_checkpoint(checkpoint)
+        return written
+
+    def _load_checkpoint(self) -> Optional[Dict]:
+        if not self.checkpoint_path.exists():
+            return None
+        try:
+            with open(self.checkpoint_path, 'r', encoding='utf-8') as f:
+                checkpoint = json.load(f)
+            if checkpoint.get('source_dir') != str(self.source_dir.resolve()):
+                logger.warning("Checkpoint belongs to a different source directory, ignoring it")
+                return None
+            return checkpoint
+        except Exception as e:
+            logger.warning(f"Unreadable checkpoint, starting over: {e}")
+            return None
+
+    def _save_checkpoint(self, checkpoint: Dict):
+        checkpoint['source_dir'] = str(self.source_dir.resolve())
+        tmp_path = self.checkpoint_path.with_suffix('.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(checkpoint, f)
+        os.replace(tmp_path, self.checkpoint_path)
+
+    def _write_reject(self, filename: str, reason: str):
+        logger.warning(f"Rejected {filename}: {reason}")
+        with open(self.rejects_path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps({'file': filename, 'reason': reason}, ensure_ascii=False) + '\n')
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Migrate JSON patient files to SQLite")
+    parser.add_argument('--source', default='data/patients', help="JSON patient directory")
+    parser.add_argument('--target', default='data/emr.db', help="SQLite database file")
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument('--checkpoint', help="Checkpoint file (default: <target>.migration.json)")
+    parser.add_argument('--no-resume', action='store_true', help="Ignore any existing checkpoint")
+    parser.add_argument('--verify-only', action='store_true', help="Only run verification")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s %(message)s")
+
+    migration = Migration(args.source, args.target, args.batch_size, args.checkpoint)
+
+    if not args.verify_only:
+        report = migration.run(resume=not args.no_resume)
+        print(json.dumps(report, indent=2))
+
+    verification = migration.verify()
+    print(json.dumps(verification, indent=2))
+    return 0 if verification['ok'] else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
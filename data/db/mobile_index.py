@@ -0,0 +1,113 @@
+"""
+Mobile Number Index
+Persistent mobile -> patient_id lookup used for duplicate detection at registration
+Rebuilt from the patient files whenever it is missing or stale
+"""
+
+from typing import Dict, Iterable, Optional, Tuple
+import logging
+from pathlib import Path
+
+from data.db.dir_index import PersistentDirectoryIndex, get_shared_index
+from data.db.serializers import load_file
+
+logger = logging.getLogger(__name__)
+
+
+class MobileIndex(PersistentDirectoryIndex):
+    """
+    Secondary index on patient mobile numbers.
+    Kept in sync by JSONAdapter.save_patient/delete_patient and persisted to
+    <data_dir>/indexes/mobile.json so lookups never scan the patient files.
+    """
+
+    label = "mobile index"
+    index_name = "mobile.json"
+
+    def __init__(self, data_dir: Path):
+        super().__init__(data_dir)
+        self._by_mobile: Dict[str, str] = {}
+        self._by_id: Dict[str, str] = {}
+
+    def find(self, mobile: str) -> Optional[str]:
+        """Return the patient id registered with this mobile number"""
+        with self._lock:
+            self._ensure_fresh()
+            return self._by_mobile.get(mobile)
+
+    def update(self, patient_id: str, mobile: Optional[str]):
+        """Record the mobile number of a saved patient"""
+        self.update_many([(patient_id, mobile)])
+
+    def update_many(self, entries: Iterable[Tuple[str, Optional[str]]]):
+        """Record the mobile numbers of several saved patients (one delta log append)"""
+        with self._lock:
+            # The caller has just written the patient files, so the directory
+            # mtime is expected to have moved - don't treat that as staleness
+            self._ensure_fresh(check_dir=False)
+
+            changes = [{'id': patient_id, 'mobile': mobile}
+                       for patient_id, mobile in entries if self._set(patient_id, mobile)]
+
+            if changes:
+                self._record(changes)
+            else:
+                # Rewrites move the directory mtime too; that's not staleness
+                self._mark_current()
+
+    def _set(self, patient_id: str, mobile: Optional[str]) -> bool:
+        """Point a patient at a mobile number (None to drop it); False if unchanged"""
+        old_mobile = self._by_id.get(patient_id)
+        if old_mobile == mobile:
+            return False
+
+        if old_mobile and self._by_mobile.get(old_mobile) == patient_id:
+            del self._by_mobile[old_mobile]
+        self._by_id.pop(patient_id, None)
+
+        if mobile:
+            self._by_id[patient_id] = mobile
+            self._by_mobile.setdefault(mobile, patient_id)
+        return True
+
+    def remove(self, patient_id: str):
+        """Forget a deleted patient"""
+        self.update(patient_id, None)
+
+    def _build(self) -> int:
+        """Read every patient file (lock held)"""
+        by_mobile: Dict[str, str] = {}
+        by_id: Dict[str, str] = {}
+
+        # Sorted so the oldest registration wins if a mobile is duplicated
+        for filepath in sorted(self.data_dir.glob("*.json")):
+            try:
+                patient = load_file(filepath)
+            except Exception as e:
+                logger.warning(f"Error reading {filepath}: {e}")
+                continue
+
+            patient_id = patient.get('id', filepath.stem)
+            mobile = patient.get('mobile')
+            if mobile:
+                by_id[patient_id] = mobile
+                by_mobile.setdefault(mobile, patient_id)
+
+        self._by_mobile = by_mobile
+        self._by_id = by_id
+        return len(by_mobile)
+
+    def _payload(self) -> Dict:
+        return {'by_mobile': self._by_mobile, 'by_id': self._by_id}
+
+    def _load_payload(self, stored: Dict):
+        self._by_mobile = dict(stored.get('by_mobile', {}))
+        self._by_id = dict(stored.get('by_id', {}))
+
+    def _apply_delta(self, entry: Dict):
+        self._set(entry['id'], entry['mobile'])
+
+
+def get_mobile_index(data_dir) -> MobileIndex:
+    """Get the shared mobile index for a patient data directory"""
+    return get_shared_index(MobileIndex, data_dir)
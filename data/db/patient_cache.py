@@ -0,0 +1,140 @@
+"""
+Patient Record Cache
+Process-wide read-through index of parsed patient files
+Each file (and its visit journal) is revalidated with os.stat (mtime + size)
+so only changed files are re-read
+"""
+
+import os
+import threading
+from typing import Dict, List, Optional, Tuple
+import logging
+from pathlib import Path
+
+from data.db.serializers import load_file
+from data.db.visit_journal import VisitJournal
+
+logger = logging.getLogger(__name__)
+
+
+class PatientCache:
+    """
+    In-memory index of patient records keyed by patient id.
+    Dicts handed out are shared between callers - treat them as read-only.
+    """
+
+    def __init__(self, data_dir: Path):
+        self.data_dir = Path(data_dir)
+        self.journal = VisitJournal(self.data_dir)
+        # patient_id -> (file signature, journal signature, merged record)
+        self._entries: Dict[str, Tuple[Tuple[int, int], Optional[Tuple[int, int]], Dict]] = {}
+        self._lock = threading.Lock()
+
+    def get_all(self) -> List[Dict]:
+        """Return all patient records, re-reading only files that changed"""
+        seen = set()
+        patients = []
+
+        with self._lock:
+            try:
+                entries = list(os.scandir(self.data_dir))
+            except FileNotFoundError:
+                self._entries.clear()
+                return []
+
+            for entry in entries:
+                if not entry.name.endswith('.json') or not entry.is_file():
+                    continue
+
+                patient_id = entry.name[:-len('.json')]
+                record = self._get_entry(patient_id, entry.path, entry.stat())
+                if record is None:
+                    continue
+
+                seen.add(patient_id)
+                patients.append(record)
+
+            # Drop records whose files were removed behind our back
+            for patient_id in list(self._entries):
+                if patient_id not in seen:
+                    del self._entries[patient_id]
+
+        return patients
+
+    def get(self, patient_id: str) -> Optional[Dict]:
+        """Return a single cached record, revalidating its file"""
+        filepath = self.data_dir / f"{patient_id}.json"
+
+        with self._lock:
+            try:
+                stat = os.stat(filepath)
+            except FileNotFoundError:
+                self._entries.pop(patient_id, None)
+                return None
+
+            return self._get_entry(patient_id, str(filepath), stat)
+
+    def put(self, patient_id: str, record: Dict):
+        """
+        Cache a merged record the caller just wrote (patient lock held), keyed
+        by the current file and journal signatures. The record is shared from
+        now on - the caller must not mutate it.
+        """
+        filepath = self.data_dir / f"{patient_id}.json"
+
+        with self._lock:
+            try:
+                stat = os.stat(filepath)
+            except FileNotFoundError:
+                self._entries.pop(patient_id, None)
+                return
+
+            file_sig = (stat.st_mtime_ns, stat.st_size)
+            self._entries[patient_id] = (file_sig, self.journal.stat(patient_id), record)
+
+    def invalidate(self, patient_id: str):
+        """Forget a cached record (called after writes and deletes)"""
+        with self._lock:
+            self._entries.pop(patient_id, None)
+
+    def clear(self):
+        """Forget every cached record"""
+        with self._lock:
+            self._entries.clear()
+
+    def _get_entry(self, patient_id: str, path: str, stat: os.stat_result) -> Optional[Dict]:
+        """Serve from cache if file and journal are unchanged, otherwise re-read (lock held)"""
+        file_sig = (stat.st_mtime_ns, stat.st_size)
+        journal_sig = self.journal.stat(patient_id)
+
+        cached = self._entries.get(patient_id)
+        if cached and cached[0] == file_sig and cached[1] == journal_sig:
+            return cached[2]
+
+        try:
+            record = load_file(path)
+            self.journal.replay(patient_id, record)
+        except Exception as e:
+            logger.warning(f"Error reading {path}: {e}")
+            self._entries.pop(patient_id, None)
+            return None
+
+        self._entries[patient_id] = (file_sig, journal_sig, record)
+        return record
+
+
+# One cache per data directory, shared by every adapter in the process
+_caches: Dict[str, PatientCache] = {}
+_caches_lock = threading.Lock()
+
+
+def get_patient_cache(data_dir) -> PatientCache:
+    """Get the shared cache for a patient data directory"""
+    key = os.path.abspath(data_dir)
+
+    with _caches_lock:
+        cache = _caches.get(key)
+        if cache is None:
+            cache = PatientCache(Path(key))
+            _caches[key] = cache
+        return cache
@@ -0,0 +1,230 @@
+"""
+Patient Search Index
+In-memory prefix + trigram index over patient names and mobile numbers
+Maintained incrementally by JSONAdapter writes so sidebar searches never touch the disk
+"""
+
+import re
+import bisect
+from typing import Dict, List, Set, Tuple
+import logging
+from pathlib import Path
+
+from data.db.dir_index import DirectoryIndex, get_shared_index
+from data.db.patient_cache import get_patient_cache
+
+logger = logging.getLogger(__name__)
+
+# Ranking scores - higher is better
+SCORE_EXACT_NAME = 100
+SCORE_NAME_PREFIX = 90
+SCORE_TOKEN_PREFIX = 80
+SCORE_MOBILE_PREFIX = 75
+SCORE_MOBILE_SUBSTRING = 65
+SCORE_NAME_SUBSTRING = 60
+SCORE_FUZZY_MAX = 50
+
+# Minimum trigram similarity for a fuzzy (typo-tolerant) name match
+FUZZY_THRESHOLD = 0.35
+
+
+def _normalize_name(name: str) -> str:
+    return ' '.join(str(name or '').lower().split())
+
+
+def _digits(value: str) -> str:
+    return re.sub(r'\D', '', str(value or ''))
+
+
+def _trigrams(text: str) -> Set[str]:
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class PatientSearchIndex(DirectoryIndex):
+    """
+    Name/mobile search index for one patient data directory.
+    Built lazily from the shared patient cache, then kept current by
+    update()/remove() calls from the adapter's write paths.
+    """
+
+    label = "patient search index"
+
+    def __init__(self, data_dir: Path):
+        super().__init__(data_dir)
+        self.cache = get_patient_cache(self.data_dir)
+        # patient_id -> (normalized name, mobile digits)
+        self._docs: Dict[str, Tuple[str, str]] = {}
+        # Sorted (term, patient_id) pairs for prefix lookups
+        self._terms: List[Tuple[str, str]] = []
+        # trigram -> patient ids, for substring and fuzzy lookups
+        self._grams: Dict[str, Set[str]] = {}
+        self._built = False
+
+    def search(self, query: str, limit: int = 20) -> List[str]:
+        """Return patient ids matching the query, best match first"""
+        query = str(query or '').strip()
+        if not query:
+            return []
+
+        # "+91 98765-43210" style queries search mobiles, anything else searches names
+        is_mobile_query = bool(re.fullmatch(r'\+?[\d\s-]+', query))
+        text = _digits(query) if is_mobile_query else _normalize_name(query)
+        if not text:
+            return []
+
+        with self._lock:
+            self._ensure_fresh()
+
+            scores: Dict[str, float] = {}
+
+            def offer(patient_id: str, score: float):
+                if score > scores.get(patient_id, 0):
+                    scores[patient_id] = score
+
+            # Prefix matches on whole names, name tokens and mobile numbers
+            for term, patient_id in self._prefix_lookup(text):
+                name, mobile = self._docs[patient_id]
+                if is_mobile_query:
+                    offer(patient_id, SCORE_MOBILE_PREFIX)
+                elif name == text:
+                    offer(patient_id, SCORE_EXACT_NAME)
+                elif name.startswith(text):
+                    offer(patient_id, SCORE_NAME_PREFIX)
+                else:
+                    offer(patient_id, SCORE_TOKEN_PREFIX)
+
+            # Trigram candidates for substring and typo-tolerant matches
+            if len(text) >= 3:
+                self._trigram_matches(text, is_mobile_query, offer)
+
+            ranked = sorted(scores.items(),
+                            key=lambda item: (-item[1], self._docs[item[0]][0], item[0]))
+            return [patient_id for patient_id, _ in ranked[:limit]]
+
+    def update(self, patient_id: str, name: str, mobile: str):
+        """Index (or re-index) a saved patient"""
+        with self._lock:
+            if not self._built:
+                return
+            self._remove_doc(patient_id)
+            self._add_doc(patient_id, name, mobile)
+            self._mark_current()
+
+    def remove(self, patient_id: str):
+        """Drop a deleted patient from the index"""
+        with self._lock:
+            if not self._built:
+                return
+            self._remove_doc(patient_id)
+            self._mark_current()
+
+    def rebuild(self):
+        """Rebuild the index from the patient cache"""
+        with self._lock:
+            self._docs = {}
+            self._terms = []
+            self._grams = {}
+
+            dir_mtime = self._dir_mtime_ns()
+            for patient in self.cache.get_all():
+                patient_id = patient.get('id')
+                if patient_id:
+                    self._add_doc(patient_id, patient.get('name', ''),
+                                  patient.get('mobile', ''), keep_sorted=False)
+            self._terms.sort()
+
+            self._built = True
+            self._dir_mtime_seen = dir_mtime
+            logger.info(f"Built patient search index ({len(self._docs)} patients)")
+
+    def _ensure_fresh(self):
+        """Build on first use, rebuild if files were added or removed externally (lock held)"""
+        if not self._built or self._dir_changed():
+            self.rebuild()
+
+    def _prefix_lookup(self, prefix: str) -> List[Tuple[str, str]]:
+        """All (term, patient_id) pairs whose term starts with prefix (lock held)"""
+        start = bisect.bisect_left(self._terms, (prefix, ''))
+        matches = []
+        for i in range(start, len(self._terms)):
+            term, patient_id = self._terms[i]
+            if not term.startswith(prefix):
+                break
+            matches.append((term, patient_id))
+        return matches
+
+    def _trigram_matches(self, text: str, is_mobile_query: bool, offer):
+        """Score substring and fuzzy matches via the trigram postings (lock held)"""
+        query_grams = _trigrams(text)
+        overlap: Dict[str, int] = {}
+        for gram in query_grams:
+            for patient_id in self._grams.get(gram, ()):
+                overlap[patient_id] = overlap.get(patient_id, 0) + 1
+
+        for patient_id, shared in overlap.items():
+            name, mobile = self._docs[patient_id]
+
+            if is_mobile_query:
+                # Every trigram present is necessary but not sufficient - confirm
+                if shared == len(query_grams) and text in mobile:
+                    offer(patient_id, SCORE_MOBILE_SUBSTRING)
+                continue
+
+            if shared == len(query_grams) and text in name:
+                offer(patient_id, SCORE_NAME_SUBSTRING)
+                continue
+
+            # Jaccard similarity on name trigrams for typo tolerance
+            union = len(query_grams) + len(_trigrams(name)) - shared
+            similarity = shared / union if union else 0
+            if similarity >= FUZZY_THRESHOLD:
+                offer(patient_id, SCORE_FUZZY_MAX * similarity)
+
+    def _terms_for(self, name: str, mobile: str) -> Set[str]:
+        terms = set()
+        if name:
+            terms.add(name)
+            terms.update(name.split())
+        if mobile:
+            terms.add(mobile)
+            # Doctors usually type the local number without the country code
+            if len(mobile) > 10:
+                terms.add(mobile[-10:])
+        return terms
+
+    def _add_doc(self, patient_id: str, name: str, mobile: str, keep_sorted: bool = True):
+        name = _normalize_name(name)
+        mobile = _digits(mobile)
+        self._docs[patient_id] = (name, mobile)
+
+        for term in self._terms_for(name, mobile):
+            if keep_sorted:
+                bisect.insort(self._terms, (term, patient_id))
+            else:
+                self._terms.append((term, patient_id))
+
+        for gram in _trigrams(name) | _trigrams(mobile):
+            self._grams.setdefault(gram, set()).add(patient_id)
+
+    def _remove_doc(self, patient_id: str):
+        doc = self._docs.pop(patient_id, None)
+        if doc is None:
+            return
+        name, mobile = doc
+
+        for term in self._terms_for(name, mobile):
+            i = bisect.bisect_left(self._terms, (term, patient_id))
+            if i < len(self._terms) and self._terms[i] == (term, patient_id):
+                del self._terms[i]
+
+        for gram in _trigrams(name) | _trigrams(mobile):
+            postings = self._grams.get(gram)
+            if postings:
+                postings.discard(patient_id)
+                if not postings:
+                    del self._grams[gram]
+
+
+def get_search_index(data_dir) -> PatientSearchIndex:
+    """Get the shared search index for a patient data directory"""
+    return get_shared_index(PatientSearchIndex, data_dir)
@@ -0,0 +1,138 @@
+"""
+Patient Record Serializers
+Pluggable on-disk encodings for patient files, autodetected on read
+
+    json-pretty  indented UTF-8 JSON (the original format, default)
+    json         compact UTF-8 JSON, no indentation
+    json-gzip    compact JSON, gzip compressed (stdlib)
+    json-zstd    compact JSON, zstd compressed (needs `zstandard`)
+    msgpack      MessagePack binary (needs `msgpack`)
+
+Files keep the .json extension whatever the encoding, so every existing
+glob over the patient directory keeps working.
+"""
+
+import gzip
+import json
+from typing import Any, Dict
+import logging
+from pathlib import Path
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+logger = logging.getLogger(__name__)
+
+GZIP_MAGIC = b'\x1f\x8b'
+ZSTD_MAGIC = b'\x28\xb5\x2f\xfd'
+
+
+class Serializer:
+    """Encodes a record to bytes; decoding is format-agnostic (see loads)"""
+
+    name = ''
+
+    def dumps(self, obj: Any) -> bytes:
+        raise NotImplementedError
+
+
+class PrettyJSONSerializer(Serializer):
+    name = 'json-pretty'
+
+    def dumps(self, obj: Any) -> bytes:
+        return json.dumps(obj, indent=2, ensure_ascii=False).encode('utf-8')
+
+
+class CompactJSONSerializer(Serializer):
+    name = 'json'
+
+    def dumps(self, obj: Any) -> bytes:
+        return json.dumps(obj, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+class GzipJSONSerializer(Serializer):
+    name = 'json-gzip'
+
+    def __init__(self, level: int = 6):
+        self.level = level
+
+    def dumps(self, obj: Any) -> bytes:
+        # mtime=0 keeps output deterministic for identical records
+        return gzip.compress(CompactJSONSerializer().dumps(obj), compresslevel=self.level, mtime=0)
+
+
+class ZstdJSONSerializer(Serializer):
+    name = 'json-zstd'
+
+    def __init__(self, level: int = 3):
+        self._compressor = zstandard.ZstdCompressor(level=level)
+
+    def dumps(self, obj: Any) -> bytes:
+        return self._compressor.compress(CompactJSONSerializer().dumps(obj))
+
+
+class MsgpackSerializer(Serializer):
+    name = 'msgpack'
+
+    def dumps(self, obj: Any) -> bytes:
+        return msgpack.packb(obj, use_bin_type=True)
+
+
+def available_serializers() -> Dict[str, type]:
+    """Serializers usable with the packages installed here"""
+    serializers = {
+        PrettyJSONSerializer.name: PrettyJSONSerializer,
+        CompactJSONSerializer.name: CompactJSONSerializer,
+        GzipJSONSerializer.name: GzipJSONSerializer,
+    }
+    if zstandard is not None:
+        serializers[ZstdJSONSerializer.name] = ZstdJSONSerializer
+    if msgpack is not None:
+        serializers[MsgpackSerializer.name] = MsgpackSerializer
+    return serializers
+
+
+def get_serializer(name: str = None) -> Serializer:
+    """Get a serializer by name, falling back to json-pretty"""
+    serializers = available_serializers()
+    name = (name or PrettyJSONSerializer.name).strip().lower()
+
+    if name not in serializers:
+        logger.warning(f"Patient format '{name}' unavailable, using {PrettyJSONSerializer.name}")
+        name = PrettyJSONSerializer.name
+
+    return serializers[name]()
+
+
+def loads(data: bytes) -> Any:
+    """Decode a record written by any serializer, detected from its leading bytes"""
+    if data.startswith(GZIP_MAGIC):
+        return json.loads(gzip.decompress(data))
+
+    if data.startswith(ZSTD_MAGIC):
+        if zstandard is None:
+            raise ValueError("zstd-compressed record but `zstandard` is not installed")
+        return json.loads(zstandard.ZstdDecompressor().decompress(data))
+
+    # JSON text starts with '{' (possibly after whitespace or a UTF-8 BOM);
+    # a msgpack map starts with a fixmap (0x80-0x8f) or map16/map32 marker
+    first = data[:1]
+    if first and (0x80 <= first[0] <= 0x8f or first[0] in (0xde, 0xdf)):
+        if msgpack is None:
+            raise ValueError("msgpack record but `msgpack` is not installed")
+        return msgpack.unpackb(data, raw=False)
+
+    return json.loads(data.decode('utf-8-sig'))
+
+
+def load_file(path: Path) -> Any:
+    """Read and decode one patient file"""
+    with open(path, 'rb') as f:
+        return loads(f.read())
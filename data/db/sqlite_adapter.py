@@ -0,0 +1,569 @@
+"""
+SQLite Database Adapter
+Drop-in replacement for JSONAdapter backed by a single SQLite database
+Patients and visits live in normalized, indexed tables (WAL mode)
+"""
+
+import os
+import json
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+import logging
+from pathlib import Path
+from datetime import datetime
+
+from data.db.locking import VersionConflictError, WriteGeneration, atomic_write_text
+from data.db.visit_stats import has_visit_stats, record_visit_added, refresh_visit_stats
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS patients (
+    id          TEXT PRIMARY KEY,
+    name        TEXT NOT NULL DEFAULT '',
+    age         INTEGER,
+    sex         TEXT,
+    mobile      TEXT,
+    created_at  TEXT,
+    updated_at  TEXT,
+    data        TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS visits (
+    patient_id  TEXT NOT NULL REFERENCES patients(id) ON DELETE CASCADE,
+    seq         INTEGER NOT NULL,
+    visit_id    TEXT,
+    timestamp   TEXT,
+    doctor      TEXT,
+    visit_type  TEXT,
+    data        TEXT NOT NULL,
+    PRIMARY KEY (patient_id, seq)
+);
+
+CREATE INDEX IF NOT EXISTS idx_patients_mobile ON patients(mobile);
+CREATE INDEX IF NOT EXISTS idx_patients_name ON patients(name COLLATE NOCASE);
+CREATE INDEX IF NOT EXISTS idx_visits_visit_id ON visits(visit_id);
+CREATE INDEX IF NOT EXISTS idx_visits_timestamp ON visits(timestamp);
+CREATE INDEX IF NOT EXISTS idx_visits_doctor ON visits(doctor);
+CREATE INDEX IF NOT EXISTS idx_visits_patient_timestamp ON visits(patient_id, timestamp);
+"""
+
+
+class SQLiteAdapter:
+    """
+    Adapter for SQLite storage.
+    Same interface as JSONAdapter - records go in and come out as plain dicts.
+    The full record is kept as JSON in the `data` columns so nothing is lost;
+    the other columns are indexed copies used for lookups.
+    """
+
+    def __init__(self, db_path: str = "data/emr.db"):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+        self.generation = WriteGeneration(self.db_path.with_name(f"{self.db_path.name}.generation"))
+
+        self._connect().executescript(SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        """Get this thread's connection (Streamlit serves sessions from several threads)"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            # Autocommit mode - write transactions are opened explicitly by _transaction()
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA foreign_keys=ON")
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def _transaction(self):
+        """
+        Write transaction taken with BEGIN IMMEDIATE, so version checks and the
+        writes that follow them are atomic with respect to other writers.
+        """
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        self.generation.bump()
+
+    def write_generation(self) -> int:
+        """Changes whenever any process commits a write (see WriteGeneration)"""
+        return self.generation.current()
+
+    def _check_version(self, conn: sqlite3.Connection, patient_id: str,
+                       expected_version: Optional[int]) -> Optional[Dict]:
+        """Return the stored patient row data (None if missing), enforcing expected_version"""
+        row = conn.execute("SELECT data FROM patients WHERE id = ?", (patient_id,)).fetchone()
+        record = json.loads(row['data']) if row else None
+        current_version = record.get('version', 0) if record else 0
+
+        if expected_version is not None and expected_version != current_version:
+            raise VersionConflictError(patient_id, expected_version, current_version)
+
+        return record
+
+    def _bump_version(self, conn: sqlite3.Connection, record: Dict):
+        """Record a visit-level change on the patient row"""
+        record['version'] = record.get('version', 0) + 1
+        conn.execute(
+            "UPDATE patients SET data = ? WHERE id = ?",
+            (json.dumps(record, ensure_ascii=False), record['id'])
+        )
+
+    def _refresh_visit_stats(self, conn: sqlite3.Connection, record: Dict):
+        """Recompute the stored visit stats from the (patient_id, timestamp) index"""
+        row = conn.execute(
+            "SELECT COUNT(*), MAX(timestamp) FROM visits WHERE patient_id = ?", (record['id'],)
+        ).fetchone()
+        record['visit_count'] = row[0]
+        record['last_visit_timestamp'] = row[1]
+
+    def save_patient(self, patient_data: Dict, expected_version: Optional[int] = None) -> bool:
+        """
+        Save patient data (patient row plus all visit rows) in one transaction.
+        Raises VersionConflictError if expected_version is given and stale.
+        """
+        try:
+            patient_id = patient_data['id']
+
+            with self._transaction() as conn:
+                current = self._check_version(conn, patient_id, expected_version)
+                record = {**patient_data, 'version': (current or {}).get('version', 0) + 1}
+                self._write_patient(conn, record)
+
+            patient_data['version'] = record['version']
+            logger.info(f"Saved patient {patient_id}")
+            return True
+
+        except VersionConflictError:
+            raise
+        except Exception as e:
+            logger.error(f"Error saving patient: {e}")
+            return False
+
+    def save_patients(self, patients: List[Dict]) -> int:
+        """Save a batch of patients verbatim in a single transaction, returns number written"""
+        if not patients:
+            return 0
+
+        with self._transaction() as conn:
+            for patient_data in patients:
+                self._write_patient(conn, patient_data)
+
+        logger.info(f"Saved batch of {len(patients)} patients")
+        return len(patients)
+
+    def _write_patient(self, conn: sqlite3.Connection, patient_data: Dict):
+        """Upsert a patient and replace its visits (caller owns the transaction)"""
+        patient_id = patient_data['id']
+        refresh_visit_stats(patient_data)
+        record = {k: v for k, v in patient_data.items() if k != 'visits'}
+
+        conn.execute(
+            """
+            INSERT INTO patients (id, name, age, sex, mobile, created_at, updated_at, data)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(id) DO UPDATE SET
+                name = excluded.name, age = excluded.age, sex = excluded.sex,
+                mobile = excluded.mobile, created_at = excluded.created_at,
+                updated_at = excluded.updated_at, data = excluded.data
+            """,
+            (
+                patient_id,
+                patient_data.get('name', ''),
+                patient_data.get('age'),
+                patient_data.get('sex'),
+                patient_data.get('mobile'),
+                patient_data.get('created_at') or patient_data.get('registration_date'),
+                patient_data.get('updated_at'),
+                json.dumps(record, ensure_ascii=False)
+            )
+        )
+
+        conn.execute("DELETE FROM visits WHERE patient_id = ?", (patient_id,))
+        conn.executemany(
+            """
+            INSERT INTO visits (patient_id, seq, visit_id, timestamp, doctor, visit_type, data)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            """,
+            [
+                (
+                    patient_id, seq,
+                    visit.get('visit_id'),
+                    visit.get('timestamp'),
+                    visit.get('doctor'),
+                    visit.get('visit_type'),
+                    json.dumps(visit, ensure_ascii=False)
+                )
+                for seq, visit in enumerate(patient_data.get('visits', []))
+            ]
+        )
+
+    def load_patient(self, patient_id: str) -> Optional[Dict]:
+        """Load patient data with its visits"""
+        try:
+            conn = self._connect()
+            row = conn.execute(
+                "SELECT data FROM patients WHERE id = ?", (patient_id,)
+            ).fetchone()
+
+            if row is None:
+                return None
+
+            patient = json.loads(row['data'])
+            patient['visits'] = [
+                json.loads(visit_row['data'])
+                for visit_row in conn.execute(
+                    "SELECT data FROM visits WHERE patient_id = ? ORDER BY seq",
+                    (patient_id,)
+                )
+            ]
+            if not has_visit_stats(patient):
+                refresh_visit_stats(patient)
+            return patient
+
+        except Exception as e:
+            logger.error(f"Error loading patient {patient_id}: {e}")
+            return None
+
+    def get_patient(self, patient_id: str) -> Optional[Dict]:
+        """Read-only view of a patient record (a fresh load - SQLite keeps no cache)"""
+        return self.load_patient(patient_id)
+
+    def append_visit(self, patient_id: str, visit: Dict,
+                     expected_version: Optional[int] = None) -> bool:
+        """Add a visit as a single row insert"""
+        try:
+            with self._transaction() as conn:
+                record = self._check_version(conn, patient_id, expected_version)
+                if record is None:
+                    return False
+
+                seq = conn.execute(
+                    "SELECT COALESCE(MAX(seq), -1) + 1 FROM visits WHERE patient_id = ?",
+                    (patient_id,)
+                ).fetchone()[0]
+                conn.execute(
+                    """
+                    INSERT INTO visits (patient_id, seq, visit_id, timestamp, doctor, visit_type, data)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                    """,
+                    (patient_id, seq, visit.get('visit_id'), visit.get('timestamp'),
+                     visit.get('doctor'), visit.get('visit_type'),
+                     json.dumps(visit, ensure_ascii=False))
+                )
+                if has_visit_stats(record):
+                    record_visit_added(record, visit, record['visit_count'] + 1)
+                else:
+                    self._refresh_visit_stats(conn, record)
+                self._bump_version(conn, record)
+            return True
+
+        except VersionConflictError:
+            raise
+        except Exception as e:
+            logger.error(f"Error adding visit for {patient_id}: {e}")
+            return False
+
+    def update_visit(self, patient_id: str, visit_id: str, fields: Dict,
+                     expected_version: Optional[int] = None) -> bool:
+        """Set fields on an existing visit row"""
+        try:
+            with self._transaction() as conn:
+                record = self._check_version(conn, patient_id, expected_version)
+                if record is None:
+                    return False
+
+                rows = conn.execute(
+                    "SELECT seq, data FROM visits WHERE patient_id = ? AND visit_id = ?",
+                    (patient_id, visit_id)
+                ).fetchall()
+
+                for row in rows:
+                    visit = json.loads(row['data'])
+                    visit.update(fields)
+                    conn.execute(
+                        """
+                        UPDATE visits SET timestamp = ?, doctor = ?, visit_type = ?, data = ?
+                        WHERE patient_id = ? AND seq = ?
+                        """,
+                        (visit.get('timestamp'), visit.get('doctor'), visit.get('visit_type'),
+                         json.dumps(visit, ensure_ascii=False), patient_id, row['seq'])
+                    )
+
+                if rows:
+                    if 'timestamp' in fields:
+                        self._refresh_visit_stats(conn, record)
+                    self._bump_version(conn, record)
+            return bool(rows)
+
+        except VersionConflictError:
+            raise
+        except Exception as e:
+            logger.error(f"Error updating visit {visit_id}: {e}")
+            return False
+
+    def remove_visit(self, patient_id: str, visit_id: str,
+                     expected_version: Optional[int] = None) -> bool:
+        """Delete a visit row"""
+        try:
+            with self._transaction() as conn:
+                record = self._check_version(conn, patient_id, expected_version)
+                if record is None:
+                    return False
+
+                cursor = conn.execute(
+                    "DELETE FROM visits WHERE patient_id = ? AND visit_id = ?",
+                    (patient_id, visit_id)
+                )
+                if cursor.rowcount:
+                    self._refresh_visit_stats(conn, record)
+                    self._bump_version(conn, record)
+            return cursor.rowcount > 0
+
+        except VersionConflictError:
+            raise
+        except Exception as e:
+            logger.error(f"Error deleting visit {visit_id}: {e}")
+            return False
+
+    def backfill_visit_stats(self) -> int:
+        """
+        One-shot upgrade: store visit_count / last_visit_timestamp on every
+        patient row written before they existed. Returns rows updated.
+        """
+        updated = 0
+
+        with self._transaction() as conn:
+            for row in conn.execute("SELECT data FROM patients").fetchall():
+                record = json.loads(row['data'])
+                if has_visit_stats(record):
+                    continue
+
+                self._refresh_visit_stats(conn, record)
+                conn.execute(
+                    "UPDATE patients SET data = ? WHERE id = ?",
+                    (json.dumps(record, ensure_ascii=False), record['id'])
+                )
+                updated += 1
+
+        logger.info(f"Backfilled visit stats for {updated} patients")
+        return updated
+
+    def compact_patient(self, patient_id: str) -> bool:
+        """Nothing to compact - visits are already stored row by row"""
+        return self.patient_exists(patient_id)
+
+    def delete_patient(self, patient_id: str) -> bool:
+        """Delete patient and (via cascade) all of their visits"""
+        try:
+            with self._transaction() as conn:
+                cursor = conn.execute("DELETE FROM patients WHERE id = ?", (patient_id,))
+
+            if cursor.rowcount:
+                logger.info(f"Deleted patient {patient_id}")
+                return True
+
+            return False
+
+        except Exception as e:
+            logger.error(f"Error deleting patient {patient_id}: {e}")
+            return False
+
+    def get_all_patients(self) -> List[Dict]:
+        """Get all patient records (two queries, no per-patient round trips)"""
+        try:
+            conn = self._connect()
+            patients = {}
+
+            for row in conn.execute("SELECT id, data FROM patients ORDER BY id"):
+                patient = json.loads(row['data'])
+                patient['visits'] = []
+                patients[row['id']] = patient
+
+            for row in conn.execute("SELECT patient_id, data FROM visits ORDER BY patient_id, seq"):
+                patient = patients.get(row['patient_id'])
+                if patient is not None:
+                    patient['visits'].append(json.loads(row['data']))
+
+            for patient in patients.values():
+                if not has_visit_stats(patient):
+                    refresh_visit_stats(patient)
+
+            return list(patients.values())
+
+        except Exception as e:
+            logger.error(f"Error getting all patients: {e}")
+            return []
+
+    def get_patient_summaries(self) -> List[Dict]:
+        """
+        Get the summary header of every patient.
+        Visit count and last visit come from the (patient_id, timestamp)
+        index, so no visit or patient JSON is decoded.
+        """
+        try:
+            rows = self._connect().execute(
+                """
+                SELECT p.id, p.name, p.mobile, p.age, p.sex,
+                       COUNT(v.patient_id) AS visit_count,
+                       MAX(v.timestamp) AS last_timestamp
+                FROM patients p LEFT JOIN visits v ON v.patient_id = p.id
+                GROUP BY p.id
+                ORDER BY p.id
+                """
+            ).fetchall()
+
+            return [
+                {
+                    'id': row['id'],
+                    'name': row['name'],
+                    'mobile': row['mobile'],
+                    'age': row['age'],
+                    'sex': row['sex'],
+                    'visit_count': row['visit_count'],
+                    'last_visit': row['last_timestamp'].split('T')[0] if row['last_timestamp'] else None
+                }
+                for row in rows
+            ]
+
+        except Exception as e:
+            logger.error(f"Error getting patient summaries: {e}")
+            return []
+
+    def search_patients(self, search_term: str, limit: int = 20) -> List[Dict]:
+        """Search patients by name or mobile, best matches first"""
+        try:
+            term = ' '.join(str(search_term or '').split())
+            if not term:
+                return []
+
+            # Escape LIKE wildcards typed by the user
+            escaped = term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+            rows = self._connect().execute(
+                """
+                SELECT id FROM patients
+                WHERE name LIKE ? ESCAPE '\\' OR mobile LIKE ? ESCAPE '\\'
+                ORDER BY
+                    CASE
+                        WHEN name = ? COLLATE NOCASE THEN 0
+                        WHEN name LIKE ? ESCAPE '\\' THEN 1
+                        WHEN mobile LIKE ? ESCAPE '\\' THEN 2
+                        ELSE 3
+                    END,
+                    name COLLATE NOCASE, id
+                LIMIT ?
+                """,
+                (f"%{escaped}%", f"%{escaped}%", term, f"{escaped}%", f"%{escaped}%", limit)
+            ).fetchall()
+
+            results = []
+            for row in rows:
+                patient = self.load_patient(row['id'])
+                if patient:
+                    results.append(patient)
+            return results
+
+        except Exception as e:
+            logger.error(f"Error searching patients: {e}")
+            return []
+
+    def find_patient_id_by_mobile(self, mobile: str) -> Optional[str]:
+        """Look up a patient id by mobile number (indexed)"""
+        try:
+            row = self._connect().execute(
+                "SELECT id FROM patients WHERE mobile = ? ORDER BY id LIMIT 1", (mobile,)
+            ).fetchone()
+            return row['id'] if row else None
+
+        except Exception as e:
+            logger.error(f"Error looking up mobile {mobile}: {e}")
+            return None
+
+    def patient_exists(self, patient_id: str) -> bool:
+        """Check if patient exists"""
+        row = self._connect().execute(
+            "SELECT 1 FROM patients WHERE id = ?", (patient_id,)
+        ).fetchone()
+        return row is not None
+
+    def get_patient_count(self) -> int:
+        """Get total number of patients"""
+        return self._connect().execute("SELECT COUNT(*) FROM patients").fetchone()[0]
+
+    def get_database_size_mb(self) -> float:
+        """Get size of the database file (plus WAL) in MB"""
+        total_size = 0
+
+        for suffix in ('', '-wal'):
+            path = Path(f"{self.db_path}{suffix}")
+            if path.exists():
+                total_size += path.stat().st_size
+
+        return round(total_size / (1024 * 1024), 2)
+
+    def backup_patient(self, patient_id: str) -> bool:
+        """Create a JSON backup of patient data next to the database"""
+        try:
+            patient_data = self.load_patient(patient_id)
+            if not patient_data:
+                return False
+
+            backup_dir = self.db_path.parent / "backups"
+            backup_dir.mkdir(exist_ok=True)
+
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            backup_path = backup_dir / f"{patient_id}_{timestamp}.json"
+
+            atomic_write_text(backup_path, json.dumps(patient_data, indent=2, ensure_ascii=False))
+
+            logger.info(f"Created backup for patient {patient_id}")
+            return True
+
+        except Exception as e:
+            logger.error(f"Error creating backup: {e}")
+            return False
+
+    def load_config(self, config_name: str) -> Dict:
+        """Load configuration file from data/config"""
+        try:
+            config_path = Path("data/config") / f"{config_name}.json"
+
+            if not config_path.exists():
+                logger.warning(f"Config file not found: {config_name}")
+                return {}
+
+            with open(config_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+
+        except Exception as e:
+            logger.error(f"Error loading config {config_name}: {e}")
+            return {}
+
+    def save_config(self, config_name: str, config_data: Dict) -> bool:
+        """Save configuration file"""
+        try:
+            config_dir = Path("data/config")
+            config_dir.mkdir(parents=True, exist_ok=True)
+
+            config_path = config_dir / f"{config_name}.json"
+
+            atomic_write_text(config_path, json.dumps(config_data, indent=2, ensure_ascii=False))
+
+            logger.info(f"Saved config {config_name}")
+            return True
+
+        except Exception as e:
+            logger.error(f"Error saving config {config_name}: {e}")
+            return False
@@ -0,0 +1,132 @@
+"""
+Patient Summary Index
+Persistent header projection of every patient (no visits) for list views and stats
+Rebuilt from the patient files whenever it is missing or stale
+"""
+
+from typing import Dict, Iterable, List, Optional
+import logging
+from pathlib import Path
+
+from data.db.dir_index import PersistentDirectoryIndex, get_shared_index
+from data.db.serializers import load_file
+from data.db.visit_journal import VisitJournal
+from data.db.visit_stats import has_visit_stats, refresh_visit_stats
+
+logger = logging.getLogger(__name__)
+
+# Fields copied verbatim from the patient record
+SUMMARY_FIELDS = ('id', 'name', 'mobile', 'age', 'sex')
+
+
+def summarize(patient: Dict) -> Dict:
+    """Project a full patient record to its summary header"""
+    summary = {field: patient.get(field) for field in SUMMARY_FIELDS}
+
+    # Stored on the record (see visit_stats) - no need to scan the visits
+    if not has_visit_stats(patient):
+        patient = refresh_visit_stats(dict(patient))
+    last_timestamp = patient['last_visit_timestamp']
+
+    summary['visit_count'] = patient['visit_count']
+    # Date part only, as shown in the patient list
+    summary['last_visit'] = last_timestamp.split('T')[0] if last_timestamp else None
+    return summary
+
+
+class PatientSummaryIndex(PersistentDirectoryIndex):
+    """
+    id -> summary header for every patient.
+    Kept in sync by JSONAdapter writes and persisted to
+    <data_dir>/indexes/summaries.json so listing patients never parses visits.
+    A visit write appends its one changed summary to the delta log.
+    """
+
+    label = "patient summary index"
+    index_name = "summaries.json"
+
+    def __init__(self, data_dir: Path):
+        super().__init__(data_dir)
+        self.journal = VisitJournal(self.data_dir)
+        self._summaries: Dict[str, Dict] = {}
+
+    def get_all(self) -> List[Dict]:
+        """All summaries in patient id order (registration order for generated ids)"""
+        with self._lock:
+            self._ensure_fresh()
+            return [self._summaries[patient_id] for patient_id in sorted(self._summaries)]
+
+    def get(self, patient_id: str) -> Optional[Dict]:
+        with self._lock:
+            self._ensure_fresh()
+            return self._summaries.get(patient_id)
+
+    def count(self) -> int:
+        with self._lock:
+            self._ensure_fresh()
+            return len(self._summaries)
+
+    def update(self, patient: Dict):
+        """Record the summary of a saved patient (merged record, visits included)"""
+        self.update_many([patient])
+
+    def update_many(self, patients: Iterable[Dict]):
+        """Record the summaries of several saved patients (one delta log append)"""
+        with self._lock:
+            # The caller has just written the patients, so the directory mtime
+            # is expected to have moved - don't treat that as staleness
+            self._ensure_fresh(check_dir=False)
+
+            changes = []
+            for patient in patients:
+                summary = summarize(patient)
+                if self._summaries.get(summary['id']) != summary:
+                    self._summaries[summary['id']] = summary
+                    changes.append({'id': summary['id'], 'summary': summary})
+
+            if changes:
+                self._record(changes)
+            else:
+                self._mark_current()
+
+    def remove(self, patient_id: str):
+        """Forget a deleted patient"""
+        with self._lock:
+            self._ensure_fresh(check_dir=False)
+            self._summaries.pop(patient_id, None)
+            self._record([{'id': patient_id, 'summary': None}])
+
+    def _build(self) -> int:
+        """Read every patient file and journal (lock held)"""
+        summaries: Dict[str, Dict] = {}
+
+        for filepath in self.data_dir.glob("*.json"):
+            try:
+                patient = load_file(filepath)
+                self.journal.replay(filepath.stem, patient)
+            except Exception as e:
+                logger.warning(f"Error reading {filepath}: {e}")
+                continue
+
+            patient.setdefault('id', filepath.stem)
+            summaries[patient['id']] = summarize(patient)
+
+        self._summaries = summaries
+        return len(summaries)
+
+    def _payload(self) -> Dict:
+        return {'summaries': self._summaries}
+
+    def _load_payload(self, stored: Dict):
+        self._summaries = dict(stored.get('summaries', {}))
+
+    def _apply_delta(self, entry: Dict):
+        if entry['summary'] is None:
+            self._summaries.pop(entry['id'], None)
+        else:
+            self._summaries[entry['id']] = entry['summary']
+
+
+def get_summary_index(data_dir) -> PatientSummaryIndex:
+    """Get the shared summary index for a patient data directory"""
+    return get_shared_index(PatientSummaryIndex, data_dir)
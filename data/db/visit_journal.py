@@ -0,0 +1,202 @@
+"""
+Visit Journal
+Per-patient append-only log of visit changes, merged into the patient file on read
+Adding or updating a visit appends one line instead of rewriting the whole history
+"""
+
+import os
+import json
+import uuid
+from typing import Dict, List, Optional, Tuple
+import logging
+from pathlib import Path
+
+from data.db.visit_stats import has_visit_stats, record_visit_added, refresh_visit_stats
+
+logger = logging.getLogger(__name__)
+
+# Fold the journal into the patient file once it grows past half the file size
+# (amortized O(1) bytes per change), but never bother below this many bytes
+JOURNAL_MIN_COMPACT_BYTES = 64 * 1024
+
+# Set on a patient file written by compaction: the id of the journal it folded in
+FOLDED_KEY = '_journal_folded'
+
+# ...and how many of that journal's ops it already contains
+FOLDED_OPS_KEY = '_journal_folded_ops'
+
+
+class VisitJournal:
+    """
+    Journal files live in <data_dir>/journal/<patient_id>.jsonl, one op per line:
+        {"op": "begin", "journal_id": "..."}
+        {"op": "add_visit", "visit": {...}}
+        {"op": "update_visit", "visit_id": "...", "fields": {...}}
+        {"op": "delete_visit", "visit_id": "..."}
+    Compaction stamps the patient file with the journal_id it folded in and
+    the number of ops it covered. If a crash between writing the file and
+    removing the journal leaves the journal behind, replay skips only those
+    ops: ops appended to the leftover journal afterwards are still applied.
+    """
+
+    def __init__(self, data_dir: Path):
+        self.journal_dir = Path(data_dir) / "journal"
+
+    def path_for(self, patient_id: str) -> Path:
+        return self.journal_dir / f"{patient_id}.jsonl"
+
+    def append(self, patient_id: str, op: Dict) -> int:
+        """Append one op and return the journal size in bytes"""
+        self.journal_dir.mkdir(parents=True, exist_ok=True)
+        path = self.path_for(patient_id)
+
+        # A new journal starts with a begin op carrying its unique id
+        try:
+            fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT | os.O_EXCL, 0o644)
+            try:
+                header = {'op': 'begin', 'journal_id': uuid.uuid4().hex}
+                os.write(fd, json.dumps(header, separators=(',', ':')).encode('utf-8'))
+            finally:
+                os.close(fd)
+        except FileExistsError:
+            pass
+
+        # Leading newline: a torn line left by a crash can never swallow the next op
+        line = '\n' + json.dumps(op, ensure_ascii=False, separators=(',', ':'))
+
+        # Single O_APPEND write so concurrent appenders never interleave
+        fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, line.encode('utf-8'))
+            os.fsync(fd)
+            return os.fstat(fd).st_size
+        finally:
+            os.close(fd)
+
+    def stat(self, patient_id: str) -> Optional[Tuple[int, int]]:
+        """(mtime_ns, size) of the journal, or None if there is none"""
+        try:
+            st = os.stat(self.path_for(patient_id))
+            return st.st_mtime_ns, st.st_size
+        except FileNotFoundError:
+            return None
+
+    def read_ops(self, patient_id: str) -> List[Dict]:
+        """Read all ops, skipping a torn final line from an interrupted append"""
+        ops = []
+        try:
+            with open(self.path_for(patient_id), 'r', encoding='utf-8') as f:
+                for line_no, line in enumerate(f, 1):
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        ops.append(json.loads(line))
+                    except json.JSONDecodeError:
+                        logger.warning(f"Skipping corrupt journal line {line_no} for {patient_id}")
+        except FileNotFoundError:
+            pass
+        return ops
+
+    def replay(self, patient_id: str, patient: Dict) -> Dict:
+        """Apply the patient's journal to a record loaded from its base file"""
+        folded = patient.pop(FOLDED_KEY, None)
+        folded_ops = patient.pop(FOLDED_OPS_KEY, None)
+        if not has_visit_stats(patient):
+            # Written before visit stats were stored (see backfill_visit_stats)
+            refresh_visit_stats(patient)
+
+        ops = self.read_ops(patient_id)
+        if ops and folded is not None and journal_id(ops) == folded:
+            # Left behind by a crash after compaction: only ops past the folded ones are new
+            # (files stamped before the op count was recorded folded the whole journal)
+            ops = op_entries(ops)[folded_ops:] if folded_ops is not None else []
+        if ops:
+            applied = apply_ops(patient, ops)
+            # Every journaled change is one version step past the base file
+            patient['version'] = patient.get('version', 0) + applied
+        return patient
+
+    def clear(self, patient_id: str):
+        """Remove the journal after its ops were folded into the patient file"""
+        try:
+            self.path_for(patient_id).unlink()
+        except FileNotFoundError:
+            pass
+
+    def needs_compaction(self, journal_size: int, base_size: int) -> bool:
+        return journal_size > max(JOURNAL_MIN_COMPACT_BYTES, base_size // 2)
+
+    def total_size(self) -> int:
+        """Bytes used by all journals"""
+        if not self.journal_dir.exists():
+            return 0
+        return sum(p.stat().st_size for p in self.journal_dir.glob("*.jsonl"))
+
+
+def journal_id(ops: List[Dict]) -> Optional[str]:
+    """The id from a journal's begin op"""
+    for op in ops:
+        if op.get('op') == 'begin':
+            return op.get('journal_id')
+    return None
+
+
+def op_entries(ops: List[Dict]) -> List[Dict]:
+    """A journal's change ops, without its begin op"""
+    return [op for op in ops if op.get('op') != 'begin']
+
+
+def applied(patient: Dict, op: Dict) -> Dict:
+    """
+    A new record with one more op applied, leaving `patient` untouched.
+    Only the visit list is copied, so it costs no re-read of the history.
+    """
+    record = {**patient, 'visits': list(patient.get('visits', []))}
+    # The op as replay would see it, detached from the caller's dicts
+    apply_ops(record, [json.loads(json.dumps(op, ensure_ascii=False))])
+    record['version'] = patient.get('version', 0) + 1
+    return record
+
+
+def apply_ops(patient: Dict, ops: List[Dict]) -> int:
+    """
+    Apply journal ops to a patient record in place, returns number applied.
+    Keeps visit_count / last_visit_timestamp current: O(1) per added visit,
+    recomputed only when a visit is removed or re-timed.
+    """
+    visits = patient.setdefault('visits', [])
+    applied = 0
+    stats_stale = False
+
+    for op in ops:
+        kind = op.get('op')
+
+        if kind == 'begin':
+            continue
+
+        applied += 1
+
+        if kind == 'add_visit':
+            visits.append(op['visit'])
+            record_visit_added(patient, op['visit'], len(visits))
+
+        elif kind == 'update_visit':
+            # Replaced rather than updated in place: the old visit dict may be
+            # shared with a cached record
+            for i, visit in enumerate(visits):
+                if visit.get('visit_id') == op['visit_id']:
+                    visits[i] = {**visit, **op['fields']}
+            stats_stale = stats_stale or 'timestamp' in op['fields']
+
+        elif kind == 'delete_visit':
+            visits[:] = [v for v in visits if v.get('visit_id') != op['visit_id']]
+            stats_stale = True
+
+        else:
+            logger.warning(f"Unknown journal op: {kind}")
+
+    if stats_stale:
+        refresh_visit_stats(patient)
+
+    return applied
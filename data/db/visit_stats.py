@@ -0,0 +1,32 @@
+"""
+Stored Visit Stats
+visit_count and last_visit_timestamp kept on the patient record itself,
+so listing patients never has to scan their visit histories
+"""
+
+from typing import Dict
+
+
+def refresh_visit_stats(patient: Dict) -> Dict:
+    """Recompute the stats from the patient's visit list (O(visits))"""
+    visits = patient.get('visits', [])
+    patient['visit_count'] = len(visits)
+    patient['last_visit_timestamp'] = max(
+        (v.get('timestamp') or '' for v in visits), default=''
+    ) or None
+    return patient
+
+
+def record_visit_added(patient: Dict, visit: Dict, visit_count: int) -> Dict:
+    """Update the stats for one added visit in O(1)"""
+    patient['visit_count'] = visit_count
+
+    timestamp = visit.get('timestamp')
+    if timestamp and timestamp > (patient.get('last_visit_timestamp') or ''):
+        patient['last_visit_timestamp'] = timestamp
+    return patient
+
+
+def has_visit_stats(patient: Dict) -> bool:
+    """False for records written before the stats were stored"""
+    return 'visit_count' in patient and 'last_visit_timestamp' in patient
@@ -0,0 +1,45 @@
+"""
+Analytics aggregates follow writes from this and other processes
+"""
+
+from core.analytics.aggregates import AnalyticsAggregates
+from core.visits.visit_manager import VisitManager
+from data.db import dir_index, patient_cache
+from data.db.json_adapter import JSONAdapter
+
+
+def _adapter(tmp_path):
+    adapter = JSONAdapter(str(tmp_path / "patients"))
+    assert adapter.save_patient({'id': 'P1', 'name': 'Test Patient', 'age': 30, 'sex': 'F', 'visits': []})
+    return adapter
+
+
+def test_own_writes_are_applied_incrementally(tmp_path, monkeypatch):
+    adapter = _adapter(tmp_path)
+    manager = VisitManager(adapter)
+    assert manager.aggregates.patient_analytics()['total_visits'] == 0
+
+    def recompute():
+        raise AssertionError("recomputed")
+    monkeypatch.setattr(manager.aggregates, 'recompute', recompute)
+
+    assert manager.create_visit('P1', {'doctor': 'dr_a'})['success']
+    assert manager.create_visit('P1', {'doctor': 'dr_a'})['success']
+    assert manager.aggregates.patient_analytics()['total_visits'] == 2
+
+
+def test_writes_from_another_process_trigger_a_recompute(tmp_path, monkeypatch):
+    adapter = _adapter(tmp_path)
+    aggregates = AnalyticsAggregates(adapter)
+    assert aggregates.patient_analytics()['total_visits'] == 0
+
+    # Another process: its own adapter, caches and indexes over the same files
+    monkeypatch.setattr(dir_index, '_indexes', {})
+    monkeypatch.setattr(patient_cache, '_caches', {})
+    other = JSONAdapter(str(tmp_path / "patients"))
+    assert other.append_visit('P1', {'visit_id': 'V1', 'timestamp': '2024-01-01T10:00:00', 'doctor': 'dr_b'})
+    assert other.save_patient({'id': 'P2', 'name': 'Second Patient', 'age': 70, 'sex': 'M', 'visits': []})
+
+    assert aggregates.patient_analytics()['total_visits'] == 1
+    assert aggregates.patient_statistics()['age_distribution']['60+'] == 1
+    assert aggregates.doctor_performance('dr_b')['total_visits'] == 1
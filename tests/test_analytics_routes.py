@@ -0,0 +1,39 @@
+"""
+Feedback routes report storage failures
+"""
+
+import pytest
+
+from api import analytics_routes
+from core.analytics.aggregates import AnalyticsAggregates
+from data.db.json_adapter import JSONAdapter
+
+
+@pytest.fixture
+def routes(tmp_path, monkeypatch):
+    adapter = JSONAdapter(str(tmp_path / "patients"))
+    assert adapter.save_patient({'id': 'P1', 'name': 'Test Patient', 'visits': []})
+    assert adapter.append_visit('P1', {'visit_id': 'V1', 'timestamp': '2024-01-01T10:00:00', 'doctor': 'dr_a'})
+
+    aggregates = AnalyticsAggregates(adapter)
+    aggregates.recompute()
+    monkeypatch.setattr(analytics_routes, 'db', adapter)
+    monkeypatch.setattr(analytics_routes, 'aggregates', aggregates)
+    return analytics_routes
+
+
+def test_feedback_is_saved_and_counted(routes):
+    result = routes.save_clinician_feedback('P1', 'V1', {'overall_rating': 5, 'summary_accuracy': 4})
+
+    assert result['success']
+    assert routes.get_feedback_stats()['total_feedback'] == 1
+    assert routes.save_visit_feedback('P1', 'V1', 'helpful') == {"success": True}
+    assert routes.db.get_patient('P1')['visits'][0]['quick_feedback']['type'] == 'helpful'
+
+
+def test_failed_writes_are_reported(routes, monkeypatch):
+    monkeypatch.setattr(routes.db, 'update_visit', lambda *args, **kwargs: False)
+
+    assert not routes.save_clinician_feedback('P1', 'V1', {'overall_rating': 5})['success']
+    assert not routes.save_visit_feedback('P1', 'V1', 'helpful')['success']
+    assert routes.get_feedback_stats()['total_feedback'] == 0
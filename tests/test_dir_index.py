@@ -0,0 +1,96 @@
+"""
+Directory index staleness and persistence
+"""
+
+import json
+
+from data.db import dir_index
+from data.db.json_adapter import JSONAdapter
+
+
+def test_indexes_pick_up_files_added_outside_the_adapter(tmp_path):
+    adapter = JSONAdapter(str(tmp_path))
+    assert adapter.save_patient({'id': 'P1', 'name': 'Ravi Kumar', 'mobile': '9876543210', 'visits': []})
+    assert adapter.find_patient_id_by_mobile('9876543210') == 'P1'
+
+    (tmp_path / "P2.json").write_text(json.dumps(
+        {'id': 'P2', 'name': 'Meena Devi', 'mobile': '9123456780', 'visits': []}))
+
+    assert adapter.find_patient_id_by_mobile('9123456780') == 'P2'
+    assert [summary['id'] for summary in adapter.get_patient_summaries()] == ['P1', 'P2']
+
+
+def test_persisted_indexes_load_without_rebuild(tmp_path, monkeypatch):
+    adapter = JSONAdapter(str(tmp_path))
+    assert adapter.save_patient({'id': 'P1', 'name': 'Ravi Kumar', 'mobile': '9876543210', 'visits': []})
+    adapter.get_patient_summaries()
+
+    # A fresh process: nothing in memory, the index files on disk are current
+    monkeypatch.setattr(dir_index, '_indexes', {})
+    def rebuild(self):
+        raise AssertionError(f"{self.label} rebuilt")
+    monkeypatch.setattr(dir_index.PersistentDirectoryIndex, 'rebuild', rebuild)
+
+    reopened = JSONAdapter(str(tmp_path))
+    assert reopened.find_patient_id_by_mobile('9876543210') == 'P1'
+    assert [summary['id'] for summary in reopened.get_patient_summaries()] == ['P1']
+
+
+def _summary(adapter, patient_id):
+    return next(s for s in adapter.get_patient_summaries() if s['id'] == patient_id)
+
+
+def test_visit_writes_append_to_the_delta_log(tmp_path, monkeypatch):
+    adapter = JSONAdapter(str(tmp_path))
+    assert adapter.save_patient({'id': 'P1', 'name': 'Ravi Kumar', 'mobile': '9876543210', 'visits': []})
+    index_path = adapter.summary_index.index_path
+    adapter.get_patient_summaries()
+    before = index_path.stat().st_mtime_ns
+
+    for day in range(1, 4):
+        assert adapter.append_visit('P1', {'visit_id': f'V{day}', 'timestamp': f'2024-01-0{day}T10:00:00'})
+
+    assert index_path.stat().st_mtime_ns == before
+    assert len(adapter.summary_index.delta_path.read_text().splitlines()) == 3
+    assert _summary(adapter, 'P1')['visit_count'] == 3
+
+    # Another process: index file plus delta log, no rebuild
+    monkeypatch.setattr(dir_index, '_indexes', {})
+    def rebuild(self):
+        raise AssertionError(f"{self.label} rebuilt")
+    monkeypatch.setattr(dir_index.PersistentDirectoryIndex, 'rebuild', rebuild)
+
+    reopened = JSONAdapter(str(tmp_path))
+    assert _summary(reopened, 'P1') == {'id': 'P1', 'name': 'Ravi Kumar', 'mobile': '9876543210', 'age': None,
+                                        'sex': None, 'visit_count': 3, 'last_visit': '2024-01-03'}
+
+
+def test_other_process_changes_are_read_from_the_delta_log(tmp_path, monkeypatch):
+    from data.db import patient_cache
+
+    first = JSONAdapter(str(tmp_path))
+    assert first.save_patient({'id': 'P1', 'name': 'Ravi Kumar', 'mobile': '9876543210', 'visits': []})
+    assert _summary(first, 'P1')['visit_count'] == 0
+
+    monkeypatch.setattr(dir_index, '_indexes', {})
+    monkeypatch.setattr(patient_cache, '_caches', {})
+    second = JSONAdapter(str(tmp_path))
+    assert second.summary_index is not first.summary_index
+    assert second.append_visit('P1', {'visit_id': 'V1', 'timestamp': '2024-01-01T10:00:00'})
+
+    assert _summary(first, 'P1')['visit_count'] == 1
+
+
+def test_delta_log_is_folded_into_the_index(tmp_path, monkeypatch):
+    monkeypatch.setattr(dir_index, 'DELTA_MIN_FOLD_BYTES', 0)
+    adapter = JSONAdapter(str(tmp_path))
+    assert adapter.save_patient({'id': 'P1', 'name': 'Ravi Kumar', 'mobile': '9876543210', 'visits': []})
+
+    for day in range(1, 6):
+        assert adapter.append_visit('P1', {'visit_id': f'V{day}', 'timestamp': f'2024-01-0{day}T10:00:00'})
+
+    stored = json.loads(adapter.summary_index.index_path.read_text())
+    delta_path = adapter.summary_index.delta_path
+    pending = len(delta_path.read_text().splitlines()) if delta_path.exists() else 0
+    assert stored['summaries']['P1']['visit_count'] + pending == 5
+    assert pending < 5
@@ -0,0 +1,89 @@
+"""
+Drug interaction index: symmetry, class expansion and precedence
+"""
+
+import json
+from pathlib import Path
+
+import pytest
+
+from utils.drug_checker import DRUG_DATABASE_FILE
+from utils.drug_interactions import InteractionIndex, category_classes
+
+
+@pytest.fixture(scope='module')
+def index():
+    with open(Path(__file__).resolve().parent.parent / DRUG_DATABASE_FILE, 'r', encoding='utf-8') as f:
+        return InteractionIndex(json.load(f))
+
+
+def _pairs(index, drugs):
+    return [(found['drug1'], found['drug2'], found['severity'], found['via'])
+            for found in index.interactions(drugs)]
+
+
+def test_tramadol_and_sertraline_interact_via_ssris_in_either_order(index):
+    expected = [('tramadol', 'sertraline', 'major', 'SSRIs')]
+
+    assert _pairs(index, ['tramadol', 'sertraline']) == expected
+    assert _pairs(index, ['sertraline', 'tramadol']) == expected
+
+
+def test_direct_entry_overrides_class_entry():
+    index = InteractionIndex({'drugs': {
+        'methotrexate': {'category': 'Antimetabolite', 'interactions': {
+            'NSAIDs': {'severity': 'major', 'effect': 'Toxicity'},
+            'aspirin': {'severity': 'moderate', 'effect': 'Monitor levels'}
+        }},
+        'aspirin': {'category': 'Antiplatelet/NSAID'},
+        'diclofenac': {'category': 'NSAID'}
+    }})
+
+    assert _pairs(index, ['methotrexate', 'aspirin', 'diclofenac']) == [
+        ('methotrexate', 'aspirin', 'moderate', None),
+        ('methotrexate', 'diclofenac', 'major', 'NSAIDs')
+    ]
+
+
+def test_rules_only_fill_pairs_the_drug_entries_miss():
+    index = InteractionIndex({
+        'drugs': {
+            'warfarin': {'category': 'Anticoagulant', 'interactions': {
+                'aspirin': {'severity': 'moderate', 'effect': 'From the drug entry'}
+            }},
+            'aspirin': {'category': 'NSAID'},
+            'clopidogrel': {'category': 'Antiplatelet'}
+        },
+        'interaction_checker_rules': {'major_interactions': [
+            {'drug1': 'aspirin', 'drug2': 'warfarin', 'message': 'From the rule'},
+            {'drug1': 'clopidogrel', 'drug2': 'warfarin', 'message': 'Bleeding risk'}
+        ]}
+    })
+
+    found = index.interactions(['warfarin', 'aspirin', 'clopidogrel'])
+    assert [(f['drug1'], f['drug2'], f['severity']) for f in found] == [
+        ('warfarin', 'aspirin', 'moderate'),
+        ('clopidogrel', 'warfarin', 'major')
+    ]
+    assert found[0]['description'].endswith('From the drug entry')
+
+
+def test_class_members_come_from_category_words():
+    index = InteractionIndex({
+        'drugs': {
+            'lithium': {'category': 'Mood Stabilizer', 'interactions': {
+                'diuretics': {'severity': 'major', 'effect': 'Lithium toxicity'},
+                'PPIs': {'severity': 'minor', 'effect': 'Example'}
+            }},
+            'furosemide': {'category': 'Loop Diuretic'},
+            'hydrochlorothiazide': {'category': 'Thiazide Diuretic'},
+            'omeprazole': {'category': 'Proton Pump Inhibitor'}
+        },
+        'class_aliases': {'PPI': 'Proton Pump Inhibitor'}
+    })
+
+    assert [f['drug2'] for f in index.interactions(['lithium', 'furosemide', 'hydrochlorothiazide'])] == [
+        'furosemide', 'hydrochlorothiazide'
+    ]
+    assert _pairs(index, ['omeprazole', 'lithium']) == [('lithium', 'omeprazole', 'minor', 'PPIs')]
+    assert {'insulin', 'long_acting_insulin'} <= category_classes('Long-acting Insulin')
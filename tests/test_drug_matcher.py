@@ -0,0 +1,70 @@
+"""
+Drug name matching in prescription text
+"""
+
+import json
+from pathlib import Path
+
+import pytest
+
+from utils.drug_checker import DRUG_DATABASE_FILE
+from utils.drug_matcher import DrugMatcher
+
+
+@pytest.fixture(scope='module')
+def matcher():
+    with open(Path(__file__).resolve().parent.parent / DRUG_DATABASE_FILE, 'r', encoding='utf-8') as f:
+        return DrugMatcher.from_database(json.load(f))
+
+
+def _found(matcher, text):
+    return [(match.drug, match.text) for match in matcher.find_all(text)]
+
+
+def test_brand_inside_a_longer_brand_is_not_matched(matcher):
+    assert _found(matcher, "Cap. Novamox 500mg TDS") == [('amoxicillin', 'Novamox')]
+    assert _found(matcher, "Cap. Mox 500mg TDS") == [('amoxicillin', 'Mox')]
+
+
+def test_dose_written_against_the_name_still_matches(matcher):
+    assert _found(matcher, "Tab Dolo650 1-0-1") == [('paracetamol', 'Dolo')]
+
+
+def test_multi_word_generic_matches_with_spaces(matcher):
+    assert _found(matcher, "Tab. Folic acid 5mg OD") == [('folic_acid', 'Folic acid')]
+    assert matcher.find_drugs("FOLIC_ACID 5mg") == ['folic_acid']
+
+
+def test_word_boundaries():
+    matcher = DrugMatcher([('mox', 'amoxicillin'), ('pan', 'pantoprazole')])
+
+    assert matcher.find_drugs("Amox 500") == []       # letter before
+    assert matcher.find_drugs("Pant 40") == []         # letter after
+    assert matcher.find_drugs("2pan 40") == []         # digit before
+    assert matcher.find_drugs("Pan40, (Mox)") == ['pantoprazole', 'amoxicillin']
+
+
+def test_longest_leftmost_match_wins():
+    matcher = DrugMatcher([('insulin', 'insulin'), ('insulin glargine', 'insulin_glargine'),
+                           ('glargine', 'insulin_glargine')])
+
+    assert _found(matcher, "Inj insulin glargine 10U") == [('insulin_glargine', 'insulin glargine')]
+    assert _found(matcher, "insulin, glargine") == [('insulin', 'insulin'), ('insulin_glargine', 'glargine')]
+
+
+def test_failure_links_recover_from_partial_matches():
+    matcher = DrugMatcher([('insulin glargine', 'insulin_glargine'), ('glargine', 'insulin_glargine'),
+                           ('lin', 'linezolid')])
+
+    # "insulin glar" is a dead end; the automaton must fall back to find "glargine"
+    assert _found(matcher, "insulin glar glargine") == [('insulin_glargine', 'glargine')]
+    # The long name fails its word boundary, its suffix still matches
+    assert _found(matcher, "xinsulin glargine") == [('insulin_glargine', 'glargine')]
+    assert _found(matcher, "lin insulin glargine") == [('linezolid', 'lin'),
+                                                       ('insulin_glargine', 'insulin glargine')]
+
+
+def test_brand_shared_by_two_drugs_reports_both():
+    matcher = DrugMatcher([('Lasix', 'furosemide'), ('Lasix', 'frusemide'), ('Lasi', 'other')])
+
+    assert sorted(match.drug for match in matcher.find_all("Tab Lasix 40")) == ['frusemide', 'furosemide']
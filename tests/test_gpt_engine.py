@@ -0,0 +1,52 @@
+"""
+Summary generation replays cached responses unless asked to regenerate
+"""
+
+from core.ai.gpt_engine import GPTEngine
+from core.ai.providers import LLMProvider
+from core.ai.response_cache import ResponseCache
+
+
+class CountingProvider(LLMProvider):
+    """A different note on every call"""
+
+    name = "counting"
+
+    def __init__(self):
+        super().__init__("counting")
+        self.calls = 0
+
+    def complete(self, messages, **params):
+        self.calls += 1
+        return f"Assessment: note {self.calls}"
+
+
+def _engine(tmp_path):
+    engine = GPTEngine(CountingProvider())
+    engine.cache = ResponseCache(str(tmp_path / "responses.db"))
+    return engine
+
+
+def test_refresh_bypasses_the_cache_and_replaces_its_entry(tmp_path):
+    engine = _engine(tmp_path)
+
+    first = engine.generate_summary("Fever for 3 days", include_prescription=False)
+    assert engine.generate_summary("Fever for 3 days", include_prescription=False)['cached']
+
+    refreshed = engine.generate_summary("Fever for 3 days", include_prescription=False, refresh=True)
+    assert not refreshed['cached']
+    assert refreshed['summary'] != first['summary']
+    assert engine.provider.calls == 2
+
+    replayed = engine.generate_summary("Fever for 3 days", include_prescription=False)
+    assert replayed['cached'] and replayed['summary'] == refreshed['summary']
+
+
+def test_refresh_applies_to_the_stream(tmp_path):
+    engine = _engine(tmp_path)
+    list(engine.generate_summary_stream("Fever for 3 days", include_prescription=False))
+
+    done = list(engine.generate_summary_stream("Fever for 3 days", include_prescription=False, refresh=True))[-1]
+
+    assert not done['result']['cached']
+    assert engine.provider.calls == 2
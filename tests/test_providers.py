@@ -0,0 +1,60 @@
+"""
+Provider retries under the shared rate limit, breaker and retry budget
+"""
+
+import pytest
+
+from core.ai.providers import LLMProvider, ResilientProvider, ProviderError
+from core.ai.resilience import CircuitBreaker, RetryBudget
+
+
+class FlakyProvider(LLMProvider):
+    """Times out on the first `failures` attempts"""
+
+    name = "flaky"
+
+    def __init__(self, failures: int):
+        super().__init__("flaky")
+        self.failures = failures
+        self.attempts = 0
+
+    def is_transient(self, error: Exception) -> bool:
+        return isinstance(error, TimeoutError)
+
+    def complete(self, messages, **params):
+        self.attempts += 1
+        if self.attempts <= self.failures:
+            raise TimeoutError("timed out")
+        return "ok"
+
+
+def _resilient(provider, **kwargs):
+    kwargs.setdefault('breaker', CircuitBreaker(min_calls=100))
+    return ResilientProvider(provider, rate=100, burst=10, backoff_seconds=0, **kwargs)
+
+
+def test_every_retry_takes_a_token_and_reports_to_the_breaker():
+    provider = _resilient(FlakyProvider(failures=2))
+
+    assert provider.complete([]) == "ok"
+
+    metrics = provider.metrics()
+    assert metrics['calls']['calls'] == 1
+    assert metrics['calls']['attempts'] == 3
+    assert metrics['calls']['failed'] == 2
+    assert metrics['rate_limiter']['tokens'] < 8
+    assert metrics['circuit_breaker']['recent_calls'] == 3
+
+
+def test_retries_stop_when_the_shared_budget_is_spent():
+    provider = _resilient(FlakyProvider(failures=1000), max_retries=5,
+                          retry_budget=RetryBudget(ratio=0, initial=2))
+
+    for _ in range(3):
+        with pytest.raises(ProviderError):
+            provider.complete([])
+
+    budget = provider.metrics()['retry_budget']
+    assert budget['retries'] == 2
+    assert budget['exhausted'] == 3
+    assert provider.provider.attempts == 5
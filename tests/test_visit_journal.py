@@ -0,0 +1,64 @@
+"""
+Visit journal crash recovery
+"""
+
+from data.db.json_adapter import JSONAdapter
+
+
+def _visit_ids(patient):
+    return [visit['visit_id'] for visit in patient['visits']]
+
+
+def test_append_after_crash_between_compaction_and_journal_clear(tmp_path, monkeypatch):
+    adapter = JSONAdapter(str(tmp_path / "patients"))
+    assert adapter.save_patient({'id': 'P1', 'name': 'Test Patient', 'visits': []})
+    assert adapter.append_visit('P1', {'visit_id': 'V1', 'timestamp': '2024-01-01T10:00:00'})
+
+    # Crash after the compacted file is written but before the journal is removed
+    clear = adapter.journal.clear
+    monkeypatch.setattr(adapter.journal, 'clear', lambda patient_id: None)
+    assert adapter.compact_patient('P1')
+    monkeypatch.setattr(adapter.journal, 'clear', clear)
+
+    # The leftover journal's ops are already in the file and must not replay...
+    assert _visit_ids(adapter.load_patient('P1')) == ['V1']
+
+    # ...but ops appended to it afterwards must
+    assert adapter.append_visit('P1', {'visit_id': 'V2', 'timestamp': '2024-01-02T10:00:00'})
+    adapter.cache.invalidate('P1')
+    reloaded = adapter.load_patient('P1')
+    assert _visit_ids(reloaded) == ['V1', 'V2']
+    assert reloaded['visit_count'] == 2
+
+    # A later compaction folds the whole leftover journal exactly once
+    assert adapter.compact_patient('P1')
+    assert _visit_ids(adapter.load_patient('P1')) == ['V1', 'V2']
+
+
+def test_visit_writes_do_not_reread_the_patient_history(tmp_path, monkeypatch):
+    from data.db import json_adapter, patient_cache
+    from core.visits.visit_manager import VisitManager
+
+    adapter = JSONAdapter(str(tmp_path / "patients"))
+    assert adapter.save_patient({'id': 'P1', 'name': 'Test Patient', 'age': 60, 'sex': 'F', 'visits': []})
+    manager = VisitManager(adapter)
+    manager.aggregates.recompute()
+    assert adapter.get_patient('P1') is not None  # warm cache
+
+    def no_reads(*args, **kwargs):
+        raise AssertionError("patient file re-read")
+    monkeypatch.setattr(patient_cache, 'load_file', no_reads)
+    monkeypatch.setattr(json_adapter, 'load_file', no_reads)
+    monkeypatch.setattr(adapter, 'load_patient', no_reads)
+
+    created = manager.create_visit('P1', {'doctor': 'dr_a', 'chief_complaint': 'fever'})
+    assert created['success']
+    assert manager.update_consultation('P1', created['visit_id'], {'summary': 'SOAP note'})['success']
+    assert manager.aggregates.doctor_performance('dr_a')['summaries_generated'] == 1
+    monkeypatch.undo()
+
+    # The record built from the ops matches what a cold read of the files gives
+    view = adapter.get_patient('P1')
+    adapter.cache.invalidate('P1')
+    assert adapter.load_patient('P1') == view
+    assert view['visit_count'] == 1 and view['visits'][0]['summary'] == 'SOAP note'
@@ -0,0 +1,85 @@
+"""
+Summary Throughput Benchmark
+Drives the background summary pipeline (job queue -> GPTEngine stream ->
+prescription split) against the local stub provider, no network needed
+
+Usage:
+    python -m utils.benchmark_summaries --requests 50 --workers 4
+
+Reports requests per second, time to first summary text and total latency
+per request. The response cache is bypassed so every request reaches the
+provider.
+"""
+
+import sys
+import json
+import time
+import argparse
+from typing import Dict, List, Optional
+
+from core.ai.gpt_engine import GPTEngine
+from core.ai.providers import StubProvider
+from core.ai.summary_jobs import SummaryJobQueue, FINISHED_STATUSES
+
+
+def _percentile(values: List[float], fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))] if ordered else 0.0
+
+
+def benchmark(requests: int, workers: int, latency: float, token_delay: float) -> Dict:
+    engine = GPTEngine(StubProvider(first_token_latency=latency, token_delay=token_delay))
+    engine.cache = None
+    queue = SummaryJobQueue(max_workers=workers)
+
+    started = time.perf_counter()
+    job_ids = [
+        queue.submit_stream(engine.generate_summary_stream, f"fever and cough for {i % 7 + 1} days",
+                            {'name': f"Patient {i}", 'age': 20 + i % 60, 'sex': 'F'})
+        for i in range(requests)
+    ]
+
+    # Poll like the app does, recording when text first shows up
+    first_text, finished = {}, {}
+    while len(finished) < len(job_ids):
+        now = time.perf_counter()
+        for job_id in job_ids:
+            if job_id in finished:
+                continue
+            job = queue.get_status(job_id)
+            if job['partial'] and job_id not in first_text:
+                first_text[job_id] = now - started
+            if job['status'] in FINISHED_STATUSES:
+                finished[job_id] = job
+                first_text.setdefault(job_id, now - started)
+        time.sleep(0.005)
+    elapsed = time.perf_counter() - started
+
+    latencies = [job['finished_at'] - job['submitted_at'] for job in finished.values()]
+    ttft = list(first_text.values())
+    return {
+        'requests': requests,
+        'workers': workers,
+        'completed': sum(1 for job in finished.values() if job['result'] and job['result']['success']),
+        'seconds': round(elapsed, 3),
+        'requests_per_second': round(requests / elapsed, 2),
+        'first_text_seconds': {'p50': round(_percentile(ttft, 0.5), 3), 'p95': round(_percentile(ttft, 0.95), 3)},
+        'latency_seconds': {'p50': round(_percentile(latencies, 0.5), 3),
+                            'p95': round(_percentile(latencies, 0.95), 3)}
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark summary throughput with the stub provider")
+    parser.add_argument('--requests', type=int, default=50)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--latency', type=float, default=0.5, help="Stub seconds before the first token")
+    parser.add_argument('--token-delay', type=float, default=0.01, help="Stub seconds between tokens")
+    args = parser.parse_args(argv)
+
+    print(json.dumps(benchmark(args.requests, args.workers, args.latency, args.token_delay), indent=2))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,190 @@
+"""
+Vitals Validation Benchmark
+Per-call latency of PhysiologyEngine.validate and validate_batch, before and
+after precompiling the range tables
+
+Usage:
+    python -m utils.benchmark_validator --readings 10000
+
+"before" is LegacyPhysiologyEngine below: the same engine with the previous
+per-call work put back (range dict rebuilt on every call, if-chain age
+categories, patterns passed to re.match as strings, batch limit tables
+rebuilt on every call, batch blood pressure parsed through detect_units).
+Both engines produce identical results for the benchmark readings.
+"""
+
+import re
+import sys
+import json
+import time
+import random
+import argparse
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from utils.medical_validator_v2 import PhysiologyEngine, BATCH_VITALS
+
+
+class LegacyPhysiologyEngine(PhysiologyEngine):
+    """PhysiologyEngine without the precomputed lookups (benchmark baseline)"""
+
+    def _get_age_category(self, age_years: float) -> str:
+        if age_years < 0.08:
+            return "newborn"
+        elif age_years < 1:
+            return "infant"
+        elif age_years < 3:
+            return "toddler"
+        elif age_years < 6:
+            return "preschool"
+        elif age_years < 12:
+            return "school_age"
+        elif age_years < 18:
+            return "adolescent"
+        elif age_years < 65:
+            return "adult"
+        return "elderly"
+
+    def get_normal_ranges(self, age_years: float, sex: Optional[str] = None,
+                          context: Optional[List[str]] = None) -> Dict:
+        age_category = self._get_age_category(age_years)
+        context = context or []
+        ranges = self.ranges
+
+        if 'athlete' in context and age_years >= 16:
+            heart_rate = ranges['heart_rate']['athlete']
+        else:
+            heart_rate = ranges['heart_rate'].get(age_category, ranges['heart_rate']['adult'])
+
+        return {
+            'heart_rate': heart_rate,
+            'blood_pressure': ranges['blood_pressure'].get(age_category, ranges['blood_pressure']['adult']),
+            'temperature': ranges['temperature']['default'],
+            'respiratory_rate': ranges['respiratory_rate'].get(age_category, ranges['respiratory_rate']['adult']),
+            'oxygen_saturation': ranges['oxygen_saturation'][
+                'high_altitude' if 'high_altitude' in context else 'default']
+        }
+
+    def detect_units(self, value_string: str) -> Dict:
+        value_string = str(value_string).strip()
+
+        bp_match = re.match(r'(\d+)\s*/\s*(\d+)\s*(mmHg|kPa)?', value_string, re.IGNORECASE)
+        if bp_match:
+            systolic, diastolic, unit = bp_match.groups()
+            factor = 7.50062 if unit and unit.lower() == 'kpa' else 1
+            return {'systolic': round(float(systolic) * factor), 'diastolic': round(float(diastolic) * factor),
+                    'unit': 'mmHg', 'original': value_string}
+
+        temp_match = re.match(r'(\d+\.?\d*)\s*°?\s*(C|F|celsius|fahrenheit)?', value_string, re.IGNORECASE)
+        if temp_match:
+            temp_value, unit = temp_match.groups()
+            temp_value = float(temp_value)
+            if not unit:
+                unit = 'F' if temp_value > 45 else 'C'
+            if unit.upper() == 'F' or unit.lower() == 'fahrenheit':
+                temp_value = (temp_value - 32) * 5/9
+            return {'value': round(temp_value, 1), 'unit': 'C', 'original': value_string, 'original_unit': unit}
+
+        numeric_match = re.match(r'(\d+\.?\d*)', value_string)
+        if numeric_match:
+            return {'value': float(numeric_match.group(1)), 'unit': 'unknown', 'original': value_string}
+
+        return {'error': 'Unable to parse value', 'original': value_string}
+
+    def validate_batch(self, ages, vitals: Dict, context: List[str] = None) -> Dict:
+        self._compile_ranges()
+        return super().validate_batch(ages, vitals, context)
+
+    def _batch_bp(self, values, n: int):
+        sys, dia = np.full(n, np.nan), np.full(n, np.nan)
+        for i, value in enumerate(values if values is not None else ()):
+            parsed = self.detect_units(str(value)) if value is not None else {}
+            if 'systolic' in parsed:
+                sys[i], dia[i] = parsed['systolic'], parsed['diastolic']
+        return sys, dia
+
+
+def synthetic_readings(count: int, seed: int = 42) -> List[Dict]:
+    """(age, vitals) pairs spanning every age category, mostly normal"""
+    rng = random.Random(seed)
+    readings = []
+    for _ in range(count):
+        readings.append({
+            'age': rng.choice([0.05, 0.5, 2, 4, 9, 15]) if rng.random() < 0.2 else rng.uniform(18, 90),
+            'vitals': {
+                'heart_rate': rng.randint(50, 130),
+                'blood_pressure': f"{rng.randint(90, 190)}/{rng.randint(55, 115)}",
+                'temperature': round(rng.uniform(97.0, 103.0), 1),
+                'respiratory_rate': rng.randint(10, 30),
+                'oxygen_saturation': rng.randint(86, 100)
+            }
+        })
+    return readings
+
+
+def _time_single(engine: PhysiologyEngine, readings: List[Dict], repeat: int) -> float:
+    """Best-of-repeat microseconds per validate() call"""
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for reading in readings:
+            engine.validate(reading['vitals'], reading['age'])
+        best = min(best, time.perf_counter() - started)
+    return best / len(readings) * 1e6
+
+
+def _time_batch(engine: PhysiologyEngine, ages: List[float], columns: Dict[str, List],
+                repeat: int) -> float:
+    """Best-of-repeat microseconds per reading through validate_batch"""
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        engine.validate_batch(ages, columns)
+        best = min(best, time.perf_counter() - started)
+    return best / len(ages) * 1e6
+
+
+def benchmark(readings: int, repeat: int = 5, seed: int = 42) -> Dict:
+    data = synthetic_readings(readings, seed)
+    ages = [reading['age'] for reading in data]
+    columns = {vital: [reading['vitals'][vital] for reading in data] for vital in BATCH_VITALS}
+
+    before, after = LegacyPhysiologyEngine(), PhysiologyEngine()
+    results = {
+        'readings': readings,
+        'single_us_per_call': {
+            'before': round(_time_single(before, data, repeat), 2),
+            'after': round(_time_single(after, data, repeat), 2)
+        },
+        # Small batches show the fixed per-call cost, large ones the per-reading cost
+        'batch_us_per_reading': {}
+    }
+
+    for size in sorted({1, 100, readings}):
+        results['batch_us_per_reading'][str(size)] = {
+            'before': round(_time_batch(before, ages[:size], {k: v[:size] for k, v in columns.items()}, repeat), 3),
+            'after': round(_time_batch(after, ages[:size], {k: v[:size] for k, v in columns.items()}, repeat), 3)
+        }
+
+    single = results['single_us_per_call']
+    single['speedup'] = round(single['before'] / single['after'], 2)
+    for timings in results['batch_us_per_reading'].values():
+        timings['speedup'] = round(timings['before'] / timings['after'], 2)
+
+    return results
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark vitals validation latency")
+    parser.add_argument('--readings', type=int, default=10000)
+    parser.add_argument('--repeat', type=int, default=5, help="Best of this many runs")
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args(argv)
+
+    print(json.dumps(benchmark(args.readings, args.repeat, args.seed), indent=2))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,28 +1,61 @@
 import json
 import os
 import re
-from typing import Dict, List, Tuple
+import time
+import threading
+from typing import Dict, List, Optional, Tuple
+import logging
+
+from utils.drug_matcher import DrugMatcher
+from utils.drug_interactions import InteractionIndex
+
+logger = logging.getLogger(__name__)
+
+DRUG_DATABASE_FILE = os.path.join("data", "config", "indian_drugs.json")
+
+# Minimum seconds between mtime checks of the database file
+RELOAD_CHECK_INTERVAL = 1.0
+
+class DrugKnowledgeBase:
+    """A loaded drug database with its name matcher and interaction index (read-only)"""
+    
+    def __init__(self, database: Dict, source: Optional[str] = None, mtime_ns: Optional[int] = None):
+        self.database = database
+        self.drugs = database.get("drugs", {})
+        self.source = source
+        self.mtime_ns = mtime_ns
+        # Every generic and brand name, compiled once
+        self.matcher = DrugMatcher.from_database(database)
+        self.interaction_index = InteractionIndex(database)
 
 class DrugInteractionChecker:
-    def __init__(self):
-        """Initialize the drug interaction checker"""
-        self.drug_database = self.load_drug_database()
+    def __init__(self, database_file: str = DRUG_DATABASE_FILE):
+        """Initialize the drug interaction checker (the database is shared per process)"""
+        self.database_file = database_file
+    
+    @property
+    def knowledge(self) -> DrugKnowledgeBase:
+        """The current drug knowledge base, reloaded when the file changes"""
+        return get_knowledge_base(self.database_file)
+    
+    @property
+    def drug_database(self) -> Dict:
+        return self.knowledge.database
+    
+    @property
+    def matcher(self) -> DrugMatcher:
+        return self.knowledge.matcher
+    
+    @property
+    def interaction_index(self) -> InteractionIndex:
+        return self.knowledge.interaction_index
     
     def load_drug_database(self) -> Dict:
         """Load the Indian drug database"""
-        try:
-            filepath = os.path.join("data", "indian_drugs.json")
-            if os.path.exists(filepath):
-                with open(filepath, 'r') as f:
-                    return json.load(f)
-            else:
-                # Return default database if file doesn't exist
-                return self.get_default_database()
-        except Exception as e:
-            print(f"Error loading drug database: {e}")
-            return self.get_default_database()
+        return self.drug_database
     
-    def get_default_database(self) -> Dict:
+    @staticmethod
+    def get_default_database() -> Dict:
         """Return default Indian drug database"""
         return {
             "drugs": {
@@ -158,66 +191,23 @@ class DrugInteractionChecker:
         }
     
     def extract_drugs_from_prescription(self, prescription: str) -> List[str]:
-        """Extract drug names from prescription text"""
-        prescription_lower = prescription.lower()
-        found_drugs = []
-        
-        # Check for generic names
-        for drug_name in self.drug_database.get("drugs", {}).keys():
-            if drug_name in prescription_lower:
-                found_drugs.append(drug_name)
-        
-        # Check for brand names
-        for drug_name, drug_info in self.drug_database.get("drugs", {}).items():
-            for brand in drug_info.get("brand_names", []):
-                if brand.lower() in prescription_lower:
-                    if drug_name not in found_drugs:
-                        found_drugs.append(drug_name)
-        
-        return found_drugs
+        """Extract drug names from prescription text (generic names, in order of mention)"""
+        return self.matcher.find_drugs(prescription or "")
+    
+    def find_drug_mentions(self, prescription: str) -> List[Dict]:
+        """Every generic or brand name in the prescription with its character span"""
+        return [match._asdict() for match in self.matcher.find_all(prescription or "")]
     
     def check_interactions(self, drugs: List[str]) -> List[Dict]:
-        """Check for drug-drug interactions"""
-        interactions = []
-        
-        for i, drug1 in enumerate(drugs):
-            for drug2 in drugs[i+1:]:
-                # Check if drug1 has interactions with drug2
-                drug1_info = self.drug_database.get("drugs", {}).get(drug1, {})
-                if drug2 in drug1_info.get("interactions", {}):
-                    interaction = drug1_info["interactions"][drug2]
-                    interactions.append({
-                        "drug1": drug1,
-                        "drug2": drug2,
-                        "severity": interaction["severity"],
-                        "description": f"{drug1.title()} + {drug2.title()}: {interaction['description']}"
-                    })
-                
-                # Check reverse interaction
-                drug2_info = self.drug_database.get("drugs", {}).get(drug2, {})
-                if drug1 in drug2_info.get("interactions", {}):
-                    # Avoid duplicate entries
-                    already_added = any(
-                        i["drug1"] == drug2 and i["drug2"] == drug1 
-                        for i in interactions
-                    )
-                    if not already_added:
-                        interaction = drug2_info["interactions"][drug1]
-                        interactions.append({
-                            "drug1": drug2,
-                            "drug2": drug1,
-                            "severity": interaction["severity"],
-                            "description": f"{drug2.title()} + {drug1.title()}: {interaction['description']}"
-                        })
-        
-        return interactions
+        """Check for drug-drug interactions (including class entries such as SSRIs)"""
+        return self.interaction_index.interactions(drugs)
     
     def check_pregnancy_safety(self, drugs: List[str]) -> List[str]:
         """Check pregnancy safety categories"""
         warnings = []
         
         for drug in drugs:
-            drug_info = self.drug_database.get("drugs", {}).get(drug, {})
+            drug_info = self.knowledge.drugs.get(drug, {})
             category = drug_info.get("pregnancy_category", "Unknown")
             
             if category == "D":
@@ -232,7 +222,7 @@ class DrugInteractionChecker:
         warnings = []
         
         for drug in drugs:
-            drug_info = self.drug_database.get("drugs", {}).get(drug, {})
+            drug_info = self.knowledge.drugs.get(drug, {})
             contraindications = drug_info.get("contraindications", [])
             
             if contraindications:
@@ -242,11 +232,14 @@ class DrugInteractionChecker:
     
     def check_prescription(self, prescription: str) -> Dict:
         """Main method to check prescription for interactions and warnings"""
+        # One knowledge base for the whole check, even if a reload lands midway
+        knowledge = self.knowledge
+        
         # Extract drugs from prescription
-        drugs = self.extract_drugs_from_prescription(prescription)
+        drugs = knowledge.matcher.find_drugs(prescription or "")
         
         # Check for interactions
-        interactions = self.check_interactions(drugs)
+        interactions = knowledge.interaction_index.interactions(drugs)
         
         # Check pregnancy safety
         pregnancy_warnings = self.check_pregnancy_safety(drugs)
@@ -263,4 +256,68 @@ class DrugInteractionChecker:
             "has_interactions": len(interactions) > 0,
             "warnings": all_warnings,
             "has_warnings": len(all_warnings) > 0
-        }
\ No newline at end of file
+        }
+
+
+# Knowledge bases by absolute path, shared by every checker in the process
+_knowledge_bases: Dict[str, DrugKnowledgeBase] = {}
+_last_checked: Dict[str, float] = {}
+_knowledge_lock = threading.Lock()
+
+
+def _file_mtime_ns(path: str) -> Optional[int]:
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+def _load_knowledge_base(path: str, mtime_ns: Optional[int],
+                         previous: Optional[DrugKnowledgeBase]) -> DrugKnowledgeBase:
+    if mtime_ns is None:
+        logger.warning(f"Drug database not found at {path}, using the built-in defaults")
+        return DrugKnowledgeBase(DrugInteractionChecker.get_default_database())
+
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            database = json.load(f)
+        knowledge = DrugKnowledgeBase(database, path, mtime_ns)
+        logger.info(f"Loaded {len(knowledge.drugs)} drugs from {path}")
+        return knowledge
+    except Exception as e:
+        if previous is not None:
+            # Keep serving the last good copy (e.g. the file is mid-edit)
+            logger.error(f"Error reloading drug database {path}, keeping the loaded copy: {e}")
+            return DrugKnowledgeBase(previous.database, previous.source, mtime_ns)
+        logger.error(f"Error loading drug database {path}, using the built-in defaults: {e}")
+        return DrugKnowledgeBase(DrugInteractionChecker.get_default_database(), None, mtime_ns)
+
+
+def get_knowledge_base(path: str = DRUG_DATABASE_FILE) -> DrugKnowledgeBase:
+    """The shared knowledge base for a database file, reloaded when its mtime changes"""
+    key = os.path.abspath(path)
+    now = time.monotonic()
+
+    knowledge = _knowledge_bases.get(key)
+    if knowledge is not None and now - _last_checked.get(key, 0.0) < RELOAD_CHECK_INTERVAL:
+        return knowledge
+
+    with _knowledge_lock:
+        knowledge = _knowledge_bases.get(key)
+        mtime_ns = _file_mtime_ns(key)
+        if knowledge is None or knowledge.mtime_ns != mtime_ns:
+            knowledge = _load_knowledge_base(key, mtime_ns, knowledge)
+            _knowledge_bases[key] = knowledge
+        _last_checked[key] = now
+        return knowledge
+
+
+_drug_checker: Optional[DrugInteractionChecker] = None
+
+
+def get_drug_checker() -> DrugInteractionChecker:
+    """Process-wide checker over the default drug database"""
+    global _drug_checker
+    if _drug_checker is None:
+        _drug_checker = DrugInteractionChecker()
+    return _drug_checker
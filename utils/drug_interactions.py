@@ -0,0 +1,159 @@
+"""
+Drug Interaction Index
+The drug database's interaction graph, normalized once at load time
+
+Every substance (database drug, or anything an interaction names, e.g.
+"warfarin", "alcohol") gets an integer id. Edges are symmetric, so a pair
+is found whichever side declared it, and class targets such as "SSRIs" or
+"diuretics" are expanded to every drug whose category contains that class
+as consecutive words ("Loop Diuretic", "Thiazide Diuretic"). Class names
+that are not category words (acronyms such as "PPI") are mapped by the
+database's "class_aliases". Checking a prescription is then one set
+intersection per drug.
+"""
+
+from typing import Dict, FrozenSet, Iterable, List, Optional, Set, Tuple
+
+
+def normalize_name(name: str) -> str:
+    """Drug / substance key: lowercase, words joined by underscores"""
+    return '_'.join(str(name).lower().replace('-', ' ').replace('_', ' ').split())
+
+
+def class_key(name: str) -> str:
+    """Class key, singular ("SSRIs" -> "ssri", "ACE_inhibitors" -> "ace_inhibitor")"""
+    key = normalize_name(name)
+    if len(key) > 3 and key.endswith('s') and not key.endswith('ss'):
+        key = key[:-1]
+    return key
+
+
+def category_classes(category: str) -> Set[str]:
+    """
+    Every class key a drug category puts its drugs in: each run of consecutive
+    words of each part ("Long-acting Insulin" -> long_acting_insulin,
+    acting_insulin, insulin, long_acting, long, acting)
+    """
+    keys = set()
+    for part in str(category or "").split('/'):
+        words = normalize_name(part).split('_')
+        if not words[0]:
+            continue
+        for start in range(len(words)):
+            for end in range(start + 1, len(words) + 1):
+                keys.add(class_key('_'.join(words[start:end])))
+    return keys
+
+
+class InteractionIndex:
+    """Symmetric, integer-indexed interaction graph with class expansion"""
+
+    def __init__(self, drug_database: Dict):
+        drugs = drug_database.get("drugs", {})
+
+        self.names: List[str] = []
+        self.ids: Dict[str, int] = {}
+        for drug_name in drugs:
+            self._id(drug_name)
+        # Database drugs hold the ids below this; the rest are only named by interactions
+        self._drug_count = len(self.names)
+
+        # Class key -> member drug ids, from each drug's category ("Antiplatelet/NSAID")
+        members: Dict[str, Set[int]] = {}
+        for drug_name, drug_info in drugs.items():
+            for key in category_classes(drug_info.get("category")):
+                members.setdefault(key, set()).add(self.ids[normalize_name(drug_name)])
+        self.classes: Dict[str, FrozenSet[int]] = {key: frozenset(ids) for key, ids in members.items()}
+        # Other names for a class ("PPI" -> "Proton Pump Inhibitor")
+        self.aliases: Dict[str, str] = {
+            class_key(alias): class_key(target)
+            for alias, target in drug_database.get("class_aliases", {}).items()
+        }
+
+        # (declaring id, other id) -> {severity, description, via}
+        self._declared: Dict[Tuple[int, int], Dict] = {}
+        for drug_name, drug_info in drugs.items():
+            for target, interaction in drug_info.get("interactions", {}).items():
+                self._declare(drug_name, target, interaction.get("severity", "unknown"),
+                              interaction.get("description") or interaction.get("effect", ""))
+
+        # Curated pair rules only fill pairs the drug entries don't already cover
+        rules = drug_database.get("interaction_checker_rules", {})
+        for rule in rules.get("major_interactions", []):
+            self._declare(rule["drug1"], rule["drug2"], "major", rule.get("message", ""), override=False)
+
+        neighbors: List[Set[int]] = [set() for _ in self.names]
+        for i, j in self._declared:
+            neighbors[i].add(j)
+            neighbors[j].add(i)
+        self.neighbors: List[FrozenSet[int]] = [frozenset(ids) for ids in neighbors]
+
+    def _id(self, name: str) -> int:
+        key = normalize_name(name)
+        index = self.ids.get(key)
+        if index is None:
+            index = len(self.names)
+            self.ids[key] = index
+            self.names.append(key)
+        return index
+
+    def _declare(self, source: str, target: str, severity: str, description: str, override: bool = True):
+        source_id = self._id(source)
+        record = {"severity": severity, "description": description, "via": None}
+
+        # The target itself, plus every member drug if it names a class
+        target_id = self._id(target)
+        targets = [(target_id, None)]
+        if target_id >= self._drug_count:
+            targets.extend((member, target) for member in sorted(self.class_members(target)))
+
+        for target_id, via in targets:
+            if target_id == source_id:
+                continue
+            pair = (source_id, target_id)
+            if not override and (pair in self._declared or pair[::-1] in self._declared):
+                continue
+            if via is not None and (pair in self._declared or pair[::-1] in self._declared):
+                # A direct entry for the member beats the class-level one
+                continue
+            self._declared[pair] = dict(record, via=via)
+
+    def class_members(self, name: str) -> FrozenSet[int]:
+        """Ids of the database drugs in a class, empty if the name is no class"""
+        key = class_key(name)
+        return self.classes.get(self.aliases.get(key, key), frozenset())
+
+    def resolve(self, name: str) -> Optional[int]:
+        """Id of a drug or substance name, None if the database never mentions it"""
+        return self.ids.get(normalize_name(name))
+
+    def interactions(self, drugs: Iterable[str]) -> List[Dict]:
+        """
+        Every interacting pair among the drugs, each reported once in list order.
+        drug1 is the side that declared the interaction.
+        """
+        positions: Dict[int, int] = {}
+        names: Dict[int, str] = {}
+        for name in drugs:
+            index = self.resolve(name)
+            if index is not None and index not in positions:
+                positions[index] = len(positions)
+                names[index] = name
+        present = positions.keys()
+
+        found = []
+        for i in positions:
+            for j in sorted(self.neighbors[i] & present, key=positions.get):
+                if positions[j] < positions[i]:
+                    continue
+                pair = (i, j) if (i, j) in self._declared else (j, i)
+                record = self._declared[pair]
+                drug1, drug2 = names[pair[0]], names[pair[1]]
+                found.append({
+                    "drug1": drug1,
+                    "drug2": drug2,
+                    "severity": record["severity"],
+                    "description": f"{drug1.title()} + {drug2.title()}: {record['description']}",
+                    "via": record["via"]
+                })
+        return found
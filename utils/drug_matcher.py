@@ -0,0 +1,138 @@
+"""
+Drug Name Matcher
+Aho-Corasick automaton over every generic and brand name in the drug database
+
+Built once per database; finds all drug mentions in a prescription in a
+single pass over the text, independent of how many names are indexed.
+
+    matcher = DrugMatcher.from_database(drug_database)
+    matcher.find_all("Tab. Dolo 650 1-0-1, Cap. Omez 20mg")
+    # [DrugMatch(start=5, end=9, drug='paracetamol', term='Dolo', text='Dolo'), ...]
+
+Matching is case-insensitive and word-boundary aware: a name must not be
+preceded by a letter or digit, nor followed by a letter ("Mox" does not
+match inside "Novamox", but "Dolo650" still matches "Dolo").
+"""
+
+from typing import Dict, Iterable, List, NamedTuple, Tuple
+
+
+class DrugMatch(NamedTuple):
+    start: int   # Span in the original text
+    end: int
+    drug: str    # Generic name (database key)
+    term: str    # Name as listed in the database
+    text: str    # Name as written in the text
+
+
+def _fold(text: str) -> str:
+    """Lowercase with underscores as spaces, keeping every character's position"""
+    folded = text.lower()
+    if len(folded) != len(text):
+        # A few characters lowercase to more than one; keep those as they are
+        folded = ''.join(c.lower() if len(c.lower()) == 1 else c for c in text)
+    return folded.replace('_', ' ')
+
+
+class DrugMatcher:
+    """Multi-pattern matcher mapping every indexed name to its generic drug"""
+
+    def __init__(self, terms: Iterable[Tuple[str, str]]):
+        """terms: (name, generic drug) pairs - generics map to themselves"""
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        # Per state: (pattern length, generic drug, listed name) ending here
+        self._out: List[List[Tuple[int, str, str]]] = [[]]
+        self.size = 0
+
+        for term, drug in terms:
+            # Database keys use underscores ("folic_acid"); prescriptions use spaces
+            pattern = _fold(term.strip()) if term else ''
+            if pattern:
+                self._add(pattern, drug, term)
+
+        self._build_failure_links()
+
+    @classmethod
+    def from_database(cls, drug_database: Dict) -> 'DrugMatcher':
+        """Index every generic name and brand name of a drug database"""
+        terms = []
+        for drug_name, drug_info in drug_database.get("drugs", {}).items():
+            terms.append((drug_name, drug_name))
+            for brand in drug_info.get("brand_names", []):
+                terms.append((brand, drug_name))
+        return cls(terms)
+
+    def _add(self, pattern: str, drug: str, term: str):
+        state = 0
+        for char in pattern:
+            next_state = self._goto[state].get(char)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto[state][char] = next_state
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+            state = next_state
+
+        entry = (len(pattern), drug, term)
+        if entry not in self._out[state]:
+            self._out[state].append(entry)
+            self.size += 1
+
+    def _build_failure_links(self):
+        """Breadth-first failure links; each state also reports its suffixes' matches"""
+        queue = list(self._goto[0].values())
+        for state in queue:
+            for char, next_state in self._goto[state].items():
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[next_state] = self._goto[fallback].get(char, 0)
+                self._out[next_state] = self._out[next_state] + self._out[self._fail[next_state]]
+                queue.append(next_state)
+
+    def find_all(self, text: str) -> List[DrugMatch]:
+        """
+        Every whole-word drug name in the text, left to right.
+        Overlapping names resolve to the longest one starting first
+        ("insulin glargine" rather than "insulin").
+        """
+        if not text:
+            return []
+
+        folded = _fold(text)
+        goto, fail, out = self._goto, self._fail, self._out
+        candidates = []
+
+        state = 0
+        for i, char in enumerate(folded):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+
+            for length, drug, term in out[state]:
+                start, end = i + 1 - length, i + 1
+                if start > 0 and folded[start - 1].isalnum():
+                    continue
+                if end < len(folded) and folded[end].isalpha():
+                    continue
+                candidates.append((start, -length, drug, term))
+
+        matches = []
+        last_end = 0
+        for start, negative_length, drug, term in sorted(candidates):
+            end = start - negative_length
+            if start < last_end:
+                # Same span, different generic (a brand shared by two drugs) is kept
+                if matches and (matches[-1].start, matches[-1].end) == (start, end) and matches[-1].drug != drug:
+                    matches.append(DrugMatch(start, end, drug, term, text[start:end]))
+                continue
+            matches.append(DrugMatch(start, end, drug, term, text[start:end]))
+            last_end = end
+
+        return matches
+
+    def find_drugs(self, text: str) -> List[str]:
+        """Distinct generic drugs mentioned, in order of first mention"""
+        return list(dict.fromkeys(match.drug for match in self.find_all(text)))
@@ -17,6 +17,8 @@ from reportlab.lib.enums import TA_LEFT, TA_CENTER, TA_RIGHT
 from reportlab.platypus.flowables import HRFlowable
 import json
 
+from core.clinical.vitals_validator import VitalsValidator
+
 # Import python-docx for Word generation
 from docx import Document
 from docx.shared import Inches, Pt, RGBColor
@@ -52,6 +54,8 @@ try:
 except Exception as e:
     print(f"Font registration warning: {e}")
 
+vitals_validator = VitalsValidator()
+
 def sanitize_text(text):
     """Sanitize text for PDF generation"""
     if text is None:
@@ -78,63 +82,19 @@ def create_header_footer(canvas, doc, patient_id=None, format_type=None):
     
     canvas.restoreState()
 
-def analyze_vitals_criticality(vitals):
-    """Analyze vitals and return critical findings"""
-    critical_findings = []
-    urgent_findings = []
-    normal_findings = []
-    
-    if 'blood_pressure' in vitals and vitals['blood_pressure']:
-        try:
-            sys, dia = map(int, vitals['blood_pressure'].split('/'))
-            if sys < 90 or dia < 60:
-                critical_findings.append(f"🔴 CRITICAL Hypotension: {sys}/{dia} mmHg")
-            elif sys < 100:
-                urgent_findings.append(f"🟡 Hypotension: {sys}/{dia} mmHg")
-            elif sys > 180 or dia > 120:
-                critical_findings.append(f"🔴 CRITICAL Hypertension: {sys}/{dia} mmHg")
-            elif sys > 140 or dia > 90:
-                urgent_findings.append(f"🟡 Hypertension: {sys}/{dia} mmHg")
-            else:
-                normal_findings.append(f"✓ BP: {sys}/{dia} mmHg (Normal)")
-        except:
-            normal_findings.append(f"✓ BP: {vitals['blood_pressure']}")
-    
-    if 'heart_rate' in vitals and vitals['heart_rate']:
-        hr = int(vitals['heart_rate'])
-        if hr < 50 or hr > 120:
-            critical_findings.append(f"🔴 CRITICAL Heart Rate: {hr} bpm")
-        elif hr < 60 or hr > 100:
-            urgent_findings.append(f"🟡 Heart Rate: {hr} bpm")
-        else:
-            normal_findings.append(f"✓ HR: {hr} bpm (Normal)")
-    
-    if 'temperature' in vitals and vitals['temperature']:
-        temp = float(vitals['temperature'])
-        if temp < 35.0 or temp > 40.0:
-            critical_findings.append(f"🔴 CRITICAL Temperature: {temp}°C")
-        elif temp < 36.0 or temp > 38.0:
-            urgent_findings.append(f"🟡 Temperature: {temp}°C")
-        else:
-            normal_findings.append(f"✓ Temp: {temp}°C (Normal)")
-    
-    if 'spo2' in vitals and vitals['spo2']:
-        spo2 = int(vitals['spo2'])
-        if spo2 < 90:
-            critical_findings.append(f"🔴 CRITICAL SpO2: {spo2}%")
-        elif spo2 < 95:
-            urgent_findings.append(f"🟡 SpO2: {spo2}%")
-        else:
-            normal_findings.append(f"✓ SpO2: {spo2}% (Normal)")
-    
-    if 'respiratory_rate' in vitals and vitals['respiratory_rate']:
-        rr = int(vitals['respiratory_rate'])
-        if rr < 10 or rr > 30:
-            critical_findings.append(f"🔴 CRITICAL RR: {rr}/min")
-        elif rr < 12 or rr > 20:
-            urgent_findings.append(f"🟡 RR: {rr}/min")
-        else:
-            normal_findings.append(f"✓ RR: {rr}/min (Normal)")
+def analyze_vitals_criticality(vitals, validation=None):
+    """
+    Analyze vitals and return critical findings.
+    Vital sign findings come from the shared vitals validation - pass the
+    visit's (cached) result to reuse it; weight, height and BMI are added here.
+    """
+    if validation is None:
+        validation = vitals_validator.validate_vitals(vitals)
+    findings = validation.get('findings', {})
+    
+    critical_findings = list(findings.get('critical', []))
+    urgent_findings = list(findings.get('urgent', []))
+    normal_findings = list(findings.get('normal', []))
     
     if 'weight' in vitals and vitals['weight']:
         normal_findings.append(f"✓ Weight: {vitals['weight']} kg")
@@ -302,7 +262,8 @@ def generate_visit_pdf(patient_data, visit_data):
     if 'vitals' in visit_data and visit_data['vitals']:
         content.append(Paragraph("Vital Signs", heading_style))
         
-        critical_findings, urgent_findings, normal_findings = analyze_vitals_criticality(visit_data['vitals'])
+        critical_findings, urgent_findings, normal_findings = analyze_vitals_criticality(
+            visit_data['vitals'], vitals_validator.visit_validation(visit_data, patient_data))
         
         # Show all findings
         all_findings = critical_findings + urgent_findings + normal_findings
@@ -487,7 +448,8 @@ def generate_visit_docx(patient_data, visit_data):
     if 'vitals' in visit_data and visit_data['vitals']:
         doc.add_paragraph("Vital Signs", style='CustomHeading')
         
-        critical_findings, urgent_findings, normal_findings = analyze_vitals_criticality(visit_data['vitals'])
+        critical_findings, urgent_findings, normal_findings = analyze_vitals_criticality(
+            visit_data['vitals'], vitals_validator.visit_validation(visit_data, patient_data))
         
         # Add all findings
         all_findings = critical_findings + urgent_findings + normal_findings
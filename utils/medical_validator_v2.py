@@ -3,13 +3,62 @@ Medical Validator 2.0 - Physiological Validation Engine for Smart EMR
 Age-aware, context-sensitive vital signs validation for Indian clinics
 """
 
+import os
 import json
 import re
-from typing import Dict, List, Tuple, Optional, Union
+import bisect
+import hashlib
+import threading
+from types import MappingProxyType
+from typing import Dict, List, Mapping, Tuple, Optional, Union
+
+import numpy as np
+
+# Age categories in order, and the upper age bound (exclusive) of all but the last
+AGE_CATEGORIES = ('newborn', 'infant', 'toddler', 'preschool', 'school_age', 'adolescent', 'adult', 'elderly')
+AGE_BOUNDS = (0.08, 1, 3, 6, 12, 18, 65)
+
+# Per-vital status codes returned by PhysiologyEngine.validate_batch
+STATUS_MISSING = -1
+STATUS_NORMAL = 0
+STATUS_CAUTION = 1
+STATUS_CRITICAL = 2
+STATUS_LABELS = {STATUS_MISSING: None, STATUS_NORMAL: "Normal", STATUS_CAUTION: "Caution", STATUS_CRITICAL: "Critical"}
+
+BATCH_VITALS = ('heart_rate', 'blood_pressure', 'temperature', 'respiratory_rate', 'oxygen_saturation')
+
+# The one rules file every vitals check is compiled from
+RANGES_FILE = 'data/config/physiological_ranges.json'
+
+# Contexts whose ranges replace the age-category ranges of a vital when the
+# ranges file defines them for it (earlier entries win)
+CONTEXT_OVERRIDES = ('copd', 'high_altitude', 'pregnant', 'athlete')
+# Athlete heart rate ranges only apply from this age
+ATHLETE_MIN_AGE = 16
+
+# Unit detection patterns, compiled once
+BP_PATTERN = re.compile(r'(\d+)\s*/\s*(\d+)\s*(mmHg|kPa)?', re.IGNORECASE)
+TEMP_PATTERN = re.compile(r'(\d+\.?\d*)\s*°?\s*(C|F|celsius|fahrenheit)?', re.IGNORECASE)
+NUMBER_PATTERN = re.compile(r'(\d+\.?\d*)')
+LEADING_NUMBER_PATTERN = re.compile(r'\s*(\d+\.?\d*)')
+
+
+def _freeze(value):
+    """Read-only copy of loaded JSON (dicts -> mapping proxies, lists -> tuples)"""
+    if isinstance(value, dict):
+        return MappingProxyType({key: _freeze(item) for key, item in value.items()})
+    if isinstance(value, list):
+        return tuple(_freeze(item) for item in value)
+    return value
+
+
+def _read_only(array: np.ndarray) -> np.ndarray:
+    array.setflags(write=False)
+    return array
 
 
 class PhysiologyEngine:
-    def __init__(self, ranges_file: str = 'data/physiological_ranges.json'):
+    def __init__(self, ranges_file: str = RANGES_FILE):
         """Initialize with physiological ranges data"""
         self.ranges_file = ranges_file
         self._load_ranges()
@@ -17,11 +66,80 @@ class PhysiologyEngine:
     def _load_ranges(self):
         """Load physiological ranges from JSON file"""
         try:
-            with open(self.ranges_file, 'r') as f:
-                self.ranges = json.load(f)
+            with open(self.ranges_file, 'rb') as f:
+                raw = f.read()
+            ranges = json.loads(raw)
         except FileNotFoundError:
             # Fallback to hardcoded ranges if file not found
-            self.ranges = self._get_default_ranges()
+            ranges = self._get_default_ranges()
+            raw = json.dumps(ranges, sort_keys=True).encode('utf-8')
+        
+        # Identifies the rules a stored validation result was computed with
+        self.rules_version = hashlib.sha1(raw).hexdigest()[:12]
+        self.ranges = _freeze(ranges)
+        self._compile_ranges()
+    
+    def _compile_ranges(self):
+        """
+        Precompute every range lookup once per load:
+        get_normal_ranges results keyed by (age category, active contexts),
+        and the per-category limit arrays used by validate_batch
+        """
+        ranges = self.ranges
+        
+        # Context overrides each vital's ranges define, in priority order
+        self._overrides = MappingProxyType({
+            vital: tuple(context for context in CONTEXT_OVERRIDES if context in ranges[vital])
+            for vital in BATCH_VITALS
+        })
+        contexts = sorted({context for overrides in self._overrides.values() for context in overrides})
+        
+        lookup = {}
+        for category in AGE_CATEGORIES:
+            for mask in range(1 << len(contexts)):
+                active = frozenset(context for i, context in enumerate(contexts) if mask >> i & 1)
+                lookup[(category, active)] = MappingProxyType({
+                    vital: self._select_ranges(vital, category, active) for vital in BATCH_VITALS
+                })
+        self._range_lookup = MappingProxyType(lookup)
+        self._context_names = frozenset(contexts)
+        
+        # (normal_low, normal_high, critical_low, critical_high) per age category,
+        # plus the same limits for each context override
+        simple = lambda r: (r['range'][0], r['range'][1], r['critical_low'], r['critical_high'])
+        bp = lambda side: lambda r: (r['range'][side][0], r['range'][side][1],
+                                     r['critical_low'][side], r['critical_high'][side])
+        temperature = lambda r: (r['range_c'][0], r['range_c'][1], r['critical_low_c'], r['critical_high_c'])
+        # Only low saturation is abnormal
+        spo2 = lambda r: (r['range'][0], np.inf, r['critical_low'], np.inf)
+        
+        tables = {}
+        for key, vital, limits in (('heart_rate', 'heart_rate', simple),
+                                   ('systolic', 'blood_pressure', bp('systolic')),
+                                   ('diastolic', 'blood_pressure', bp('diastolic')),
+                                   ('temperature', 'temperature', temperature),
+                                   ('respiratory_rate', 'respiratory_rate', simple),
+                                   ('oxygen_saturation', 'oxygen_saturation', spo2)):
+            tables[key] = MappingProxyType({
+                'vital': vital,
+                'by_category': self._range_table(vital, limits),
+                'overrides': MappingProxyType({
+                    context: _read_only(np.array(limits(ranges[vital][context]), dtype=float))
+                    for context in self._overrides[vital]
+                })
+            })
+        self._batch_tables = MappingProxyType(tables)
+    
+    def _category_ranges(self, vital: str, category: str) -> Mapping:
+        """A vital's ranges for an age category (all-age vitals only have 'default')"""
+        table = self.ranges[vital]
+        return table.get(category) or table.get('default') or table['adult']
+    
+    def _select_ranges(self, vital: str, category: str, active: frozenset) -> Mapping:
+        for context in self._overrides[vital]:
+            if context in active:
+                return self.ranges[vital][context]
+        return self._category_ranges(vital, category)
     
     def _get_default_ranges(self) -> dict:
         """Hardcoded physiological ranges as fallback"""
@@ -106,23 +224,8 @@ class PhysiologyEngine:
         }
     
     def _get_age_category(self, age_years: float) -> str:
-        """Map age in years to age category"""
-        if age_years < 0.08:  # < 1 month
-            return "newborn"
-        elif age_years < 1:
-            return "infant"
-        elif age_years < 3:
-            return "toddler"
-        elif age_years < 6:
-            return "preschool"
-        elif age_years < 12:
-            return "school_age"
-        elif age_years < 18:
-            return "adolescent"
-        elif age_years < 65:
-            return "adult"
-        else:
-            return "elderly"
+        """Map age in years to age category (newborn is < 1 month)"""
+        return AGE_CATEGORIES[bisect.bisect_right(AGE_BOUNDS, age_years)]
     
     def get_normal_ranges(self, age_years: float, sex: Optional[str] = None, 
                          context: Optional[List[str]] = None) -> Dict:
@@ -135,38 +238,13 @@ class PhysiologyEngine:
             context: List of contexts like ['athlete', 'pregnant', 'diabetic']
         
         Returns:
-            Dictionary with ranges for each vital sign
+            Read-only mapping with ranges for each vital sign (shared, precomputed)
         """
-        age_category = self._get_age_category(age_years)
-        context = context or []
-        
-        ranges_output = {}
-        
-        # Heart rate
-        if 'athlete' in context and age_years >= 16:
-            hr_ranges = self.ranges['heart_rate']['athlete']
-        else:
-            hr_ranges = self.ranges['heart_rate'].get(age_category, self.ranges['heart_rate']['adult'])
-        ranges_output['heart_rate'] = hr_ranges
-        
-        # Blood pressure
-        bp_ranges = self.ranges['blood_pressure'].get(age_category, self.ranges['blood_pressure']['adult'])
-        ranges_output['blood_pressure'] = bp_ranges
-        
-        # Temperature (same for all ages)
-        ranges_output['temperature'] = self.ranges['temperature']['default']
-        
-        # Respiratory rate
-        rr_ranges = self.ranges['respiratory_rate'].get(age_category, self.ranges['respiratory_rate']['adult'])
-        ranges_output['respiratory_rate'] = rr_ranges
-        
-        # Oxygen saturation
-        if 'high_altitude' in context:
-            ranges_output['oxygen_saturation'] = self.ranges['oxygen_saturation']['high_altitude']
-        else:
-            ranges_output['oxygen_saturation'] = self.ranges['oxygen_saturation']['default']
-        
-        return ranges_output
+        active = frozenset(
+            name for name in (context or ())
+            if name in self._context_names and (name != 'athlete' or age_years >= ATHLETE_MIN_AGE)
+        )
+        return self._range_lookup[(self._get_age_category(age_years), active)]
     
     def detect_units(self, value_string: str) -> Dict:
         """
@@ -181,8 +259,7 @@ class PhysiologyEngine:
         value_string = str(value_string).strip()
         
         # Blood pressure pattern (e.g., "120/80", "120/80 mmHg", "16/10 kPa")
-        bp_pattern = r'(\d+)\s*/\s*(\d+)\s*(mmHg|kPa)?'
-        bp_match = re.match(bp_pattern, value_string, re.IGNORECASE)
+        bp_match = BP_PATTERN.match(value_string)
         if bp_match:
             systolic, diastolic, unit = bp_match.groups()
             systolic, diastolic = float(systolic), float(diastolic)
@@ -200,8 +277,7 @@ class PhysiologyEngine:
             }
         
         # Temperature pattern (e.g., "38.5C", "101.3F", "38.5°C")
-        temp_pattern = r'(\d+\.?\d*)\s*°?\s*(C|F|celsius|fahrenheit)?'
-        temp_match = re.match(temp_pattern, value_string, re.IGNORECASE)
+        temp_match = TEMP_PATTERN.match(value_string)
         if temp_match:
             temp_value, unit = temp_match.groups()
             temp_value = float(temp_value)
@@ -225,8 +301,7 @@ class PhysiologyEngine:
             }
         
         # Simple numeric pattern
-        numeric_pattern = r'(\d+\.?\d*)'
-        numeric_match = re.match(numeric_pattern, value_string)
+        numeric_match = NUMBER_PATTERN.match(value_string)
         if numeric_match:
             return {
                 'value': float(numeric_match.group(1)),
@@ -346,6 +421,9 @@ class PhysiologyEngine:
                     elif sys > bp_range['critical_high']['systolic']:
                         messages.append(f"Hypertensive crisis ({int(sys)}/{int(dia)} mmHg)")
                         suggestions.extend(["Immediate BP management", "Check for end-organ damage"])
+                    else:
+                        messages.append(f"Critical diastolic BP ({int(sys)}/{int(dia)} mmHg)")
+                        suggestions.append("Immediate medical attention required")
                 elif bp_assessment == "Caution":
                     if overall_assessment != "Critical":
                         overall_assessment = "Caution"
@@ -355,6 +433,9 @@ class PhysiologyEngine:
                     elif sys > bp_range['range']['systolic'][1]:
                         messages.append(f"BP elevated ({int(sys)}/{int(dia)} mmHg)")
                         suggestions.append("Monitor BP trend")
+                    else:
+                        messages.append(f"Diastolic BP out of range ({int(sys)}/{int(dia)} mmHg)")
+                        suggestions.append("Monitor BP trend")
         
         # Validate temperature
         if 'temperature' in vitals and vitals['temperature'] is not None:
@@ -391,6 +472,9 @@ class PhysiologyEngine:
                     if temp_c > temp_range['range_c'][1]:
                         messages.append(f"Fever detected ({temp_c}°C)")
                         suggestions.append("Investigate infection source")
+                    else:
+                        messages.append(f"Low body temperature ({temp_c}°C)")
+                        suggestions.append("Warm patient, monitor closely")
         
         # Validate respiratory rate
         if 'respiratory_rate' in vitals and vitals['respiratory_rate'] is not None:
@@ -413,6 +497,15 @@ class PhysiologyEngine:
                 else:
                     messages.append(f"Dangerously high respiratory rate ({rr}/min)")
                     suggestions.append("Check for respiratory distress")
+            elif assessment == "Caution":
+                if overall_assessment != "Critical":
+                    overall_assessment = "Caution"
+                if rr < rr_range['range'][0]:
+                    messages.append(f"Respiratory rate below normal ({rr}/min)")
+                    suggestions.append("Monitor for respiratory depression")
+                else:
+                    messages.append(f"Respiratory rate above normal ({rr}/min)")
+                    suggestions.append("Evaluate for respiratory distress")
         
         # Validate oxygen saturation
         if 'oxygen_saturation' in vitals and vitals['oxygen_saturation'] is not None:
@@ -453,15 +546,181 @@ class PhysiologyEngine:
             "confidence": round(confidence, 2),
             "assessment": overall_assessment,
             "message": " ".join(messages) if messages else "All vitals within normal range",
+            "messages": messages,
             "suggestions": suggestions,
             "details": results,
             "age_category": self._get_age_category(age_years)
         }
+
+    def validate_batch(self, ages, vitals: Dict, context: List[str] = None) -> Dict:
+        """
+        Vectorized validate() over many readings at once
+
+        Args:
+            ages: Array-like of ages in years, one per reading
+            vitals: Dictionary of array-likes, each the same length as ages.
+                Keys as in validate(); blood pressure may be given either as
+                'blood_pressure' strings ("120/80") or numeric 'systolic' /
+                'diastolic' arrays. Missing readings are None / NaN.
+            context: Contexts applied to every reading (e.g. ['athlete'])
+
+        Returns:
+            Compact NumPy arrays:
+                age_category - int8 index into AGE_CATEGORIES
+                status - {vital: int8 STATUS_* code per reading}
+                assessment - int8 worst status per reading (STATUS_MISSING if no vitals)
+                critical / caution - bool masks of the overall assessment
+                valid - bool, False where any vital is critical
+                checked - int8 number of vitals present per reading
+        """
+        context = context or []
+        ages = np.asarray(ages, dtype=float).ravel()
+        n = len(ages)
+        categories = np.searchsorted(AGE_BOUNDS, ages, side='right').astype(np.int8)
+
+        limits = lambda key: self._batch_limits(key, categories, ages, context)
+        status = {}
+
+        # Heart rate
+        hr = self._batch_values(vitals.get('heart_rate'), n)
+        status['heart_rate'] = self._grade(hr, limits('heart_rate'))
+
+        # Blood pressure - worst of systolic and diastolic
+        if 'systolic' in vitals or 'diastolic' in vitals:
+            sys = np.round(self._batch_values(vitals.get('systolic'), n))
+            dia = np.round(self._batch_values(vitals.get('diastolic'), n))
+        else:
+            sys, dia = self._batch_bp(vitals.get('blood_pressure'), n)
+        sys_status = self._grade(sys, limits('systolic'))
+        dia_status = self._grade(dia, limits('diastolic'))
+        # A reading needs both numbers, as with detect_units
+        status['blood_pressure'] = np.where((sys_status < 0) | (dia_status < 0), STATUS_MISSING,
+                                            np.maximum(sys_status, dia_status)).astype(np.int8)
+
+        # Temperature in Celsius; unitless values above 45 are Fahrenheit
+        temp = self._batch_values(vitals.get('temperature'), n, parse=self._parse_temperature)
+        temp = np.round(np.where(temp > 45, (temp - 32) * 5 / 9, temp), 1)
+        status['temperature'] = self._grade(temp, limits('temperature'))
+
+        # Respiratory rate
+        rr = self._batch_values(vitals.get('respiratory_rate'), n)
+        status['respiratory_rate'] = self._grade(rr, limits('respiratory_rate'))
+
+        # Oxygen saturation
+        spo2 = self._batch_values(vitals.get('oxygen_saturation'), n)
+        status['oxygen_saturation'] = self._grade(spo2, limits('oxygen_saturation'))
+
+        stacked = np.stack([status[vital] for vital in BATCH_VITALS])
+        assessment = stacked.max(axis=0).astype(np.int8)
+
+        return {
+            'age_category': categories,
+            'status': status,
+            'assessment': assessment,
+            'critical': assessment == STATUS_CRITICAL,
+            'caution': assessment == STATUS_CAUTION,
+            'valid': assessment != STATUS_CRITICAL,
+            'checked': (stacked != STATUS_MISSING).sum(axis=0).astype(np.int8)
+        }
+
+    def _batch_limits(self, key: str, categories: np.ndarray, ages: np.ndarray,
+                      context: List[str]) -> np.ndarray:
+        """Per-reading limits for one batch table, with context overrides applied as in get_normal_ranges"""
+        table = self._batch_tables[key]
+        limits = table['by_category'][categories]
+        
+        # Lowest priority first so higher-priority overrides are written last
+        for name in reversed(self._overrides[table['vital']]):
+            if name in context:
+                rows = ages >= ATHLETE_MIN_AGE if name == 'athlete' else slice(None)
+                limits[rows] = table['overrides'][name]
+        return limits
+    
+    def _range_table(self, vital: str, limits) -> np.ndarray:
+        """(normal_low, normal_high, critical_low, critical_high) per age category, indexed like AGE_CATEGORIES"""
+        return _read_only(np.array([limits(self._category_ranges(vital, category)) for category in AGE_CATEGORIES],
+                                   dtype=float))
+
+    @staticmethod
+    def _grade(values: np.ndarray, limits: np.ndarray) -> np.ndarray:
+        """STATUS_* codes for values against (normal_low, normal_high, critical_low, critical_high) limits"""
+        normal_low, normal_high, critical_low, critical_high = (limits[..., i] for i in range(4))
+
+        status = np.full(values.shape, STATUS_NORMAL, dtype=np.int8)
+        status[(values < normal_low) | (values > normal_high)] = STATUS_CAUTION
+        status[(values < critical_low) | (values > critical_high)] = STATUS_CRITICAL
+        status[np.isnan(values)] = STATUS_MISSING
+        return status
+
+    def _batch_values(self, values, n: int, parse=None) -> np.ndarray:
+        """Float array of length n, NaN where missing; strings go through detect_units"""
+        if values is None:
+            return np.full(n, np.nan)
+
+        try:
+            array = np.asarray(values, dtype=float).ravel()
+        except (TypeError, ValueError):
+            parse = parse or self._parse_number
+            array = np.array([np.nan if value is None else parse(value) for value in values], dtype=float)
+
+        if len(array) != n:
+            raise ValueError(f"Expected {n} readings, got {len(array)}")
+        return array
+
+    def _batch_bp(self, values, n: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Systolic and diastolic arrays from blood pressure strings"""
+        sys = np.full(n, np.nan)
+        dia = np.full(n, np.nan)
+        if values is None:
+            return sys, dia
+
+        values = list(values)
+        if len(values) != n:
+            raise ValueError(f"Expected {n} readings, got {len(values)}")
+
+        # BP_PATTERN directly rather than detect_units - same parse, no result dicts
+        for i, value in enumerate(values):
+            match = BP_PATTERN.match(str(value).strip()) if value is not None else None
+            if match:
+                sys[i], dia[i] = float(match.group(1)), float(match.group(2))
+                if match.group(3) and match.group(3).lower() == 'kpa':
+                    sys[i] *= 7.50062
+                    dia[i] *= 7.50062
+        return np.round(sys), np.round(dia)
+
+    @staticmethod
+    def _parse_number(value) -> float:
+        """Leading number of a reading like "72 bpm" (NaN if none)"""
+        match = LEADING_NUMBER_PATTERN.match(str(value))
+        return float(match.group(1)) if match else np.nan
+
+    def _parse_temperature(self, value) -> float:
+        """Celsius from a reading like "101.3F" or "38.5°C" (NaN if unparseable)"""
+        return self.detect_units(str(value)).get('value', np.nan)
+
+
+# One engine per rules file, shared by every validator in the process
+_engines: Dict[str, PhysiologyEngine] = {}
+_engines_lock = threading.Lock()
+
+
+def get_engine(ranges_file: str = RANGES_FILE) -> PhysiologyEngine:
+    """Get the shared, precompiled engine for a ranges file"""
+    key = os.path.abspath(ranges_file)
+    
+    with _engines_lock:
+        engine = _engines.get(key)
+        if engine is None:
+            engine = PhysiologyEngine(ranges_file)
+            _engines[key] = engine
+        return engine
+
+
 # Add this to medical_validator_v2.py at the very end:
 class MedicalValidator:
     """Compatibility wrapper for old validation methods"""
     def __init__(self):
-        self.engine = PhysiologyEngine()
+        self.engine = get_engine()
     
     def validate_patient_name(self, name):
         if not name or len(name) < 2: